@@ -0,0 +1,100 @@
+"""
+Compare concurrent throughput of blocking Google Cloud calls made on the event loop
+with the same calls made through the I/O executor used by `ImageService`.
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+
+from loguru import logger
+
+from src.enums.image import ImageAnnotationsGenerationStatus
+from src.schemas.image import ImageClassification
+from src.services.image_service import ImageService
+from src.services.image_service import create_image_service
+from src.utils.cache import TTLCache
+
+IMAGE_HASH_PREFIX = "benchmark-io"
+
+
+def get_image_service() -> ImageService:
+    return create_image_service(
+        classification_cache=TTLCache(max_entries=0, max_bytes=0, name="benchmark_io_cache"),  # always hit Datastore
+    )
+
+
+async def blocking_request(image_service: ImageService, image_hash: str) -> None:
+    """What the handlers did before: blocking client calls straight from the coroutine."""
+    image_service.database_service.get_entity(collection=image_service.collection, entity_id=image_hash)
+    image_service.queue_service.publish(message=image_hash, image_hash=image_hash)
+
+
+async def async_request(image_service: ImageService, image_hash: str) -> None:
+    await image_service.get_image_classification(image_hash=image_hash)
+    await image_service.queue_service.publish_async(message=image_hash, image_hash=image_hash)
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.001) -> float:
+    """Max delay of a timer on the event loop, i.e. how long a `/health` request would stall."""
+    loop = asyncio.get_running_loop()
+    max_lag = 0.0
+    while not stop.is_set():
+        started_at = loop.time()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, loop.time() - started_at - interval)
+    return max_lag
+
+
+async def run(
+    request: Callable[[ImageService, str], Awaitable[None]],
+    image_service: ImageService,
+    *,
+    requests: int,
+    concurrency: int,
+) -> dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int) -> None:
+        async with semaphore:
+            await request(image_service, f"{IMAGE_HASH_PREFIX}-{index}")
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    started_at = time.perf_counter()
+    await asyncio.gather(*(limited(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started_at
+    stop.set()
+
+    return {"seconds": elapsed, "rps": requests / elapsed, "max_loop_lag_ms": await lag_task * 1000}
+
+
+async def main(*, requests: int, concurrency: int) -> None:
+    image_service = get_image_service()
+    await image_service.upsert_image_classifications(
+        image_classifications=[
+            ImageClassification(
+                image_hash=f"{IMAGE_HASH_PREFIX}-{index}",
+                status=ImageAnnotationsGenerationStatus.SUCCESS,
+            )
+            for index in range(requests)
+        ],
+    )
+
+    for name, request in (("blocking", blocking_request), ("async", async_request)):
+        result = await run(request, image_service, requests=requests, concurrency=concurrency)
+        logger.info(
+            f"{name:>8}: {requests} requests in {result['seconds']:.2f}s, "
+            f"{result['rps']:.1f} req/s, max event loop lag {result['max_loop_lag_ms']:.1f}ms",
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(main(requests=args.requests, concurrency=args.concurrency))
@@ -0,0 +1,86 @@
+"""
+Compare per-image preprocessing time of the full resolution PIL decode followed by `ViTImageProcessor`
+with the draft mode decode and NumPy normalization of `ImagePreprocessor`.
+"""
+
+import argparse
+import io
+import statistics
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import torch
+from loguru import logger
+from PIL import Image
+from transformers import ViTImageProcessor
+
+from src.config import ROOT_DIR
+from src.config import get_settings
+from src.utils.preprocessing import ImagePreprocessor
+from src.utils.preprocessing import get_imaging_features
+
+DEFAULT_IMAGES_DIR = ROOT_DIR / "docs/presentation/static"
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+
+def get_processor() -> ViTImageProcessor:
+    model_dir = Path(get_settings().ml_model_dir)
+    if (model_dir / "preprocessor_config.json").exists():
+        return ViTImageProcessor.from_pretrained(model_dir)
+    logger.warning(f"Model is not checked out, using the default ViT processor: {model_dir=}")
+    return ViTImageProcessor()
+
+
+def processor_pipeline(processor: ViTImageProcessor) -> Callable[[list[bytes]], torch.Tensor]:
+    def preprocess(contents: list[bytes]) -> torch.Tensor:
+        images = [Image.open(io.BytesIO(content)).convert("RGB") for content in contents]
+        return processor(images=images, return_tensors="pt")["pixel_values"]
+
+    return preprocess
+
+
+def fast_pipeline(preprocessor: ImagePreprocessor) -> Callable[[list[bytes]], torch.Tensor]:
+    def preprocess(contents: list[bytes]) -> torch.Tensor:
+        return preprocessor([preprocessor.load_image(content) for content in contents])
+
+    return preprocess
+
+
+def measure(preprocess: Callable[[list[bytes]], torch.Tensor], contents: list[bytes], *, repeat: int) -> list[float]:
+    """Per-image milliseconds of every repetition."""
+    preprocess(contents)  # warm up
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        preprocess(contents)
+        timings.append((time.perf_counter() - started_at) * 1000 / len(contents))
+    return timings
+
+
+def main(*, images_dir: Path, repeat: int) -> None:
+    paths = sorted(path for path in images_dir.iterdir() if path.suffix.lower() in IMAGE_SUFFIXES)
+    contents = [path.read_bytes() for path in paths]
+    logger.info(f"Preprocessing {len(contents)} images from {images_dir}, imaging features: {get_imaging_features()}")
+
+    processor = get_processor()
+    preprocessor = ImagePreprocessor.from_processor(processor)
+    expected = processor_pipeline(processor)(contents)
+    actual = fast_pipeline(preprocessor)(contents)
+    logger.info(f"Mean absolute difference of pixel values: {(expected - actual).abs().mean().item():.4f}")
+
+    for name, preprocess in (("processor", processor_pipeline(processor)), ("fast", fast_pipeline(preprocessor))):
+        timings = measure(preprocess, contents, repeat=repeat)
+        logger.info(
+            f"{name:>9}: median {statistics.median(timings):.2f}ms per image, "
+            f"min {min(timings):.2f}ms, max {max(timings):.2f}ms",
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images-dir", type=Path, default=DEFAULT_IMAGES_DIR)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    main(images_dir=args.images_dir, repeat=args.repeat)
@@ -0,0 +1,122 @@
+"""
+Compare the top-5 labels of the inference backends selectable by `ML_MODEL_BACKEND` with the FP32 eager baseline
+on a set of sample images, and report their latency and size.
+"""
+
+import argparse
+import copy
+import io
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import torch
+from loguru import logger
+from transformers import ViTForImageClassification
+from transformers import ViTImageProcessor
+
+from src.config import ROOT_DIR
+from src.config import get_settings
+from src.services.model_backends import MODEL_BACKENDS
+from src.services.model_backends import Model
+from src.services.model_backends import prepare_model
+from src.utils.preprocessing import ImagePreprocessor
+
+DEFAULT_IMAGES_DIR = ROOT_DIR / "docs/presentation/static"
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+TOP_K = 5
+
+
+def load_pixel_values(images_dir: Path, processor: ViTImageProcessor) -> torch.Tensor:
+    preprocessor = ImagePreprocessor.from_processor(processor)
+    paths = sorted(path for path in images_dir.iterdir() if path.suffix.lower() in IMAGE_SUFFIXES)
+    logger.info(f"Sample images: {[path.name for path in paths]}")
+    return preprocessor([preprocessor.load_image(path.read_bytes()) for path in paths])
+
+
+def predict(model: Model, pixel_values: torch.Tensor, *, repeat: int) -> tuple[torch.Tensor, list[float]]:
+    """Probabilities and the milliseconds of every repetition, after a warm-up pass."""
+    timings = []
+    with torch.no_grad():
+        model(pixel_values=pixel_values)
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            logits = model(pixel_values=pixel_values).logits
+            timings.append((time.perf_counter() - started_at) * 1000)
+    return torch.nn.functional.softmax(logits, dim=1), timings
+
+
+def state_dict_megabytes(model: Model) -> float | None:
+    if not isinstance(model, torch.nn.Module):
+        return None
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1024 / 1024
+
+
+def main(*, backends: list[str], images_dir: Path, repeat: int, min_top1_agreement: float) -> int:
+    settings = get_settings()
+    processor = ViTImageProcessor.from_pretrained(settings.ml_model_dir)
+    baseline = ViTForImageClassification.from_pretrained(settings.ml_model_dir).eval()
+    pixel_values = load_pixel_values(images_dir, processor)
+    example_inputs = pixel_values[:1]
+
+    expected, timings = predict(baseline, pixel_values, repeat=repeat)
+    expected_top = torch.topk(expected, TOP_K, dim=1).indices
+    logger.info(
+        f"{'eager':>11}: median {statistics.median(timings):.1f}ms per batch, "
+        f"state dict {state_dict_megabytes(baseline):.1f}MB",
+    )
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for backend in backends:
+            model = prepare_model(
+                copy.deepcopy(baseline),
+                backend=backend,
+                example_inputs=example_inputs,
+                onnx_path=Path(tmp_dir) / "model.onnx",
+                num_threads=settings.inference_torch_threads,
+            )
+            actual, timings = predict(model, pixel_values, repeat=repeat)
+            actual_top = torch.topk(actual, TOP_K, dim=1).indices
+
+            top1_agreement = (actual_top[:, 0] == expected_top[:, 0]).float().mean().item()
+            top5_overlap = statistics.mean(
+                len(set(a.tolist()) & set(e.tolist())) / TOP_K for a, e in zip(actual_top, expected_top, strict=True)
+            )
+            size = state_dict_megabytes(model)
+            logger.info(
+                f"{backend:>11}: median {statistics.median(timings):.1f}ms per batch, "
+                f"top-1 agreement {top1_agreement:.1%}, top-5 overlap {top5_overlap:.1%}, "
+                f"max probability difference {(actual - expected).abs().max().item():.4f}"
+                + (f", state dict {size:.1f}MB" if size is not None else ""),
+            )
+            failed = failed or top1_agreement < min_top1_agreement
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=[backend for backend in MODEL_BACKENDS if backend != "eager"],
+        default=["int8", "torchscript"],
+    )
+    parser.add_argument("--images-dir", type=Path, default=DEFAULT_IMAGES_DIR)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--min-top1-agreement", type=float, default=0.9)
+    args = parser.parse_args()
+
+    sys.exit(
+        main(
+            backends=args.backends,
+            images_dir=args.images_dir,
+            repeat=args.repeat,
+            min_top1_agreement=args.min_top1_agreement,
+        ),
+    )
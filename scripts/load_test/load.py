@@ -0,0 +1,263 @@
+"""
+Send concurrent requests to the API and worker endpoints and report latency percentiles, throughput and peak memory.
+
+Requests go to the ASGI apps in-process (`--target inprocess`) or to running services (`--target http`),
+both backed by the docker-compose emulators. Results are saved as JSON and can be compared with a previous run.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+from loguru import logger
+from PIL import Image
+
+from src.app_api import app as app_api
+from src.app_worker import app as app_worker
+from src.config import get_settings
+from src.enums.image import ImageAnnotationsGenerationStatus
+from src.schemas.image import ImageClassification
+from src.services.database_service import DatabaseService
+from src.services.image_service import ImageService
+from src.utils.helpers import resize_image
+
+SCENARIOS = ("status", "fast", "slow", "worker")
+IMAGE_SIZE = (64, 64)
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    requests: int
+    concurrency: int
+    seconds: float
+    rps: float
+    latency_ms: dict[str, float]
+    status_codes: dict[str, int]
+    peak_rss_mb: float | None  # apps run in-process only, None with `--target http`
+
+
+def make_images(count: int, *, seed: str) -> list[bytes]:
+    """Distinct PNG images, so every request misses the classification cache."""
+    images = []
+    for index in range(count):
+        noise = hashlib.sha256(f"{seed}-{index}".encode()).digest() * (IMAGE_SIZE[0] * IMAGE_SIZE[1] * 3 // 32)
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", IMAGE_SIZE, noise).save(buffer, format="PNG")
+        images.append(buffer.getvalue())
+    return images
+
+
+def seed_image_classifications(images: list[bytes], *, status: ImageAnnotationsGenerationStatus) -> list[str]:
+    image_hashes = [hashlib.sha256(image).hexdigest() for image in images]
+    DatabaseService(settings=get_settings()).upsert_many(
+        collection=ImageService.collection,
+        data={
+            image_hash: ImageClassification(image_hash=image_hash, status=status).model_dump()
+            for image_hash in image_hashes
+        },
+    )
+    return image_hashes
+
+
+def build_requests(scenario: str, images: list[bytes]) -> list[dict[str, Any]]:
+    if scenario == "status":
+        image_hashes = seed_image_classifications(images, status=ImageAnnotationsGenerationStatus.SUCCESS)
+        return [{"method": "GET", "url": f"/what/status/{image_hash}"} for image_hash in image_hashes]
+
+    if scenario in ("fast", "slow"):
+        return [
+            {"method": "POST", "url": f"/what/{scenario}", "files": {"img": (f"{index}.png", image, "image/png")}}
+            for index, image in enumerate(images)
+        ]
+
+    image_hashes = seed_image_classifications(images, status=ImageAnnotationsGenerationStatus.QUEUED)
+    size = (get_settings().pubsub_inline_image_size,) * 2
+    return [
+        {
+            "method": "POST",
+            "url": "/generate_annotations",
+            "json": {
+                "message": {
+                    "data": base64.b64encode(resize_image(image, size=size)).decode(),
+                    "messageId": str(index),
+                    "attributes": {"image_hash": image_hash, "inline": "true"},
+                },
+            },
+        }
+        for index, (image, image_hash) in enumerate(zip(images, image_hashes, strict=True))
+    ]
+
+
+@asynccontextmanager
+async def create_client(
+    scenario: str,
+    *,
+    target: str,
+    api_url: str,
+    worker_url: str,
+) -> AsyncIterator[httpx.AsyncClient]:
+    if target == "http":
+        async with httpx.AsyncClient(base_url=worker_url if scenario == "worker" else api_url, timeout=60) as client:
+            yield client
+        return
+
+    app = app_worker if scenario == "worker" else app_api
+    # httpx does not run the lifespan of the app
+    async with app.router.lifespan_context(app), httpx.AsyncClient(app=app, base_url="http://load-test") as client:
+        yield client
+
+
+def percentiles(latencies: list[float]) -> dict[str, float]:
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50": quantiles[49],
+        "p95": quantiles[94],
+        "p99": quantiles[98],
+        "mean": statistics.mean(latencies),
+        "max": max(latencies),
+    }
+
+
+def peak_rss_mb(target: str) -> float | None:
+    """
+    Peak resident memory of this process, which includes the apps when they run in-process.
+    With `--target http` it would only measure the load generator, so the services' memory is not reported.
+    """
+    if target == "http":
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run_scenario(  # noqa: PLR0913
+    scenario: str,
+    *,
+    requests: int,
+    concurrency: int,
+    warm_up: int,
+    target: str,
+    api_url: str,
+    worker_url: str,
+) -> ScenarioResult:
+    images = make_images(requests + warm_up, seed=f"{scenario}-{time.time_ns()}")
+    prepared = await asyncio.to_thread(build_requests, scenario, images)
+    warm_up_requests, measured_requests = prepared[:warm_up], prepared[warm_up:]
+
+    latencies: list[float] = []
+    status_codes: Counter[str] = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with create_client(scenario, target=target, api_url=api_url, worker_url=worker_url) as client:
+
+        async def send(request: dict[str, Any], *, record: bool) -> None:
+            async with semaphore:
+                started_at = time.perf_counter()
+                try:
+                    response = await client.request(**request)
+                    outcome = str(response.status_code)
+                except httpx.HTTPError as e:
+                    outcome = f"error:{type(e).__name__}"
+                if record:
+                    latencies.append((time.perf_counter() - started_at) * 1000)
+                    status_codes[outcome] += 1
+
+        await asyncio.gather(*(send(request, record=False) for request in warm_up_requests))
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(send(request, record=True) for request in measured_requests))
+        seconds = time.perf_counter() - started_at
+
+    return ScenarioResult(
+        scenario=scenario,
+        requests=requests,
+        concurrency=concurrency,
+        seconds=seconds,
+        rps=requests / seconds,
+        latency_ms=percentiles(latencies),
+        status_codes=dict(status_codes),
+        peak_rss_mb=peak_rss_mb(target),
+    )
+
+
+def compare(results: list[ScenarioResult], baseline_path: Path) -> None:
+    baseline = {result["scenario"]: result for result in json.loads(baseline_path.read_text())["results"]}
+    for result in results:
+        if result.scenario not in baseline:
+            continue
+        previous = baseline[result.scenario]
+        changes = {
+            "rps": (result.rps, previous["rps"]),
+            **{key: (result.latency_ms[key], previous["latency_ms"][key]) for key in ("p50", "p95", "p99")},
+        }
+        summary = ", ".join(f"{key} {(current / before - 1):+.1%}" for key, (current, before) in changes.items())
+        logger.info(f"{result.scenario:>7} vs baseline: {summary}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = []
+    for scenario in args.scenarios:
+        result = await run_scenario(
+            scenario,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            warm_up=args.warm_up,
+            target=args.target,
+            api_url=args.api_url,
+            worker_url=args.worker_url,
+        )
+        latency = result.latency_ms
+        peak_rss = f", peak RSS {result.peak_rss_mb:.0f}MB" if result.peak_rss_mb is not None else ""
+        logger.info(
+            f"{scenario:>7}: {result.rps:.1f} req/s, p50 {latency['p50']:.1f}ms, p95 {latency['p95']:.1f}ms, "
+            f"p99 {latency['p99']:.1f}ms, status codes {result.status_codes}{peak_rss}",
+        )
+        results.append(result)
+
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "target": args.target,
+                    "created_at": time.time(),
+                    "cpu_count": os.cpu_count(),
+                    "python": sys.version,
+                    "results": [asdict(result) for result in results],
+                },
+                indent=2,
+            ),
+        )
+        logger.info(f"Results saved to {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warm-up", type=int, default=10, help="Requests sent before measuring, per scenario")
+    parser.add_argument("--target", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--api-url", default="http://localhost:8080")
+    parser.add_argument("--worker-url", default="http://localhost:8081")
+    parser.add_argument("--output", type=Path, help="Save the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="Compare with results saved by a previous run")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,40 @@
+"""
+Recompute the annotations of every classified image from the logits kept in `LOGITS_STORE_DIR`, without inference,
+e.g. after changing `NUM_ANNOTATIONS` or `ANNOTATION_MIN_CONFIDENCE`.
+API instances keep serving their cached classifications and indexed ETags for up to `CLASSIFICATION_CACHE_TTL_DONE`
+seconds, and CDNs for up to `STATUS_CACHE_MAX_AGE`; restart them and purge the CDN to serve reranked annotations now.
+"""
+
+import argparse
+import asyncio
+import time
+
+from loguru import logger
+
+from src.config import get_settings
+from src.services.database_service import MAX_ENTITIES_PER_PUT
+from src.services.image_service import create_image_service
+
+
+async def main(*, num_annotations: int, min_confidence: float, chunk_size: int) -> None:
+    image_service = create_image_service()
+    started_at = time.perf_counter()
+    updated = await image_service.rerank_image_classifications(
+        num_annotations=num_annotations,
+        min_confidence=min_confidence,
+        chunk_size=chunk_size,
+    )
+    logger.info(f"Reranked {updated} image classifications in {time.perf_counter() - started_at:.1f}s")
+
+
+if __name__ == "__main__":
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-annotations", type=int, default=settings.num_annotations)
+    parser.add_argument("--min-confidence", type=float, default=settings.annotation_min_confidence)
+    parser.add_argument("--chunk-size", type=int, default=MAX_ENTITIES_PER_PUT)
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(num_annotations=args.num_annotations, min_confidence=args.min_confidence, chunk_size=args.chunk_size),
+    )
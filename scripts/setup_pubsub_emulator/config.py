@@ -8,7 +8,7 @@ class Settings(BaseSettings):
     pubsub_project_id: str
     pubsub_generate_annotations_topic: str
     pubsub_generate_annotations_subscription: str
-    pubsub_generate_annotations_push_endpoint: str
+    pubsub_generate_annotations_push_endpoint: str = ""  # empty creates a pull subscription for `app_worker_pull`
     pubsub_generate_annotations_topic_dlq: str
     pubsub_generate_annotations_subscription_dlq: str
     pubsub_generate_annotations_push_endpoint_dlq: str
@@ -5,6 +5,7 @@ from google.auth.credentials import AnonymousCredentials
 from google.pubsub_v1 import DeadLetterPolicy
 from google.pubsub_v1 import GetSubscriptionRequest
 from google.pubsub_v1 import GetTopicRequest
+from google.pubsub_v1 import ModifyPushConfigRequest
 from google.pubsub_v1 import PushConfig
 from google.pubsub_v1.services.publisher.client import PublisherClient
 from google.pubsub_v1.services.publisher.transports.grpc import PublisherGrpcTransport
@@ -85,7 +86,11 @@ def create_subscription(  # noqa: PLR0913
     try:
         subscription = client.create_subscription(request)
     except AlreadyExists:
-        logger.info(f"Subscription {subscription_path} exists, retrieving ...")
+        logger.info(f"Subscription {subscription_path} exists, updating push config ...")
+        # an empty push config turns the subscription into a pull subscription and back
+        client.modify_push_config(
+            ModifyPushConfigRequest(subscription=subscription_path, push_config=push_config or PushConfig()),
+        )
         return get_subscription(client, subscription_path)
     else:
         logger.info(f"Created subscription {subscription.name}")
@@ -1,13 +1,56 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from loguru import logger
 
 from src.api import health
+from src.api import metrics
+from src.api import profiling
 from src.api.handlers import register_error_handling
 from src.config import get_settings
+from src.services.image_service import ImageService
+from src.services.model_registry import get_model_registry
+from src.services.queue_service import QueueService
+from src.utils.http import get_http_client
+from src.utils.tracing import configure_tracing
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator:
+    settings = get_settings()
+    preload_task = None
+    if settings.ml_model_preload:
+        # load in the background, so /health responds right away and /ready flips once the model is usable
+        preload_task = asyncio.create_task(
+            asyncio.to_thread(get_model_registry().load, warm_up=settings.ml_model_warm_up),
+        )
+        preload_task.add_done_callback(_log_preload_failure)
+    yield
+    if preload_task is not None:
+        preload_task.cancel()
+    # send the batched messages, then store the status of the generation requests they carry
+    await asyncio.to_thread(QueueService.close)
+    await ImageService.wait_for_generation_requests()
+    await get_http_client().aclose()
+
+
+def _log_preload_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        logger.opt(exception=task.exception()).error("Preloading ML model failed")
 
 
 def create_app() -> FastAPI:
     settings = get_settings()
-    app = FastAPI(**settings.fastapi_kwargs)
+    app = FastAPI(lifespan=lifespan, **settings.fastapi_kwargs)
     app.include_router(health.router)
+    if settings.metrics_enabled:
+        app.include_router(metrics.router)
+    if settings.profiling_enabled:
+        if not settings.profiling_token:
+            logger.warning("PROFILING_ENABLED is set without PROFILING_TOKEN, profiling requests are refused")
+        app.include_router(profiling.router)
+    configure_tracing(enabled=settings.tracing_enabled)
     register_error_handling(app)
     return app
@@ -0,0 +1,48 @@
+import hashlib
+from functools import lru_cache
+
+from src.config import get_settings
+from src.enums.image import ImageAnnotationsGenerationStatus
+from src.schemas.image import ImageClassification
+from src.utils.cache import TTLCache
+
+ETAG_LENGTH = 96  # bytes taken by an ETag, `"<sha256 hex>-<status>-<digest>"`
+
+
+@lru_cache
+def get_etag_index() -> TTLCache[str, str]:
+    """ETags of successful classifications served by this instance, answering `If-None-Match` without Datastore."""
+    settings = get_settings()
+    return TTLCache(
+        max_entries=settings.status_etag_index_max_entries,
+        max_bytes=settings.status_etag_index_max_entries * ETAG_LENGTH,
+        name="etag_index",
+    )
+
+
+def get_etag(image_classification: ImageClassification) -> str:
+    """
+    Strong ETag of the image hash and status, the digest of the serialized classification
+    tells apart successful classifications whose annotations were reranked.
+    """
+    digest = hashlib.sha256(image_classification.model_dump_json().encode()).hexdigest()[:16]
+    return f'"{image_classification.image_hash}-{image_classification.status}-{digest}"'
+
+
+def get_cache_control(status: ImageAnnotationsGenerationStatus) -> str:
+    """
+    Successful classifications change only when reranked, they are kept for `status_cache_max_age` and then
+    revalidated with the ETag, other ones are revalidated on every request.
+    """
+    if status == ImageAnnotationsGenerationStatus.SUCCESS:
+        return f"public, max-age={get_settings().status_cache_max_age}"
+    return "no-cache"
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether the `If-None-Match` header matches the ETag, with the weak comparison it requires."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
@@ -3,3 +3,11 @@ from fastapi import HTTPException
 
 class AnnotationGenerationError(HTTPException):
     pass
+
+
+class InferenceOverloadedError(HTTPException):
+    pass
+
+
+class GenerationInProgressError(HTTPException):
+    pass
@@ -7,6 +7,8 @@ from loguru import logger
 from pydantic import ValidationError
 from starlette import status
 
+from src.utils.executors import ExecutorFullError
+
 
 async def request_validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
     response = JSONResponse(
@@ -17,6 +19,16 @@ async def request_validation_exception_handler(request: Request, exc: RequestVal
     return response
 
 
+async def executor_full_exception_handler(request: Request, exc: ExecutorFullError) -> JSONResponse:
+    logger.warning(f"Executor full: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service is overloaded, try again later."},
+        headers={"Retry-After": "1"},
+    )
+
+
 def register_error_handling(app: FastAPI) -> None:
     app.add_exception_handler(ValidationError, request_validation_exception_handler)
     app.add_exception_handler(RequestValidationError, request_validation_exception_handler)
+    app.add_exception_handler(ExecutorFullError, executor_full_exception_handler)
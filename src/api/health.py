@@ -1,9 +1,21 @@
+from fastapi import Depends
+from fastapi import HTTPException
 from fastapi import status
 from fastapi.routing import APIRouter
 
+from src.services.model_registry import ModelRegistry
+from src.services.model_registry import get_model_registry
+
 router = APIRouter()
 
 
 @router.get("/health", status_code=status.HTTP_204_NO_CONTENT)
 async def healthcheck() -> None:
     pass
+
+
+@router.get("/ready", status_code=status.HTTP_204_NO_CONTENT)
+async def readiness(model_registry: ModelRegistry = Depends(get_model_registry)) -> None:
+    """Ready once the ML model is loaded, use it as the startup probe to keep traffic away from cold instances."""
+    if not model_registry.is_ready:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="ML model is not loaded yet")
@@ -0,0 +1,14 @@
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRouter
+
+from src.utils.metrics import registry
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Metrics of this instance in the Prometheus text format."""
+    return PlainTextResponse(registry.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
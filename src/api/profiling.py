@@ -0,0 +1,69 @@
+import asyncio
+import secrets
+from typing import Literal
+
+from fastapi import Depends
+from fastapi import Header
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import status
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRouter
+from loguru import logger
+
+from src.config import Settings
+from src.config import get_settings
+from src.utils.profiling import StackSampler
+from src.utils.profiling import format_collapsed
+from src.utils.profiling import forward_profiler
+
+MAX_PROFILE_SECONDS = 120
+
+_profile_lock = asyncio.Lock()
+
+
+def verify_profiling_token(
+    x_profiling_token: str | None = Header(default=None),
+    settings: Settings = Depends(get_settings),
+) -> None:
+    """Profiles expose the code and data of the instance, without a configured token every request is refused."""
+    if not settings.profiling_token:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Profiling requires PROFILING_TOKEN")
+    if not secrets.compare_digest(x_profiling_token or "", settings.profiling_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid profiling token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(verify_profiling_token)], include_in_schema=False)
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    mode: Literal["python", "torch"] = "python",
+    seconds: float = Query(default=10, gt=0, le=MAX_PROFILE_SECONDS),
+    interval: float = Query(default=0.005, ge=0.001, le=1),
+) -> str:
+    """
+    Profile the running instance for `seconds` and return the stacks in the collapsed flame graph format.
+    `python` samples the stacks of all threads every `interval` seconds, counts are samples.
+    `torch` records the operators of the ML model forward passes, counts are microseconds of CPU time.
+    """
+    if _profile_lock.locked():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Profiling is already in progress")
+
+    async with _profile_lock:
+        logger.info(f"Profiling: {mode=}, {seconds=}, {interval=}")
+        if mode == "torch":
+            forward_profiler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                stacks = forward_profiler.stop()
+        else:
+            sampler = StackSampler(interval=interval)
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                stacks = await asyncio.to_thread(sampler.stop)
+
+    return format_collapsed(stacks)
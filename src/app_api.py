@@ -1,17 +1,36 @@
+import asyncio
+from collections import defaultdict
+from collections.abc import AsyncIterator
+
 from fastapi import BackgroundTasks
 from fastapi import Depends
+from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Query
 from fastapi import UploadFile
 from fastapi import status
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.responses import RedirectResponse
+from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
 from loguru import logger
 
 from src.api.app import create_app
-from src.api.exceptions import AnnotationGenerationError
+from src.api.caching import etag_matches
+from src.api.caching import get_cache_control
+from src.api.caching import get_etag
+from src.api.caching import get_etag_index
+from src.config import Settings
+from src.config import get_settings
 from src.enums.image import ImageAnnotationsGenerationStatus
+from src.schemas.image import ImageBatchItem
 from src.schemas.image import ImageClassification
+from src.schemas.image import ImageUpload
 from src.services.image_service import ImageService
+from src.utils.cache import TTLCache
+
+SSE_KEEP_ALIVE_INTERVAL = 15  # Seconds
 
 app = create_app()
 
@@ -21,13 +40,83 @@ async def docs_redirect() -> RedirectResponse:
     return RedirectResponse(url="/docs")
 
 
-@app.get("/what/status/{image_hash}")
-async def get_image(
+@app.get("/what/status/{image_hash}", response_model=ImageClassification)
+async def get_image(  # noqa: PLR0913
     image_hash: str,
+    response: Response,
+    wait: float = Query(default=0, ge=0, description="Seconds to wait for a pending classification to finish"),
+    if_none_match: str | None = Header(default=None),
     image_service: ImageService = Depends(ImageService),
-) -> ImageClassification:
-    """Returns image classification if it exists in the database."""
-    image_classification = image_service.get_image_classification(image_hash=image_hash)
+    settings: Settings = Depends(get_settings),
+    etag_index: TTLCache[str, str] = Depends(get_etag_index),
+) -> ImageClassification | Response:
+    """
+    Returns image classification if it exists in the database.
+    With `wait` a pending classification is returned once it finishes, or as it is when the wait is over,
+    so clients long-poll instead of polling at fixed intervals.
+    Responses carry an ETag, a matching `If-None-Match` is answered with 304. Successful classifications
+    change only when reranked, their ETags are indexed, so repeated requests are answered without reading them.
+    """
+    etag = etag_index.get(image_hash)
+    if etag is not None and etag_matches(if_none_match, etag):
+        # only successful classifications are indexed
+        return not_modified(etag, cache_control=get_cache_control(ImageAnnotationsGenerationStatus.SUCCESS))
+
+    image_classification = await get_image_classification_or_404(image_service, image_hash=image_hash)
+
+    if wait and not image_classification.status.is_done():
+        finished = await image_service.wait_for_image_classification(
+            image_hash=image_hash,
+            timeout=min(wait, settings.status_wait_max),
+        )
+        image_classification = finished or image_classification
+
+    etag = get_etag(image_classification)
+    cache_control = get_cache_control(image_classification.status)
+    if image_classification.status == ImageAnnotationsGenerationStatus.SUCCESS:
+        # reranking in another process does not reach the index, so it answers 304 no longer than clients cache
+        ttl = min(settings.classification_cache_ttl_done, settings.status_cache_max_age)
+        etag_index.set(image_hash, etag, ttl=ttl, size=len(etag))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control=cache_control)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return image_classification
+
+
+def not_modified(etag: str, *, cache_control: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+@app.get("/what/status/{image_hash}/events", response_class=StreamingResponse)
+async def get_image_events(
+    image_hash: str,
+    image_service: ImageService = Depends(ImageService),
+    settings: Settings = Depends(get_settings),
+) -> StreamingResponse:
+    """
+    Server-sent events of the image classification: a `status` event with the current classification,
+    and another one once it finishes. The stream ends after the finished classification or after `status_wait_max`,
+    EventSource clients reconnect by themselves.
+    """
+    image_classification = await get_image_classification_or_404(image_service, image_hash=image_hash)
+    return StreamingResponse(
+        stream_status_events(
+            image_service,
+            image_classification=image_classification,
+            timeout=settings.status_wait_max,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def get_image_classification_or_404(image_service: ImageService, *, image_hash: str) -> ImageClassification:
+    image_classification = await image_service.get_image_classification(image_hash=image_hash)
 
     if not image_classification:
         raise HTTPException(
@@ -38,15 +127,37 @@ async def get_image(
     return image_classification
 
 
+async def stream_status_events(
+    image_service: ImageService,
+    *,
+    image_classification: ImageClassification,
+    timeout: float,
+) -> AsyncIterator[str]:
+    yield f"event: status\ndata: {image_classification.model_dump_json()}\n\n"
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not image_classification.status.is_done() and (remaining := deadline - loop.time()) > 0:
+        finished = await image_service.wait_for_image_classification(
+            image_hash=image_classification.image_hash,
+            timeout=min(SSE_KEEP_ALIVE_INTERVAL, remaining),
+        )
+        if finished is None:
+            # keeps proxies from closing the idle connection
+            yield ": keep-alive\n\n"
+        else:
+            image_classification = finished
+            yield f"event: status\ndata: {image_classification.model_dump_json()}\n\n"
+
+
 @app.post("/what/slow")
 async def what_is_it_slow(
     img: UploadFile,
     image_service: ImageService = Depends(ImageService),
 ) -> ImageClassification:
     """Returns image classification if it exists in the database, otherwise generates it synchronously."""
-    image_service.validate_image(file=img)
-    image_hash = await image_service.calculate_hash(file=img)
-    image_classification = image_service.get_image_classification(image_hash=image_hash)
+    image = await image_service.read_image(file=img)
+    image_classification = await image_service.get_image_classification(image_hash=image.image_hash)
 
     if image_classification:
         logger.info(f"Image Classification already in db: {image_classification=}")
@@ -54,23 +165,7 @@ async def what_is_it_slow(
 
     logger.info(f"Image Classification not found in db: {image_classification=}")
 
-    image_classification = ImageClassification(
-        image_hash=image_hash,
-        status=ImageAnnotationsGenerationStatus.PENDING,
-    )
-
-    try:
-        image_classification.annotations = image_service.generate_annotations(contents=await img.read())
-        image_classification.status = ImageAnnotationsGenerationStatus.SUCCESS
-    except AnnotationGenerationError:
-        image_classification.status = ImageAnnotationsGenerationStatus.ERROR
-        logger.exception(
-            f"Error generating annotations for Image Classification: {image_classification=}",
-            exc_info=True,
-        )
-
-    image_service.upsert_image_classification(image_classification=image_classification)
-    return image_classification
+    return await image_service.generate_image_classification(image_hash=image.image_hash, contents=image.content)
 
 
 @app.post("/what/fast")
@@ -80,9 +175,8 @@ async def what_is_it_fast(
     image_service: ImageService = Depends(ImageService),
 ) -> ImageClassification:
     """Returns image classification if it exists in the database, otherwise sends a request to the queue."""
-    image_service.validate_image(file=img)
-    image_hash = await image_service.calculate_hash(file=img)
-    image_classification = image_service.get_image_classification(image_hash=image_hash)
+    image = await image_service.read_image(file=img)
+    image_classification = await image_service.get_image_classification(image_hash=image.image_hash)
 
     if image_classification:
         logger.info(f"Image Classification already in db: {image_classification=}")
@@ -93,15 +187,59 @@ async def what_is_it_fast(
         f"sending annotation generation request to the queue: {image_classification=}",
     )
 
-    image_classification = ImageClassification(
-        image_hash=image_hash,
-        status=ImageAnnotationsGenerationStatus.PENDING,
-    )
+    image_classification = await image_service.queue_generation_request(image=image, background_tasks=background_tasks)
+    if image_classification.status.is_done():
+        # another request stored the classification first and it is finished already
+        return image_classification
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=image_classification.model_dump(mode="json"))
+
 
-    image_service.upsert_image_classification(image_classification=image_classification)
-    background_tasks.add_task(
-        image_service.send_generation_request_to_worker,
-        file=img,
-        image_classification=image_classification,
+@app.post("/what/batch")
+async def what_is_it_batch(
+    files: list[UploadFile],
+    background_tasks: BackgroundTasks,
+    *,
+    queue: bool = False,
+    image_service: ImageService = Depends(ImageService),
+) -> StreamingResponse:
+    """
+    Classify many images, uploaded as files or as zip and tar archives of images.
+    Results are streamed as NDJSON, one `ImageBatchItem` line per image in the order they complete.
+    Stored classifications are returned right away, missing ones are generated synchronously,
+    or with `queue` sent to the worker like `/what/fast`.
+    """
+    images = await image_service.read_images(files=files)
+    logger.info(f"Classifying batch of images: {len(images)=}, {queue=}")
+    return StreamingResponse(
+        stream_batch_items(image_service, images=images, background_tasks=background_tasks, queue=queue),
+        media_type="application/x-ndjson",
     )
-    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=dict(image_classification))
+
+
+async def stream_batch_items(
+    image_service: ImageService,
+    *,
+    images: list[ImageUpload | RequestValidationError],
+    background_tasks: BackgroundTasks,
+    queue: bool,
+) -> AsyncIterator[str]:
+    positions: dict[str, list[int]] = defaultdict(list)
+    for index, image in enumerate(images):
+        if isinstance(image, RequestValidationError):
+            yield ImageBatchItem(index=index, error=str(image.errors())).model_dump_json() + "\n"
+        else:
+            positions[image.image_hash].append(index)
+
+    uploads = [image for image in images if isinstance(image, ImageUpload)]
+    async for image_hash, result in image_service.classify_images(
+        images=uploads,
+        background_tasks=background_tasks,
+        queue=queue,
+    ):
+        for index in positions[image_hash]:
+            item = ImageBatchItem(index=index, filename=images[index].filename, image_hash=image_hash)
+            if isinstance(result, HTTPException):
+                item.error = str(result.detail)
+            else:
+                item.image_classification = result
+            yield item.model_dump_json() + "\n"
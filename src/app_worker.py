@@ -1,14 +1,9 @@
 from fastapi import Depends
-from fastapi import HTTPException
 from fastapi import Request
 from fastapi import status
-from google.api_core.exceptions import GoogleAPICallError
 from loguru import logger
 
 from src.api.app import create_app
-from src.api.exceptions import AnnotationGenerationError
-from src.enums.image import ImageAnnotationsGenerationStatus
-from src.schemas.image import ImageClassification
 from src.schemas.pubsub import GooglePubSubPushRequestImageClassification
 from src.services.image_service import ImageService
 
@@ -22,37 +17,13 @@ async def generate_annotations(
 ) -> None:
     logger.debug(f"Request from PubSub: {pubsub_request}")
 
-    image_hash = pubsub_request.message.attributes.image_hash
-    image_url = pubsub_request.message.attributes.image_url
-
-    try:
-        image_classification = image_service.get_image_classification(image_hash=image_hash)
-        if not image_classification:
-            msg = f"Image Classification not found in db: {image_hash=}"
-            logger.info(msg)
-            raise AnnotationGenerationError(detail=msg, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        if image_classification.status.is_done():
-            logger.info(f"Image Classification is already processed: {image_classification=}")
-            return
-
-        image_content = await image_service.get_image_content_from_url(url=image_url)
-        annotations = image_service.generate_annotations(contents=image_content)
-
-        image_classification = ImageClassification(
-            image_hash=image_hash,
-            image_url=image_url,
-            annotations=annotations,
-            status=ImageAnnotationsGenerationStatus.SUCCESS,
-        )
-        image_service.upsert_image_classification(image_classification=image_classification)
-    except (HTTPException, GoogleAPICallError):
-        logger.exception(f"Error generating annotations for Image Classification: {image_hash=}", exc_info=True)
-        image_classification = ImageClassification(
-            image_hash=image_hash,
-            image_url=image_url,
-            status=ImageAnnotationsGenerationStatus.ERROR,
-        )
-        image_service.upsert_image_classification(image_classification=image_classification)
+    await image_service.process_generation_request(
+        image_hash=pubsub_request.message.attributes.image_hash,
+        image_url=pubsub_request.message.attributes.image_url,
+        blob_name=pubsub_request.message.attributes.blob_name,
+        content=pubsub_request.message.data if pubsub_request.message.attributes.inline else None,
+        message_id=pubsub_request.message.messageId,
+    )
 
 
 @app.post("/generate_annotations_dlq", status_code=status.HTTP_204_NO_CONTENT)
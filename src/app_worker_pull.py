@@ -0,0 +1,150 @@
+"""
+Worker pulling generation requests from the Pub/Sub subscription, an alternative to the push based `app_worker`.
+
+Received messages are grouped into batches sharing a single multi-get and multi-put, images of a batch are downloaded
+concurrently and their inference is batched. Every message is acked or nacked on its own, nacked messages are
+redelivered and land in the dead letter queue after the subscription's max delivery attempts, as in push mode.
+
+Run with `python -m src.app_worker_pull`, set `PUBSUB_EMULATOR_HOST` to run against the emulator.
+"""
+
+import asyncio
+import contextlib
+
+from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1.subscriber.message import Message
+from loguru import logger
+from pydantic import ValidationError
+
+from src.api.exceptions import GenerationInProgressError
+from src.config import Settings
+from src.config import get_settings
+from src.schemas.pubsub import GooglePubSubMessageImageClassificationAttributes
+from src.services.image_service import ImageService
+from src.services.image_service import create_image_service
+from src.services.model_registry import get_model_registry
+from src.utils.batching import MicroBatcher
+from src.utils.http import get_http_client
+from src.utils.tracing import configure_tracing
+
+
+class PullWorker:
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.subscription = settings.pubsub_generate_annotations_subscription
+        self.project = settings.pubsub_project_id or settings.google_project_id
+        self.batcher: MicroBatcher[Message, bool] = MicroBatcher(
+            self.process_batch,
+            max_batch_size=settings.pull_batch_max_size,
+            max_wait=settings.pull_batch_max_wait_ms / 1000,
+            max_concurrency=settings.pull_max_concurrent_batches,
+            name="pull_worker",
+        )
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def create_image_service(self) -> ImageService:
+        return create_image_service(self.settings)
+
+    async def run(self) -> None:
+        if not self.subscription:
+            msg = "PUBSUB_GENERATE_ANNOTATIONS_SUBSCRIPTION is required by the pull worker"
+            raise ValueError(msg)
+
+        configure_tracing(enabled=self.settings.tracing_enabled)
+        # do not lease messages before the model can process them
+        await asyncio.to_thread(get_model_registry().load, warm_up=self.settings.ml_model_warm_up)
+
+        self._loop = asyncio.get_running_loop()
+        subscriber = pubsub_v1.SubscriberClient()
+        subscription_path = subscriber.subscription_path(self.project, self.subscription)
+        flow_control = pubsub_v1.types.FlowControl(
+            max_messages=self.settings.pull_max_outstanding_messages,
+            max_bytes=self.settings.pull_max_outstanding_bytes,
+        )
+
+        logger.info(f"Pulling messages: {subscription_path=}, {flow_control=}")
+        streaming_pull_future = subscriber.subscribe(
+            subscription_path,
+            callback=self.callback,
+            flow_control=flow_control,
+        )
+        try:
+            await asyncio.wrap_future(streaming_pull_future)
+        finally:
+            streaming_pull_future.cancel()
+            with contextlib.suppress(Exception):
+                await asyncio.to_thread(streaming_pull_future.result)
+            subscriber.close()
+            await self.batcher.close()
+            await get_http_client().aclose()
+
+    def callback(self, message: Message) -> None:
+        """Called by the subscriber threads for every received message."""
+        asyncio.run_coroutine_threadsafe(self.handle_message(message), self._loop)
+
+    async def handle_message(self, message: Message) -> None:
+        try:
+            ack = await self.batcher.submit(message)
+        except GenerationInProgressError:
+            # another worker processes the image, the redelivery finds it done or takes over its expired lease
+            ack = False
+        except Exception:  # noqa: BLE001
+            logger.exception(f"Error processing message: {message.message_id=}")
+            ack = False
+
+        if ack:
+            message.ack()
+        else:
+            message.nack()
+
+    async def process_batch(self, messages: list[Message]) -> list[bool | Exception]:
+        """Process the messages, return for each one whether it is acked or the exception it failed with."""
+        image_service = self.create_image_service()
+
+        requests: list[GooglePubSubMessageImageClassificationAttributes | Exception] = []
+        for message in messages:
+            try:
+                requests.append(GooglePubSubMessageImageClassificationAttributes(**message.attributes))
+            except ValidationError as e:
+                requests.append(e)
+
+        image_hashes = {request.image_hash for request in requests if not isinstance(request, Exception)}
+        # one multi-get fills the cache read by every message of the batch
+        await image_service.get_image_classifications(image_hashes=list(image_hashes))
+
+        # writes of the batch share multi-puts, a message is acked only once its own result is stored
+        async with image_service.coalesce_writes():
+            results = await asyncio.gather(
+                *(
+                    self.process_request(image_service, message=message, request=request)
+                    for message, request in zip(messages, requests, strict=True)
+                ),
+                return_exceptions=True,
+            )
+
+        return [result if isinstance(result, Exception) else True for result in results]
+
+    @staticmethod
+    async def process_request(
+        image_service: ImageService,
+        *,
+        message: Message,
+        request: GooglePubSubMessageImageClassificationAttributes | Exception,
+    ) -> None:
+        if isinstance(request, Exception):
+            raise request
+        await image_service.process_generation_request(
+            image_hash=request.image_hash,
+            image_url=request.image_url,
+            blob_name=request.blob_name,
+            content=message.data if request.inline else None,
+            message_id=message.message_id,
+        )
+
+
+def main() -> None:
+    asyncio.run(PullWorker(settings=get_settings()).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 from functools import lru_cache
 from pathlib import Path
 from typing import Any
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 
 ROOT_DIR = Path(__file__).absolute().parent.parent
 MODEL_DIR = str(ROOT_DIR / "ml_models/google/vit-base-patch16-224")
+ONNX_MODEL_PATH = str(ROOT_DIR / "ml_models/onnx/vit-base-patch16-224.onnx")
 
 
 class Settings(BaseSettings):
@@ -14,9 +16,60 @@ class Settings(BaseSettings):
     version: str = "0.0.1"
 
     max_file_size: int = 5 * 1024 * 1024  # 5MB
+    upload_chunk_size: int = 256 * 1024  # Bytes read from the uploaded file at once
     allowed_content_types: tuple[str, ...] = ("image/jpeg", "image/png")
+    batch_max_images: int = 100  # Images of a single /what/batch request, counting those in archives
+    batch_max_bytes: int = 64 * 1024 * 1024  # 64MB, images of a single /what/batch request, decompressed from archives
     ml_model_dir: str = MODEL_DIR
+    ml_model_preload: bool = True  # Load the model on startup instead of on the first request
+    # "int8" dynamic quantization, "compile" torch.compile, "onnx" requires the optional onnxruntime and onnxscript
+    ml_model_backend: Literal["eager", "int8", "compile", "torchscript", "onnx"] = "eager"
+    ml_model_onnx_path: str = ONNX_MODEL_PATH  # Exported on startup if it does not exist
+    fast_preprocessing: bool = True  # Draft mode JPEG decoding and NumPy normalization instead of ViTImageProcessor
+    ml_model_warm_up: bool = True  # Run a dummy forward pass after loading the model
     num_annotations: int = 5  # Number of top annotations to display
+    annotation_min_confidence: float = 0.0  # Annotations below this confidence are left out
+    logits_store_dir: str | None = None  # Keep float16 logits of classified images to rerank them without inference
+
+    metrics_enabled: bool = False  # Serve Prometheus metrics, including per-stage timings, on unauthenticated /metrics
+    tracing_enabled: bool = False  # Open OpenTelemetry spans for the stages, requires the optional opentelemetry-api
+    profiling_enabled: bool = False  # Serve the sampling profiler on /admin/profile
+    profiling_token: str | None = None  # Required in the X-Profiling-Token header, profiling is refused without it
+
+    inference_batch_max_size: int = 8  # Max images in a single forward pass
+    inference_batch_max_wait_ms: int = 10  # Max time the first image waits for the batch to fill up
+    inference_workers: int = 1  # Batches processed at the same time, each in its own thread
+    inference_torch_threads: int | None = None  # Intra-op threads used by torch, torch default if not set
+    inference_max_queue_depth: int = 32  # Images waiting for inference before new ones are rejected with 503
+
+    io_workers: int = 32  # Threads for blocking Datastore, Storage and PubSub calls
+    io_max_pending: int = 256  # Blocking calls queued or running before new ones are rejected with 503
+    cpu_workers: int = 2  # Threads for CPU bound image work besides inference, e.g. perceptual hashing
+    cpu_max_pending: int = 64  # CPU bound tasks queued or running, perceptual hashes are skipped above it
+    datastore_transaction_retries: int = 3  # Retries of transactions aborted by concurrent writes of the same entities
+    datastore_transaction_retry_backoff: float = 0.05  # Seconds before the first retry, doubled for every next one
+    datastore_write_batch_max_wait_ms: int = 5  # Time the first write of a `coalesce_writes` block waits for more
+
+    single_flight_across_instances: bool = False  # Also deduplicate work with other instances using Datastore leases
+    single_flight_lease_ttl: float = 60  # Seconds before a lease of an unresponsive instance can be taken over
+    single_flight_poll_interval: float = 0.5  # Seconds between checks for a result generated by another instance
+
+    # long-poll and server-sent events of `/what/status`, requests waiting for an image share one Datastore poll
+    status_wait_max: float = 30  # Seconds a status request or event stream waits for the classification to finish
+    status_poll_interval: float = 1  # Seconds between reads of classifications finished by a worker or another instance
+    # HTTP caching of `/what/status`, successful classifications change only when they are reranked
+    status_cache_max_age: int = 3600  # Seconds CDNs and clients keep successful classifications before revalidating
+    status_etag_index_max_entries: int = 1_000_000  # ETags of served classifications answering 304 without Datastore
+
+    classification_cache_max_entries: int = 10_000
+    classification_cache_max_bytes: int = 32 * 1024 * 1024  # 32MB
+    classification_cache_ttl_done: float = 3600  # Seconds to cache SUCCESS and ERROR classifications
+    classification_cache_ttl_pending: float = 2  # Seconds to cache PENDING and QUEUED classifications, 0 disables
+
+    # reuse annotations of images whose perceptual hash (64 bit dHash) differs in at most `max_distance` bits
+    near_duplicate_enabled: bool = False
+    near_duplicate_max_distance: int = 4
+    near_duplicate_max_entries: int = 100_000  # Perceptual hashes of classified images indexed in memory
 
     google_project_id: str
     pubsub_project_id: str | None = None
@@ -24,7 +77,49 @@ class Settings(BaseSettings):
     cloud_storage_project_id: str | None = None
 
     pubsub_generate_annotations_topic: str
+    pubsub_batch_max_messages: int = 100
+    pubsub_batch_max_bytes: int = 1024 * 1024  # 1MB
+    pubsub_batch_max_latency: float = 0.01  # Seconds a batch waits for more messages before it is sent
+    pubsub_flow_control_max_messages: int = 1000  # Messages published but not yet sent
+    pubsub_flow_control_max_bytes: int = 10 * 1024 * 1024  # 10MB
+    # "block" would stall the event loop, so by default publishing over the limits fails
+    pubsub_flow_control_limit_exceeded_behavior: Literal["block", "error", "ignore"] = "error"
+
+    # image download in the worker, "storage" reads through the authenticated GCS client instead of the public URL
+    worker_image_source: Literal["url", "storage"] = "url"
+    # duplicate deliveries: a worker holds a Datastore lease on the image while processing it, redeliveries meanwhile
+    # are nacked and retried later, redeliveries of recently processed messages are acked without any work
+    worker_processing_lease_ttl: float = 120  # Seconds before the lease of an unresponsive worker expires, 0 disables
+    worker_processed_messages_max_entries: int = 100_000  # Message ids remembered per worker
+    worker_processed_messages_ttl: float = 3600  # Seconds
+    http_timeout: float = 10  # Seconds
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30  # Seconds an idle connection is kept open
+    http_retries: int = 3  # Retries of connection errors, timeouts and 429/502/503/504 responses
+    http_retry_backoff: float = 0.1  # Seconds before the first retry, doubled for every next one
+    http2: bool = True  # Used only when the optional `h2` package is installed
+
+    # images resized for inference and smaller than this are sent in the message instead of through storage, 0 disables
+    pubsub_inline_image_max_bytes: int = 256 * 1024  # 256KB
+    pubsub_inline_image_size: int = 224  # Width and height of the model input
+
+    # pull worker, `src.app_worker_pull`
+    pubsub_generate_annotations_subscription: str | None = None
+    pull_max_outstanding_messages: int = 64  # Messages leased by the subscriber and not yet acked or nacked
+    pull_max_outstanding_bytes: int = 16 * 1024 * 1024  # 16MB
+    pull_batch_max_size: int = 16  # Messages processed together, sharing a multi-get and a multi-put
+    pull_batch_max_wait_ms: int = 50  # Time the first message of a batch waits for more messages
+    pull_max_concurrent_batches: int = 4
     cloud_storage_bucket: str
+    # "acl" makes every uploaded image public with an extra call, "public_bucket" relies on bucket level access
+    # (allUsers as Storage Object Viewer), "signed" keeps the bucket private and sends V4 signed URLs to the worker,
+    # which needs a service account key or the IAM signBlob permission, classifications keep the unsigned URLs
+    cloud_storage_url_mode: Literal["acl", "public_bucket", "signed"] = "acl"
+    cloud_storage_signed_url_expiration: int = (
+        7 * 24 * 3600
+    )  # Seconds, the V4 maximum, as long as Pub/Sub keeps messages
+    cloud_storage_chunk_size: int | None = None  # Multiple of 256KB, chunks of resumable uploads of files above 8MB
     datastore_database: str | None = None
 
     @property
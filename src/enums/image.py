@@ -10,3 +10,30 @@ class ImageAnnotationsGenerationStatus(StrEnum):
 
     def is_done(self) -> bool:
         return self in (self.SUCCESS, self.ERROR)
+
+    def can_transition_to(self, status: "ImageAnnotationsGenerationStatus") -> bool:
+        """
+        Statuses only move forward: a finished classification is never queued again
+        and a successful one is only replaced by another success, e.g. reranked annotations.
+        """
+        return status in _TRANSITIONS[self]
+
+
+_TRANSITIONS = {
+    ImageAnnotationsGenerationStatus.PENDING: {
+        ImageAnnotationsGenerationStatus.QUEUED,
+        ImageAnnotationsGenerationStatus.SUCCESS,
+        ImageAnnotationsGenerationStatus.ERROR,
+    },
+    ImageAnnotationsGenerationStatus.QUEUED: {
+        ImageAnnotationsGenerationStatus.SUCCESS,
+        ImageAnnotationsGenerationStatus.ERROR,
+    },
+    ImageAnnotationsGenerationStatus.SUCCESS: {
+        ImageAnnotationsGenerationStatus.SUCCESS,
+    },
+    ImageAnnotationsGenerationStatus.ERROR: {
+        ImageAnnotationsGenerationStatus.SUCCESS,
+        ImageAnnotationsGenerationStatus.ERROR,
+    },
+}
@@ -1,3 +1,5 @@
+from dataclasses import dataclass
+
 from pydantic import BaseModel
 from pydantic import ConfigDict
 from pydantic import Extra
@@ -16,5 +18,30 @@ class ImageClassification(BaseModel):
     image_url: str | None = None
     annotations: list[ImageAnnotation] = []
     status: ImageAnnotationsGenerationStatus
+    perceptual_hash: str | None = None
 
     model_config = ConfigDict(extra=Extra.allow)
+
+
+class ImageBatchItem(BaseModel):
+    """Result of a single image of a batch, streamed as one NDJSON line."""
+
+    index: int  # position of the image in the request, images of archives follow each other
+    filename: str | None = None
+    image_hash: str | None = None
+    image_classification: ImageClassification | None = None
+    error: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class ImageUpload:
+    """Uploaded image read into memory once, shared by hashing, inference and storage upload."""
+
+    image_hash: str
+    content: bytes
+    content_type: str
+    filename: str | None = None
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
@@ -1,21 +1,20 @@
-from base64 import b64decode
 from typing import Any
 
-from pydantic import Base64Str
+from pydantic import Base64Bytes
 from pydantic import BaseModel
 from pydantic import ConfigDict
 from pydantic import Extra
 
 
 class GooglePubSubMessageBase(BaseModel):
-    data: Base64Str
+    data: Base64Bytes = b""
     messageId: str  # noqa: N815
     attributes: Any = None
 
     model_config = ConfigDict(extra=Extra.ignore)
 
     def decode(self) -> str:
-        return b64decode(self.data).decode("utf8")
+        return self.data.decode("utf8")
 
 
 class GooglePubSubPushRequestBase(BaseModel):
@@ -26,7 +25,9 @@ class GooglePubSubPushRequestBase(BaseModel):
 
 class GooglePubSubMessageImageClassificationAttributes(BaseModel):
     image_hash: str
-    image_url: str
+    image_url: str | None = None
+    blob_name: str | None = None
+    inline: bool = False  # the image, resized for inference, is the message data
 
 
 class GooglePubSubMessageImageClassification(GooglePubSubMessageBase):
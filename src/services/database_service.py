@@ -1,8 +1,26 @@
+import random
+import time
+from collections.abc import Callable
+from collections.abc import Iterator
+from collections.abc import Sequence
+from functools import partial
+from typing import TypeVar
+
 from fastapi import Depends
+from google.api_core.exceptions import Aborted
 from google.cloud import datastore
+from loguru import logger
 
 from src.config import Settings
 from src.config import get_settings
+from src.utils.helpers import chunked
+from src.utils.tracing import timed
+
+# Datastore limits for a single lookup and a single commit
+MAX_KEYS_PER_GET = 1000
+MAX_ENTITIES_PER_PUT = 500
+
+R = TypeVar("R")
 
 
 class DatabaseService:
@@ -16,15 +34,143 @@ class DatabaseService:
     @property
     def client(self) -> datastore.Client:
         if self._client is None:
-            self._client = datastore.Client(project=self.project, database=self.database)
+            type(self)._client = datastore.Client(project=self.project, database=self.database)
         return self._client
 
+    @timed("datastore_get")
     def get_entity(self, *, collection: str, entity_id: str) -> datastore.Entity | None:
         entity_key = self.client.key(collection, entity_id)
         return self.client.get(entity_key)
 
+    @timed("datastore_put")
     def upsert_entity(self, *, collection: str, entity_id: str, data: dict) -> None:
         entity_key = self.client.key(collection, entity_id)
         entity = datastore.Entity(key=entity_key)
         entity.update(data)
         self.client.put(entity)
+
+    @timed("datastore_get")
+    def get_many(self, *, collection: str, entity_ids: Sequence[str]) -> dict[str, datastore.Entity]:
+        """Get many entities with multi-get lookups, missing entities are not included in the result."""
+        entities = {}
+        for ids in chunked(dict.fromkeys(entity_ids), MAX_KEYS_PER_GET):
+            keys = [self.client.key(collection, entity_id) for entity_id in ids]
+            for entity in self.client.get_multi(keys):
+                entities[entity.key.name] = entity
+        return entities
+
+    @timed("datastore_put")
+    def upsert_many(self, *, collection: str, data: dict[str, dict]) -> None:
+        """Upsert many entities, mapped by entity id, with multi-put commits."""
+        for chunk in chunked(self._build_entities(collection=collection, data=data), MAX_ENTITIES_PER_PUT):
+            self.client.put_multi(chunk)
+
+    def run_in_transaction(self, func: Callable[[], R]) -> R:
+        """
+        Run `func` in a transaction and return its result. A commit aborted by a concurrent transaction on the same
+        entities raises `Aborted`, it is retried from the start up to `datastore_transaction_retries` times.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.client.transaction():
+                    return func()
+            except Aborted:
+                if attempt >= self.settings.datastore_transaction_retries:
+                    raise
+                backoff = self.settings.datastore_transaction_retry_backoff * 2**attempt
+                logger.info(f"Datastore transaction aborted by contention, retrying: {attempt=}")
+                time.sleep(backoff * random.uniform(0.5, 1.5))  # noqa: S311
+                attempt += 1
+
+    @timed("datastore_transaction")
+    def upsert_entity_if(
+        self,
+        *,
+        collection: str,
+        entity_id: str,
+        data: dict,
+        condition: Callable[[datastore.Entity | None, dict], bool],
+    ) -> bool:
+        """
+        Upsert the entity in a transaction if `condition(stored, data)` holds, the stored entity is None if missing.
+        Return whether it was written. The transaction is retried when a concurrent write aborts it.
+        """
+        entity_key = self.client.key(collection, entity_id)
+
+        def upsert() -> bool:
+            if not condition(self.client.get(entity_key), data):
+                return False
+            entity = datastore.Entity(key=entity_key)
+            entity.update(data)
+            self.client.put(entity)
+            return True
+
+        return self.run_in_transaction(upsert)
+
+    @timed("datastore_transaction")
+    def upsert_many_if(
+        self,
+        *,
+        collection: str,
+        data: dict[str, dict],
+        condition: Callable[[datastore.Entity | None, dict], bool],
+    ) -> list[str]:
+        """
+        Upsert the entities, mapped by entity id, for which `condition(stored, data)` holds,
+        with a multi-get and a multi-put in one transaction per chunk, retried when a concurrent write aborts it.
+        Return the ids of the written entities.
+        """
+
+        def upsert(ids: list[str]) -> list[str]:
+            keys = [self.client.key(collection, entity_id) for entity_id in ids]
+            stored = {entity.key.name: entity for entity in self.client.get_multi(keys)}
+            allowed = {
+                entity_id: data[entity_id] for entity_id in ids if condition(stored.get(entity_id), data[entity_id])
+            }
+            if allowed:
+                self.client.put_multi(list(self._build_entities(collection=collection, data=allowed)))
+            return list(allowed)
+
+        written = []
+        for ids in chunked(data, MAX_ENTITIES_PER_PUT):
+            written.extend(self.run_in_transaction(partial(upsert, ids)))
+        return written
+
+    def _build_entities(self, *, collection: str, data: dict[str, dict]) -> Iterator[datastore.Entity]:
+        for entity_id, entity_data in data.items():
+            entity = datastore.Entity(key=self.client.key(collection, entity_id))
+            entity.update(entity_data)
+            yield entity
+
+    @timed("datastore_transaction")
+    def claim_lease(self, *, collection: str, entity_id: str, owner: str, ttl: float) -> bool:
+        """
+        Claim an expiring lease in a transaction, return whether `owner` holds it now.
+        A lease held by another owner can be taken over only once it expired.
+        """
+        entity_key = self.client.key(collection, entity_id)
+
+        def claim() -> bool:
+            now = time.time()
+            entity = self.client.get(entity_key)
+            if entity and entity["owner"] != owner and entity["expires_at"] > now:
+                return False
+            entity = datastore.Entity(key=entity_key)
+            entity.update({"owner": owner, "expires_at": now + ttl})
+            self.client.put(entity)
+            return True
+
+        return self.run_in_transaction(claim)
+
+    @timed("datastore_transaction")
+    def release_lease(self, *, collection: str, entity_id: str, owner: str) -> None:
+        """Release the lease if it is still held by `owner`."""
+        entity_key = self.client.key(collection, entity_id)
+
+        def release() -> None:
+            entity = self.client.get(entity_key)
+            if entity and entity["owner"] == owner:
+                self.client.delete(entity_key)
+
+        self.run_in_transaction(release)
@@ -1,85 +1,383 @@
+import asyncio
 import hashlib
 import io
+import tarfile
+import uuid
+import zipfile
+from collections.abc import AsyncIterator
+from collections.abc import Callable
+from collections.abc import Mapping
+from collections.abc import Sequence
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from functools import partial
+from pathlib import Path
 from typing import IO
+from typing import Any
+from typing import ClassVar
 
-import httpx
+import numpy as np
 import torch
-import torch.nn.functional
+from fastapi import BackgroundTasks
 from fastapi import Depends
+from fastapi import HTTPException
 from fastapi import UploadFile
+from fastapi import status
 from fastapi.exceptions import RequestValidationError
 from google.api_core.exceptions import GoogleAPICallError
+from google.api_core.exceptions import GoogleAPIError
+from google.cloud.pubsub_v1.publisher.exceptions import FlowControlLimitError
+from google.cloud.pubsub_v1.publisher.futures import Future
 from loguru import logger
 from PIL import Image
-from transformers import ViTForImageClassification
 from transformers import ViTImageProcessor
 
+from src.api.exceptions import AnnotationGenerationError
+from src.api.exceptions import GenerationInProgressError
+from src.api.exceptions import InferenceOverloadedError
 from src.config import Settings
 from src.config import get_settings
 from src.enums.image import ImageAnnotationsGenerationStatus
 from src.schemas.image import ImageAnnotation
 from src.schemas.image import ImageClassification
+from src.schemas.image import ImageUpload
+from src.services.database_service import MAX_ENTITIES_PER_PUT
 from src.services.database_service import DatabaseService
+from src.services.model_backends import Model
+from src.services.model_registry import ModelRegistry
+from src.services.model_registry import get_model_registry
 from src.services.queue_service import QueueService
 from src.services.storage_service import StorageService
+from src.utils.archives import ArchiveTooLargeError
+from src.utils.archives import is_archive
+from src.utils.archives import read_archive
+from src.utils.batching import BatcherFullError
+from src.utils.batching import MicroBatcher
+from src.utils.cache import TTLCache
+from src.utils.executors import BoundedExecutor
+from src.utils.executors import ExecutorFullError
+from src.utils.executors import get_cpu_executor
+from src.utils.executors import get_io_executor
+from src.utils.helpers import IMAGE_SIGNATURE_MAX_LENGTH
 from src.utils.helpers import get_extension_from_filename
+from src.utils.helpers import resize_image
+from src.utils.helpers import sniff_image_content_type
+from src.utils.http import HttpClient
+from src.utils.http import get_http_client
 from src.utils.logging import debug_log_function_call
+from src.utils.logits_store import LogitsStore
+from src.utils.logits_store import top_k
+from src.utils.metrics import registry
+from src.utils.notifications import NotificationHub
+from src.utils.perceptual_hash import NearDuplicateIndex
+from src.utils.perceptual_hash import dhash
+from src.utils.profiling import forward_profiler
+from src.utils.singleflight import SingleFlight
+from src.utils.tracing import timed
+
+# identifies this instance as the owner of Datastore leases
+INSTANCE_ID = uuid.uuid4().hex
+
+inference_in_flight = registry.gauge("inference_in_flight", "Images in the forward pass of the ML model.")
+
+
+@lru_cache
+def get_image_classification_cache() -> TTLCache[str, ImageClassification]:
+    settings = get_settings()
+    return TTLCache(
+        max_entries=settings.classification_cache_max_entries,
+        max_bytes=settings.classification_cache_max_bytes,
+        name="image_classification_cache",
+    )
+
+
+@lru_cache
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    return NearDuplicateIndex(
+        max_entries=get_settings().near_duplicate_max_entries,
+        name="near_duplicate_index",
+    )
+
+
+@lru_cache
+def get_processed_messages() -> TTLCache[str, bool]:
+    settings = get_settings()
+    # entries have the default size of 1, so only the number of entries bounds it
+    return TTLCache(
+        max_entries=settings.worker_processed_messages_max_entries,
+        max_bytes=settings.worker_processed_messages_max_entries,
+        name="processed_messages",
+    )
+
+
+@lru_cache
+def get_image_classification_notifications() -> NotificationHub[str, ImageClassification]:
+    return NotificationHub(name="image_classification_notifications")
+
+
+@lru_cache
+def get_image_single_flight() -> SingleFlight[ImageClassification]:
+    return SingleFlight(name="image_single_flight")
+
+
+@lru_cache
+def get_inference_executor() -> BoundedExecutor:
+    """Threads running the CPU heavy inference, so it does not block the event loop."""
+    settings = get_settings()
+    torch_threads = settings.inference_torch_threads
+    return BoundedExecutor(
+        max_workers=settings.inference_workers,
+        max_pending=settings.inference_workers,
+        name="inference",
+        initializer=(lambda: torch.set_num_threads(torch_threads)) if torch_threads else None,
+    )
+
+
+@lru_cache
+def get_inference_batcher() -> MicroBatcher[tuple[bytes, str | None], list[ImageAnnotation]]:
+    """
+    Batcher shared by all requests, so concurrent images end up in the same forward pass.
+    Batches run on an image service of the process-wide dependencies, not on the one of the request which came first.
+    """
+    settings = get_settings()
+    return MicroBatcher(
+        create_image_service(settings).process_inference_batch,
+        max_batch_size=settings.inference_batch_max_size,
+        max_wait=settings.inference_batch_max_wait_ms / 1000,
+        max_concurrency=settings.inference_workers,
+        max_pending=settings.inference_max_queue_depth,
+        name="inference",
+    )
 
 
 class ImageService:
     collection = "ImageCollection"
+    lease_collection = "ImageLease"
 
-    _ml_model_prop_name = "_ml_model"
-    _ml_model: ViTForImageClassification | None = None
+    _logits_store: LogitsStore | None = None
 
-    _ml_processor_prop_name = "_ml_processor"
-    _ml_processor: ViTImageProcessor | None = None
+    # tasks waiting for published generation requests, referenced so they are not garbage collected
+    _publish_tasks: ClassVar[set[asyncio.Task]] = set()
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         settings: Settings = Depends(get_settings),
         database_service: DatabaseService = Depends(DatabaseService),
         queue_service: QueueService = Depends(QueueService),
         storage_service: StorageService = Depends(StorageService),
+        model_registry: ModelRegistry = Depends(get_model_registry),
+        classification_cache: TTLCache[str, ImageClassification] = Depends(get_image_classification_cache),
+        io_executor: BoundedExecutor = Depends(get_io_executor),
+        single_flight: SingleFlight[ImageClassification] = Depends(get_image_single_flight),
+        http_client: HttpClient = Depends(get_http_client),
+        near_duplicate_index: NearDuplicateIndex = Depends(get_near_duplicate_index),
+        processed_messages: TTLCache[str, bool] = Depends(get_processed_messages),
+        notifications: NotificationHub[str, ImageClassification] = Depends(get_image_classification_notifications),
     ) -> None:
         self.settings = settings
         self.database_service = database_service
         self.queue_service = queue_service
         self.storage_service = storage_service
+        self.model_registry = model_registry
+        self.classification_cache = classification_cache
+        self.io_executor = io_executor
+        self.single_flight = single_flight
+        self.http_client = http_client
+        self.near_duplicate_index = near_duplicate_index
+        self.processed_messages = processed_messages
+        self.notifications = notifications
+        self._write_batcher: MicroBatcher[ImageClassification, bool] | None = None
         self.allowed_content_types = settings.allowed_content_types
 
     def get_ml_processor(self) -> ViTImageProcessor:
-        """Ugly class property hack to avoid loading the processor on every request."""
-        if not self._ml_processor:
-            logger.info("Loading ML processor")
-            processor = ViTImageProcessor.from_pretrained(self.settings.ml_model_dir)
-            setattr(
-                ImageService,
-                self._ml_processor_prop_name,
-                processor,
-            )
-        return self._ml_processor
-
-    def get_ml_model(self) -> ViTForImageClassification:
-        """Ugly class property hack to avoid loading the model on every request."""
-        if not self._ml_model:
-            logger.info("Loading ML model")
-            model = ViTForImageClassification.from_pretrained(self.settings.ml_model_dir)
-            setattr(
-                ImageService,
-                self._ml_model_prop_name,
-                model,
+        return self.model_registry.processor
+
+    def get_ml_model(self) -> Model:
+        return self.model_registry.model
+
+    def get_logits_store(self) -> LogitsStore | None:
+        """Store of the logits of every classified image, None unless `logits_store_dir` is set."""
+        if not self.settings.logits_store_dir:
+            return None
+        if self._logits_store is None:
+            type(self)._logits_store = LogitsStore(
+                Path(self.settings.logits_store_dir),
+                num_labels=self.get_ml_model().config.num_labels,
             )
-        return self._ml_model
+        return self._logits_store
 
     def validate_image(self, file: UploadFile) -> None:
         """Validate the image file is of the correct type and size."""
         if file.content_type.lower() not in self.allowed_content_types:
             raise RequestValidationError("Invalid file type. Only JPEG and PNG files are allowed.")  # noqa: EM101
 
-        if file.size > self.settings.max_file_size:
+        if file.size is not None and file.size > self.settings.max_file_size:
             raise RequestValidationError("File size is too large.")  # noqa: EM101
 
+    @timed("read_image")
+    async def read_image(self, *, file: UploadFile) -> ImageUpload:
+        """
+        Read the uploaded image in a single pass: validate it, calculate its sha256 hash and keep its content in memory.
+        Reading stops as soon as the file exceeds the size limit, the content type is sniffed from the magic bytes.
+        """
+        self.validate_image(file=file)
+
+        hash_object = hashlib.sha256()
+        chunks = []
+        size = 0
+        content_type = None
+
+        while chunk := await file.read(self.settings.upload_chunk_size):
+            size += len(chunk)
+            if size > self.settings.max_file_size:
+                raise RequestValidationError("File size is too large.")  # noqa: EM101
+
+            if content_type is None:
+                content_type = sniff_image_content_type(chunk[:IMAGE_SIGNATURE_MAX_LENGTH])
+                if content_type not in self.allowed_content_types:
+                    msg = "Invalid file type. Only JPEG and PNG files are allowed."
+                    raise RequestValidationError(msg)
+
+            hash_object.update(chunk)
+            chunks.append(chunk)
+
+        if content_type is None:
+            raise RequestValidationError("File is empty.")  # noqa: EM101
+
+        return ImageUpload(
+            image_hash=hash_object.hexdigest(),
+            content=b"".join(chunks),
+            content_type=content_type,
+            filename=file.filename,
+        )
+
+    def create_image_upload(self, *, content: bytes, filename: str | None = None) -> ImageUpload:
+        """Validate an image already read into memory, e.g. from an archive, and calculate its sha256 hash."""
+        if len(content) > self.settings.max_file_size:
+            raise RequestValidationError("File size is too large.")  # noqa: EM101
+        if not content:
+            raise RequestValidationError("File is empty.")  # noqa: EM101
+
+        content_type = sniff_image_content_type(content[:IMAGE_SIGNATURE_MAX_LENGTH])
+        if content_type not in self.allowed_content_types:
+            raise RequestValidationError("Invalid file type. Only JPEG and PNG files are allowed.")  # noqa: EM101
+
+        return ImageUpload(
+            image_hash=hashlib.sha256(content).hexdigest(),
+            content=content,
+            content_type=content_type,
+            filename=filename,
+        )
+
+    async def read_images(self, *, files: Sequence[UploadFile]) -> list[ImageUpload | RequestValidationError]:
+        """
+        Read the uploaded images and the images in uploaded zip and tar archives, in order.
+        Invalid images get the validation error in their place, so they do not fail the whole batch.
+        The request is rejected once the images held in memory exceed `batch_max_bytes`.
+        """
+        images: list[ImageUpload | RequestValidationError] = []
+        total_size = 0
+        for file in files:
+            max_images = self.settings.batch_max_images - len(images)
+            header = await file.read(IMAGE_SIGNATURE_MAX_LENGTH)
+            await file.seek(0)
+            if sniff_image_content_type(header) is None and await self.io_executor.run(is_archive, file.file):
+                try:
+                    members = await self.io_executor.run(
+                        read_archive,
+                        file.file,
+                        max_file_size=self.settings.max_file_size,
+                        max_files=max_images,
+                        max_total_size=self.settings.batch_max_bytes - total_size,
+                    )
+                except (ArchiveTooLargeError, tarfile.TarError, zipfile.BadZipFile) as e:
+                    raise RequestValidationError(str(e)) from e
+                total_size += sum(len(content) for _, content in members)
+                for filename, content in members:
+                    try:
+                        images.append(self.create_image_upload(content=content, filename=filename))
+                    except RequestValidationError as e:
+                        images.append(e)
+                continue
+
+            if max_images <= 0:
+                msg = f"Too many images, at most {self.settings.batch_max_images} are allowed."
+                raise RequestValidationError(msg)
+            try:
+                image = await self.read_image(file=file)
+            except RequestValidationError as e:
+                images.append(e)
+                continue
+            total_size += len(image.content)
+            if total_size > self.settings.batch_max_bytes:
+                msg = f"Images are too large, at most {self.settings.batch_max_bytes} bytes are allowed."
+                raise RequestValidationError(msg)
+            images.append(image)
+        return images
+
+    async def classify_images(
+        self,
+        *,
+        images: Sequence[ImageUpload],
+        background_tasks: BackgroundTasks,
+        queue: bool = False,
+    ) -> AsyncIterator[tuple[str, ImageClassification | HTTPException]]:
+        """
+        Classify many images, yielding `(image_hash, image_classification)` as soon as each one is known.
+        Stored classifications are looked up with a single multi-get. The missing ones are generated together,
+        so they share forward passes, or with `queue` stored with a single multi-put and published in batches.
+        Failures of single images, e.g. overloaded inference or images which cannot be decoded,
+        are yielded in place of their classification.
+        """
+        unique_images = {image.image_hash: image for image in images}
+        image_classifications = await self.get_image_classifications(image_hashes=list(unique_images))
+        for image_hash, image_classification in image_classifications.items():
+            yield image_hash, image_classification
+
+        missing = [image for image_hash, image in unique_images.items() if image_hash not in image_classifications]
+        if not missing:
+            return
+
+        if queue:
+            async with self.coalesce_writes():
+                queued = await asyncio.gather(
+                    *(
+                        self.queue_generation_request(image=image, background_tasks=background_tasks)
+                        for image in missing
+                    ),
+                )
+            for image_classification in queued:
+                yield image_classification.image_hash, image_classification
+            return
+
+        # enough images in flight to fill a forward pass, without taking the whole inference queue
+        semaphore = asyncio.Semaphore(self.settings.inference_batch_max_size)
+
+        async def generate(image: ImageUpload) -> tuple[str, ImageClassification | HTTPException]:
+            async with semaphore:
+                try:
+                    return image.image_hash, await self.generate_image_classification(
+                        image_hash=image.image_hash,
+                        contents=image.content,
+                    )
+                except HTTPException as e:
+                    return image.image_hash, e
+                except (OSError, ValueError) as e:
+                    # content sniffed as an image which cannot be decoded, e.g. truncated or corrupt
+                    logger.info(f"Image cannot be decoded: {image.image_hash=}, {e=}")
+                    return image.image_hash, HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail=f"Image cannot be decoded: {image.filename or image.image_hash}",
+                    )
+
+        tasks = [asyncio.ensure_future(generate(image)) for image in missing]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
     @staticmethod
     async def calculate_hash(*, file: UploadFile) -> str:
         """Calculate the sha256 hash of the file."""
@@ -95,86 +393,867 @@ class ImageService:
         await file.seek(0)
         return hash_object.hexdigest()
 
-    def get_image_classification(self, *, image_hash: str) -> ImageClassification | None:
-        data = self.database_service.get_entity(collection=self.collection, entity_id=image_hash)
-        return ImageClassification(**data) if data else None
+    async def get_image_classification(self, *, image_hash: str, use_cache: bool = True) -> ImageClassification | None:
+        cached = self.classification_cache.get(image_hash) if use_cache else None
+        if cached is not None:
+            return cached.model_copy()
 
-    def upsert_image_classification(self, *, image_classification: ImageClassification) -> None:
-        data = image_classification.model_dump()
-        self.database_service.upsert_entity(
+        data = await self.io_executor.run(
+            self.database_service.get_entity,
+            collection=self.collection,
+            entity_id=image_hash,
+        )
+        image_classification = ImageClassification(**data) if data else None
+        if image_classification:
+            self._cache_image_classification(image_classification)
+        return image_classification
+
+    async def get_image_classifications(self, *, image_hashes: Sequence[str]) -> dict[str, ImageClassification]:
+        """Get many image classifications, cached ones first and the rest with a single multi-get."""
+        image_classifications = {}
+        missing = []
+        for image_hash in image_hashes:
+            cached = self.classification_cache.get(image_hash)
+            if cached is not None:
+                image_classifications[image_hash] = cached.model_copy()
+            else:
+                missing.append(image_hash)
+
+        if missing:
+            entities = await self.io_executor.run(
+                self.database_service.get_many,
+                collection=self.collection,
+                entity_ids=missing,
+            )
+            for image_hash, data in entities.items():
+                image_classification = ImageClassification(**data)
+                self._cache_image_classification(image_classification)
+                image_classifications[image_hash] = image_classification
+
+        return image_classifications
+
+    async def upsert_image_classification(self, *, image_classification: ImageClassification) -> bool:
+        """
+        Store the image classification if its status may follow the stored one, return whether it was stored.
+        The check and the write run in a transaction, so a late `queued` never overwrites a `success`.
+        """
+        if not self._can_follow_cached(image_classification):
+            return False
+
+        if self._write_batcher is not None:
+            return await self._write_batcher.submit(image_classification.model_copy())
+
+        stored = await self.io_executor.run(
+            self.database_service.upsert_entity_if,
             collection=self.collection,
             entity_id=image_classification.image_hash,
-            data=data,
+            data=image_classification.model_dump(),
+            condition=self._can_replace,
+        )
+        if stored:
+            self._cache_image_classification(image_classification)
+        else:
+            self._refuse_transition(image_classification)
+        return stored
+
+    async def upsert_image_classifications(self, *, image_classifications: Sequence[ImageClassification]) -> None:
+        """Store many image classifications in transactions, leaving out those whose status may not follow."""
+        await self._upsert_image_classifications(
+            image_classifications=[
+                image_classification
+                for image_classification in image_classifications
+                if self._can_follow_cached(image_classification)
+            ],
+        )
+
+    async def _upsert_image_classifications(
+        self,
+        *,
+        image_classifications: Sequence[ImageClassification],
+    ) -> set[str]:
+        """Return the hashes of the stored image classifications, the cache is updated only once they are stored."""
+        if not image_classifications:
+            return set()
+
+        stored = set(
+            await self.io_executor.run(
+                self.database_service.upsert_many_if,
+                collection=self.collection,
+                data={
+                    image_classification.image_hash: image_classification.model_dump()
+                    for image_classification in image_classifications
+                },
+                condition=self._can_replace,
+            ),
+        )
+        for image_classification in image_classifications:
+            if image_classification.image_hash in stored:
+                self._cache_image_classification(image_classification)
+            else:
+                self._refuse_transition(image_classification)
+        return stored
+
+    @staticmethod
+    def _can_replace(stored: Mapping | None, data: dict) -> bool:
+        return stored is None or ImageAnnotationsGenerationStatus(stored["status"]).can_transition_to(data["status"])
+
+    def _can_follow_cached(self, image_classification: ImageClassification) -> bool:
+        """
+        Skip the write when the cached status already refuses the transition.
+        Statuses only move forward and every later status refuses it as well, so a stale cache never skips wrongly.
+        """
+        cached = self.classification_cache.get(image_classification.image_hash)
+        if cached is None or cached.status.can_transition_to(image_classification.status):
+            return True
+        logger.info(
+            f"Image Classification status cannot change: {image_classification.image_hash=}, "
+            f"{cached.status=}, {image_classification.status=}",
+        )
+        return False
+
+    def _refuse_transition(self, image_classification: ImageClassification) -> None:
+        # the stored status moved ahead of the cached one, the next read loads it
+        logger.info(
+            f"Image Classification status cannot change from the stored one: {image_classification.image_hash=}, "
+            f"{image_classification.status=}",
+        )
+        self.classification_cache.delete(image_classification.image_hash)
+
+    @asynccontextmanager
+    async def coalesce_writes(self) -> AsyncIterator[None]:
+        """
+        Batch the image classification upserts made concurrently within the block into multi-puts.
+        Every upsert still waits for its own write and returns whether it was stored,
+        so callers act on stored results only. Upserts started in the block must finish in it.
+        """
+        if self._write_batcher is not None:  # already coalescing, the outermost block owns the batcher
+            yield
+            return
+
+        self._write_batcher = MicroBatcher(
+            self._process_write_batch,
+            max_batch_size=MAX_ENTITIES_PER_PUT,
+            max_wait=self.settings.datastore_write_batch_max_wait_ms / 1000,
+            name="datastore_write",
+        )
+        try:
+            yield
+        finally:
+            batcher, self._write_batcher = self._write_batcher, None
+            await batcher.close()
+
+    async def _process_write_batch(self, image_classifications: list[ImageClassification]) -> list[bool]:
+        """
+        Store the batch with a single multi-put. Many updates of the same image are merged and only the last one
+        is written, an update whose status may not follow the one before it in the batch is refused.
+        """
+        merged: dict[str, ImageClassification] = {}
+        accepted = []
+        for image_classification in image_classifications:
+            previous = merged.get(image_classification.image_hash)
+            can_follow = previous is None or previous.status.can_transition_to(image_classification.status)
+            if can_follow:
+                merged[image_classification.image_hash] = image_classification
+            accepted.append(can_follow)
+
+        stored = await self._upsert_image_classifications(image_classifications=list(merged.values()))
+        return [
+            can_follow and image_classification.image_hash in stored
+            for image_classification, can_follow in zip(image_classifications, accepted, strict=True)
+        ]
+
+    def _cache_image_classification(self, image_classification: ImageClassification) -> None:
+        """
+        Results of finished classifications never change, so they are cached for long and requests waiting for them
+        are notified. Pending ones are cached only briefly, since another instance may finish them.
+        """
+        ttl = (
+            self.settings.classification_cache_ttl_done
+            if image_classification.status.is_done()
+            else self.settings.classification_cache_ttl_pending
+        )
+        self.classification_cache.set(
+            image_classification.image_hash,
+            image_classification.model_copy(),
+            ttl=ttl,
+            size=len(image_classification.model_dump_json()),
+        )
+        if image_classification.status.is_done():
+            self.notifications.publish(image_classification.image_hash, image_classification.model_copy())
+        if (
+            self.settings.near_duplicate_enabled
+            and image_classification.perceptual_hash
+            and image_classification.status == ImageAnnotationsGenerationStatus.SUCCESS
+        ):
+            perceptual_hash = int(image_classification.perceptual_hash, 16)
+            self.near_duplicate_index.add(perceptual_hash, image_classification.image_hash)
+
+    async def generate_image_classification(self, *, image_hash: str, contents: bytes) -> ImageClassification:
+        """
+        Generate the image classification synchronously and store it.
+        Concurrent requests for the same image share a single inference.
+        """
+        image_classification = await self.single_flight.do(
+            f"generate:{image_hash}",
+            partial(self._generate_image_classification, image_hash=image_hash, contents=contents),
+        )
+        return image_classification.model_copy()
+
+    async def _generate_image_classification(self, *, image_hash: str, contents: bytes) -> ImageClassification:
+        lease_id = f"generate:{image_hash}"
+        if not await self._claim_lease(lease_id):
+            logger.info(f"Image Classification is being generated by another instance: {image_hash=}")
+            image_classification = await self._wait_for_image_classification(image_hash=image_hash)
+            if image_classification:
+                return image_classification
+
+        image_classification = ImageClassification(
+            image_hash=image_hash,
+            status=ImageAnnotationsGenerationStatus.PENDING,
+            perceptual_hash=await self.calculate_perceptual_hash(contents),
+        )
+
+        try:
+            try:
+                image_classification.annotations = await self.generate_or_reuse_annotations(
+                    contents=contents,
+                    perceptual_hash=image_classification.perceptual_hash,
+                    image_hash=image_hash,
+                )
+                image_classification.status = ImageAnnotationsGenerationStatus.SUCCESS
+            except AnnotationGenerationError:
+                image_classification.status = ImageAnnotationsGenerationStatus.ERROR
+                logger.exception(
+                    f"Error generating annotations for Image Classification: {image_classification=}",
+                    exc_info=True,
+                )
+            await self.upsert_image_classification(image_classification=image_classification)
+        finally:
+            await self._release_lease(lease_id)
+        return image_classification
+
+    async def queue_generation_request(
+        self,
+        *,
+        image: ImageUpload,
+        background_tasks: BackgroundTasks,
+    ) -> ImageClassification:
+        """
+        Store the pending image classification and send the generation request to the worker in the background.
+        Concurrent requests for the same image share a single upload and message.
+        """
+        image_classification = await self.single_flight.do(
+            f"queue:{image.image_hash}",
+            partial(self._queue_generation_request, image=image, background_tasks=background_tasks),
         )
-        self.database_service.get_entity(collection=self.collection, entity_id=image_classification.image_hash)
+        return image_classification.model_copy()
 
-    async def upload_to_storage(self, *, file: IO, blob_name: str, content_type: str | None = None) -> str:
-        return self.storage_service.upload(
+    async def _queue_generation_request(
+        self,
+        *,
+        image: ImageUpload,
+        background_tasks: BackgroundTasks,
+    ) -> ImageClassification:
+        image_hash = image.image_hash
+        image_classification = ImageClassification(
+            image_hash=image_hash,
+            status=ImageAnnotationsGenerationStatus.PENDING,
+        )
+
+        # the lease is not released, the stored classification prevents duplicates once the lease expires
+        if not await self._claim_lease(f"queue:{image_hash}"):
+            logger.info(f"Image Classification is being queued by another instance: {image_hash=}")
+            return image_classification
+
+        if not await self.upsert_image_classification(image_classification=image_classification):
+            # `pending` only follows a missing classification, another request stored it first
+            logger.info(f"Image Classification is already queued: {image_hash=}")
+            return await self.get_image_classification(image_hash=image_hash) or image_classification
+
+        background_tasks.add_task(
+            self.send_generation_request_to_worker,
+            image=image,
+            image_classification=image_classification,
+        )
+        return image_classification
+
+    async def _claim_lease(self, lease_id: str) -> bool:
+        """Claim a Datastore lease, always succeeds if deduplication across instances is disabled."""
+        if not self.settings.single_flight_across_instances:
+            return True
+        return await self.io_executor.run(
+            self.database_service.claim_lease,
+            collection=self.lease_collection,
+            entity_id=lease_id,
+            owner=INSTANCE_ID,
+            ttl=self.settings.single_flight_lease_ttl,
+        )
+
+    async def _release_lease(self, lease_id: str) -> None:
+        if not self.settings.single_flight_across_instances:
+            return
+        await self.io_executor.run(
+            self.database_service.release_lease,
+            collection=self.lease_collection,
+            entity_id=lease_id,
+            owner=INSTANCE_ID,
+        )
+
+    async def _wait_for_image_classification(self, *, image_hash: str) -> ImageClassification | None:
+        """Poll Datastore until the image classification is done or the lease of the other instance expires."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.settings.single_flight_lease_ttl
+        while loop.time() < deadline:
+            image_classification = await self.get_image_classification(image_hash=image_hash, use_cache=False)
+            if image_classification and image_classification.status.is_done():
+                return image_classification
+            await asyncio.sleep(self.settings.single_flight_poll_interval)
+        return None
+
+    async def wait_for_image_classification(self, *, image_hash: str, timeout: float) -> ImageClassification | None:
+        """
+        Wait up to `timeout` seconds for the image classification to finish, return None if it does not.
+        Classifications finished by this instance are notified at once. Those finished by a worker or another
+        instance are read from Datastore every `status_poll_interval` by a single poll shared by all waiting requests.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                image_classification = await asyncio.wait_for(
+                    self.single_flight.do(f"wait:{image_hash}", partial(self._poll_image_classification, image_hash)),
+                    remaining,
+                )
+            except TimeoutError:
+                return None
+            # the shared poll ends `status_wait_max` after the request which started it, later ones start another one
+            if image_classification is not None:
+                return image_classification
+        return None
+
+    async def _poll_image_classification(self, image_hash: str) -> ImageClassification | None:
+        # outlives the requests which started it by at most `status_wait_max`
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.settings.status_wait_max
+        while (remaining := deadline - loop.time()) > 0:
+            image_classification = await self.notifications.wait(
+                image_hash,
+                timeout=min(self.settings.status_poll_interval, remaining),
+            )
+            if image_classification is None:
+                image_classification = await self.get_image_classification(image_hash=image_hash, use_cache=False)
+            if image_classification and image_classification.status.is_done():
+                return image_classification
+        return None
+
+    async def upload_to_storage(
+        self,
+        *,
+        file: IO,
+        blob_name: str,
+        content_type: str | None = None,
+        size: int | None = None,
+        content_addressed: bool = False,
+    ) -> str:
+        return await self.io_executor.run(
+            self.storage_service.upload,
             bucket_name=self.settings.cloud_storage_bucket,
             blob_name=blob_name,
             file=file,
             content_type=content_type,
+            size=size,
+            content_addressed=content_addressed,
         )
 
     @debug_log_function_call
     async def send_generation_request_to_worker(
         self,
         *,
-        file: UploadFile,
+        image: ImageUpload,
+        image_classification: ImageClassification,
+    ) -> None:
+        """
+        Add a message for the worker to the current Pub/Sub batch.
+        Small images are resized for inference and sent in the message, bigger ones are uploaded to storage first.
+        The classification keeps the unsigned URL of the image, a private bucket only signs the one sent to the worker,
+        so no expiring URL is stored.
+        The cached image_classification status is updated to `queued` once the message is sent, without waiting for it.
+        """
+        try:
+            inline_content = await self.encode_inline_image(image=image)
+            if inline_content is not None:
+                future = self.queue_service.publish_future(
+                    message=inline_content,
+                    image_hash=image_classification.image_hash,
+                    inline="true",
+                )
+            else:
+                blob_name = f"{image_classification.image_hash}{get_extension_from_filename(image.filename or '')}"
+                image_classification.image_url = await self.upload_to_storage(
+                    file=io.BytesIO(image.content),
+                    blob_name=blob_name,
+                    content_type=image.content_type,
+                    size=image.size,
+                    content_addressed=True,
+                )
+                image_url = image_classification.image_url
+                if self.settings.cloud_storage_url_mode == "signed":
+                    image_url = await self.io_executor.run(
+                        self.storage_service.sign_url,
+                        bucket_name=self.settings.cloud_storage_bucket,
+                        blob_name=blob_name,
+                    )
+                future = self.queue_service.publish_future(
+                    message=image_classification.image_hash,
+                    image_hash=image_classification.image_hash,
+                    image_url=image_url,
+                    blob_name=blob_name,
+                )
+        except (GoogleAPICallError, FlowControlLimitError):
+            await self._fail_generation_request(image_classification=image_classification)
+            return
+
+        self.track_generation_request(future=future, image_classification=image_classification)
+
+    async def encode_inline_image(self, *, image: ImageUpload) -> bytes | None:
+        """Return the image resized to the model input as PNG, None if inlining is disabled or the result is too big."""
+        if self.settings.pubsub_inline_image_max_bytes <= 0:
+            return None
+
+        try:
+            content = await self.io_executor.run(
+                resize_image,
+                image.content,
+                size=(self.settings.pubsub_inline_image_size, self.settings.pubsub_inline_image_size),
+            )
+        except (OSError, ValueError):
+            logger.warning(f"Image cannot be resized, sending it through storage: {image.image_hash=}")
+            return None
+
+        if len(content) > self.settings.pubsub_inline_image_max_bytes:
+            return None
+        return content
+
+    def track_generation_request(
+        self,
+        *,
+        future: Future,
         image_classification: ImageClassification,
+    ) -> asyncio.Task:
+        """
+        Update the image_classification status when the publish future resolves,
+        to `queued` in the cache of this instance or to `error` in Datastore.
+        """
+        task = asyncio.ensure_future(
+            self._complete_generation_request(future=future, image_classification=image_classification),
+        )
+        self._publish_tasks.add(task)
+        task.add_done_callback(self._publish_tasks.discard)
+        return task
+
+    @classmethod
+    async def wait_for_generation_requests(cls) -> None:
+        """Wait until the status of every published generation request is updated."""
+        if cls._publish_tasks:
+            await asyncio.gather(*cls._publish_tasks, return_exceptions=True)
+
+    async def _complete_generation_request(self, *, future: Future, image_classification: ImageClassification) -> None:
+        try:
+            message_id = await asyncio.wrap_future(future)
+        except GoogleAPIError:
+            await self._fail_generation_request(image_classification=image_classification)
+            return
+
+        logger.debug(f"Generation request published: {message_id=}, {image_classification.image_hash=}")
+        image_classification.status = ImageAnnotationsGenerationStatus.QUEUED
+        # `queued` is only cached, storing it would cost a third transaction per image besides `pending` and the result;
+        # it replaces the cached `pending` only, the worker may have stored the result already
+        cached = self.classification_cache.get(image_classification.image_hash)
+        if cached is not None and cached.status == ImageAnnotationsGenerationStatus.PENDING:
+            self._cache_image_classification(image_classification)
+
+    async def _fail_generation_request(self, *, image_classification: ImageClassification) -> None:
+        image_classification.status = ImageAnnotationsGenerationStatus.ERROR
+        logger.exception(
+            f"Error generating annotations for Image Classification: {image_classification=}",
+            exc_info=True,
+        )
+        await self.upsert_image_classification(image_classification=image_classification)
+
+    async def process_generation_request(
+        self,
+        *,
+        image_hash: str,
+        image_url: str | None = None,
+        blob_name: str | None = None,
+        content: bytes | None = None,
+        message_id: str | None = None,
     ) -> None:
         """
-        Upload the image to storage and send a message to the worker.
-        Update the image_classification status to `queued`.
+        Generate annotations for an image queued by `send_generation_request_to_worker` and store them.
+        The image is downloaded unless its `content` was sent in the message.
+        Failures caused by the request itself are stored as `error`, other exceptions are raised,
+        so the message is redelivered and eventually lands in the dead letter queue.
+
+        Pub/Sub delivers at least once, duplicates are suppressed before any download or inference:
+        redeliveries of a recently processed `message_id` return at once, deliveries arriving while this worker
+        processes the image wait for the same result, and `GenerationInProgressError` is raised
+        while another worker holds the processing lease, so the message is retried after its backoff.
         """
-        blob_name = f"{image_classification.image_hash}{get_extension_from_filename(file.filename)}"
+        if message_id is not None and self.processed_messages.get(message_id):
+            logger.info(f"Message is already processed: {message_id=}, {image_hash=}")
+            return
+
+        await self.single_flight.do(
+            f"process:{image_hash}",
+            partial(
+                self._process_generation_request,
+                image_hash=image_hash,
+                image_url=image_url,
+                blob_name=blob_name,
+                content=content,
+            ),
+        )
+        # the result is stored by now, also within `coalesce_writes`, a failed write raises and leaves the message
+        # to be processed again by its redelivery
+        if message_id is not None:
+            self.processed_messages.set(message_id, value=True, ttl=self.settings.worker_processed_messages_ttl)
+
+    async def _process_generation_request(
+        self,
+        *,
+        image_hash: str,
+        image_url: str | None,
+        blob_name: str | None,
+        content: bytes | None,
+    ) -> ImageClassification:
+        image_classification = await self.get_image_classification(image_hash=image_hash)
+        if image_classification and image_classification.status.is_done():
+            logger.info(f"Image Classification is already processed: {image_classification=}")
+            return image_classification
+
+        lease_id = f"process:{image_hash}"
+        if not await self._claim_processing_lease(lease_id):
+            msg = f"Image Classification is being processed by another worker: {image_hash=}"
+            logger.info(msg)
+            raise GenerationInProgressError(detail=msg, status_code=status.HTTP_409_CONFLICT)
+
         try:
-            image_classification.image_url = await self.upload_to_storage(
-                file=file.file,
+            return await self._generate_queued_image_classification(
+                image_classification=image_classification,
+                image_hash=image_hash,
+                image_url=image_url,
                 blob_name=blob_name,
-                content_type=file.content_type,
+                content=content,
             )
+        finally:
+            await self._release_processing_lease(lease_id)
 
-            self.queue_service.publish(
-                message=image_classification.image_hash,
-                image_hash=image_classification.image_hash,
-                image_url=image_classification.image_url,
+    async def _generate_queued_image_classification(
+        self,
+        *,
+        image_classification: ImageClassification | None,
+        image_hash: str,
+        image_url: str | None,
+        blob_name: str | None,
+        content: bytes | None,
+    ) -> ImageClassification:
+        try:
+            if not image_classification:
+                msg = f"Image Classification not found in db: {image_hash=}"
+                logger.info(msg)
+                raise AnnotationGenerationError(detail=msg, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+            image_content = content or await self.get_image_content(image_url=image_url, blob_name=blob_name)
+            perceptual_hash = await self.calculate_perceptual_hash(image_content)
+            annotations = await self.generate_or_reuse_annotations(
+                contents=image_content,
+                perceptual_hash=perceptual_hash,
+                image_hash=image_hash,
             )
 
-            image_classification.status = ImageAnnotationsGenerationStatus.QUEUED
-            self.upsert_image_classification(image_classification=image_classification)
-        except GoogleAPICallError:
-            image_classification.status = ImageAnnotationsGenerationStatus.ERROR
-            logger.exception(
-                f"Error generating annotations for Image Classification: {image_classification=}",
-                exc_info=True,
+            image_classification = ImageClassification(
+                image_hash=image_hash,
+                image_url=image_url,
+                annotations=annotations,
+                status=ImageAnnotationsGenerationStatus.SUCCESS,
+                perceptual_hash=perceptual_hash,
+            )
+        except InferenceOverloadedError:
+            # the message is redelivered later
+            raise
+        except (HTTPException, GoogleAPICallError):
+            logger.exception(f"Error generating annotations for Image Classification: {image_hash=}", exc_info=True)
+            image_classification = ImageClassification(
+                image_hash=image_hash,
+                image_url=image_url,
+                status=ImageAnnotationsGenerationStatus.ERROR,
             )
+        await self.upsert_image_classification(image_classification=image_classification)
+        return image_classification
+
+    async def _claim_processing_lease(self, lease_id: str) -> bool:
+        if self.settings.worker_processing_lease_ttl <= 0:
+            return True
+        return await self.io_executor.run(
+            self.database_service.claim_lease,
+            collection=self.lease_collection,
+            entity_id=lease_id,
+            owner=INSTANCE_ID,
+            ttl=self.settings.worker_processing_lease_ttl,
+        )
+
+    async def _release_processing_lease(self, lease_id: str) -> None:
+        if self.settings.worker_processing_lease_ttl <= 0:
+            return
+        await self.io_executor.run(
+            self.database_service.release_lease,
+            collection=self.lease_collection,
+            entity_id=lease_id,
+            owner=INSTANCE_ID,
+        )
+
+    async def calculate_perceptual_hash(self, contents: bytes) -> str | None:
+        """
+        Return the hex dHash of the image when near-duplicate reuse is enabled,
+        None if it cannot be decoded or the CPU executor is full.
+        """
+        if not self.settings.near_duplicate_enabled:
+            return None
+
+        try:
+            value = await get_cpu_executor().run(dhash, contents)
+        except (OSError, ValueError, ExecutorFullError):
+            return None
+        return f"{value:016x}"
+
+    async def find_near_duplicate(self, *, perceptual_hash: str) -> ImageClassification | None:
+        """Return the successful classification of an already classified image which looks the same."""
+        image_hash = self.near_duplicate_index.find(
+            int(perceptual_hash, 16),
+            max_distance=self.settings.near_duplicate_max_distance,
+        )
+        if image_hash is None:
+            return None
+
+        image_classification = await self.get_image_classification(image_hash=image_hash)
+        if image_classification and image_classification.status == ImageAnnotationsGenerationStatus.SUCCESS:
+            return image_classification
+        return None
+
+    async def generate_or_reuse_annotations(
+        self,
+        *,
+        contents: bytes,
+        perceptual_hash: str | None,
+        image_hash: str | None = None,
+    ) -> list[ImageAnnotation]:
+        """Reuse the annotations of a near-duplicate image if there is one, otherwise run inference."""
+        if perceptual_hash:
+            duplicate = await self.find_near_duplicate(perceptual_hash=perceptual_hash)
+            if duplicate:
+                logger.info(f"Reusing annotations of a near-duplicate: {perceptual_hash=}, {duplicate.image_hash=}")
+                return duplicate.annotations
+        return await self.generate_annotations_batched(contents=contents, image_hash=image_hash)
 
     def generate_annotations(self, contents: bytes) -> list[ImageAnnotation]:
-        processor = self.get_ml_processor()
+        result = self.generate_annotations_batch([contents])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def generate_annotations_batched(
+        self,
+        contents: bytes,
+        image_hash: str | None = None,
+    ) -> list[ImageAnnotation]:
+        """
+        Generate annotations together with other images submitted concurrently.
+        The logits are stored under `image_hash` when the logits store is enabled.
+        Raise `InferenceOverloadedError` if too many images are already waiting for inference.
+        """
+        try:
+            return await get_inference_batcher().submit((contents, image_hash))
+        except (BatcherFullError, ExecutorFullError) as e:
+            logger.warning(f"Inference overloaded: {e}")
+            raise InferenceOverloadedError(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many images waiting for classification, try again later.",
+                headers={"Retry-After": "1"},
+            ) from e
+
+    async def process_inference_batch(
+        self,
+        batch: list[tuple[bytes, str | None]],
+    ) -> list[list[ImageAnnotation] | Exception]:
+        """Run a batch of the inference batcher on the inference executor."""
+        contents, image_hashes = zip(*batch, strict=True)
+        return await get_inference_executor().run(self.generate_annotations_batch, contents, image_hashes)
+
+    def generate_annotations_batch(
+        self,
+        contents: Sequence[bytes],
+        image_hashes: Sequence[str | None] | None = None,
+    ) -> list[list[ImageAnnotation] | Exception]:
+        """
+        Generate annotations for many images with a single forward pass.
+        Images which cannot be decoded get the exception in place of annotations, so they do not fail the whole batch.
+        """
         model = self.get_ml_model()
+        if self.settings.fast_preprocessing:
+            preprocessor = self.model_registry.preprocessor
+            load_image = preprocessor.load_image
+        else:
+            processor = self.get_ml_processor()
+            load_image = self._load_image
+
+        results: list[list[ImageAnnotation] | Exception] = [[] for _ in contents]
+        images = []
+        positions = []
+        with timed("preprocess"):
+            for position, content in enumerate(contents):
+                try:
+                    images.append(load_image(content))
+                    positions.append(position)
+                except (OSError, ValueError) as e:
+                    results[position] = e
+
+            if not images:
+                return results
 
-        image = Image.open(io.BytesIO(contents)).convert("RGB")
-        inputs = processor(images=image, return_tensors="pt")
+            if self.settings.fast_preprocessing:
+                pixel_values = preprocessor(images)
+            else:
+                pixel_values = processor(images=images, return_tensors="pt")["pixel_values"]
 
-        with torch.no_grad():
-            outputs = model(**inputs)
+        inference_in_flight.inc(len(images))
+        try:
+            with timed("model_forward"), forward_profiler.profile(), torch.no_grad():
+                outputs = model(pixel_values=pixel_values)
+        finally:
+            inference_in_flight.dec(len(images))
+
+        logits = outputs.logits.numpy()
+        if image_hashes is not None:
+            self._store_logits(logits, image_hashes=[image_hashes[position] for position in positions])
 
-        probabilities = torch.nn.functional.softmax(outputs.logits, dim=1)
-        top_annotations = torch.topk(probabilities, self.settings.num_annotations, dim=1)
+        with timed("topk"):
+            top_indices, top_values = top_k(logits, k=self.settings.num_annotations)
 
-        annotations = []
-        for i in range(self.settings.num_annotations):
-            label_index = top_annotations.indices[0][i].item()
-            confidence = top_annotations.values[0][i].item()
-            label = model.config.id2label[label_index]
-            annotations.append(ImageAnnotation(index=i + 1, label=label, confidence=f"{confidence:.2f}"))
+        for row, position in enumerate(positions):
+            results[position] = self.build_annotations(
+                top_indices[row],
+                top_values[row],
+                id2label=model.config.id2label,
+                min_confidence=self.settings.annotation_min_confidence,
+            )
 
-        return annotations
+        return results
 
     @staticmethod
-    async def get_image_content_from_url(url: str) -> bytes:
-        async with httpx.AsyncClient() as client:
-            r = await client.get(url)
-            r.raise_for_status()
-            return r.content
+    def build_annotations(
+        indices: np.ndarray,
+        values: np.ndarray,
+        *,
+        id2label: dict[int, str],
+        min_confidence: float = 0.0,
+    ) -> list[ImageAnnotation]:
+        """Annotations of the labels returned by `top_k`, leaving out those below `min_confidence`."""
+        return [
+            ImageAnnotation(index=i + 1, label=id2label[label_index], confidence=f"{confidence:.2f}")
+            for i, (label_index, confidence) in enumerate(zip(indices.tolist(), values.tolist(), strict=True))
+            if confidence >= min_confidence
+        ]
+
+    def _store_logits(self, logits: np.ndarray, *, image_hashes: Sequence[str | None]) -> None:
+        logits_store = self.get_logits_store()
+        rows = [row for row, image_hash in enumerate(image_hashes) if image_hash]
+        if logits_store is None or not rows:
+            return
+        try:
+            logits_store.add_many([image_hashes[row] for row in rows], logits[rows])
+        except OSError:
+            logger.exception("Storing logits failed")
+
+    async def rerank_image_classifications(
+        self,
+        *,
+        num_annotations: int,
+        min_confidence: float = 0.0,
+        chunk_size: int = MAX_ENTITIES_PER_PUT,
+    ) -> int:
+        """
+        Recompute the annotations of every successful image classification from the stored logits, without inference
+        or loading the model.
+        Each chunk of images is ranked in one vectorized pass and written with a single multi-get and multi-put.
+        Return the number of updated image classifications.
+        """
+        logits_store = self.get_logits_store()
+        if logits_store is None:
+            msg = "Reranking requires the logits store, set LOGITS_STORE_DIR"
+            raise ValueError(msg)
+
+        id2label = self.model_registry.id2label
+        updated = 0
+        for image_hashes, logits in logits_store.iter_chunks(chunk_size):
+            top_indices, top_values = top_k(logits, k=num_annotations)
+            image_classifications = await self.get_image_classifications(image_hashes=image_hashes)
+            reranked = []
+            for row, image_hash in enumerate(image_hashes):
+                image_classification = image_classifications.get(image_hash)
+                if image_classification and image_classification.status == ImageAnnotationsGenerationStatus.SUCCESS:
+                    image_classification.annotations = self.build_annotations(
+                        top_indices[row],
+                        top_values[row],
+                        id2label=id2label,
+                        min_confidence=min_confidence,
+                    )
+                    reranked.append(image_classification)
+            if reranked:
+                await self.upsert_image_classifications(image_classifications=reranked)
+            updated += len(reranked)
+            logger.info(f"Reranked image classifications: {updated=}")
+        return updated
+
+    @staticmethod
+    def _load_image(content: bytes) -> Image.Image:
+        # BytesIO shares the buffer of the bytes it wraps, so decoding does not copy the content
+        return Image.open(io.BytesIO(content)).convert("RGB")
+
+    async def get_image_content(self, *, image_url: str, blob_name: str | None = None) -> bytes:
+        """Download the queued image from the public URL, or from the bucket when configured and the blob is known."""
+        if self.settings.worker_image_source == "storage" and blob_name:
+            return await self.io_executor.run(
+                self.storage_service.download,
+                bucket_name=self.settings.cloud_storage_bucket,
+                blob_name=blob_name,
+            )
+        return await self.get_image_content_from_url(url=image_url)
+
+    async def get_image_content_from_url(self, url: str) -> bytes:
+        return await self.http_client.get_content(url)
+
+
+def create_image_service(settings: Settings | None = None, **dependencies: Any) -> ImageService:
+    """
+    Image service with the dependencies FastAPI injects into the API requests, for code running outside of them:
+    the pull worker and scripts. `dependencies` replace some of them by name, e.g. a cache which always misses.
+    """
+    settings = settings or get_settings()
+    defaults: dict[str, Callable[[], Any]] = {
+        "database_service": partial(DatabaseService, settings=settings),
+        "queue_service": partial(QueueService, settings=settings),
+        "storage_service": partial(StorageService, settings=settings),
+        "model_registry": get_model_registry,
+        "classification_cache": get_image_classification_cache,
+        "io_executor": get_io_executor,
+        "single_flight": get_image_single_flight,
+        "http_client": get_http_client,
+        "near_duplicate_index": get_near_duplicate_index,
+        "processed_messages": get_processed_messages,
+        "notifications": get_image_classification_notifications,
+    }
+    for name, create in defaults.items():
+        if name not in dependencies:
+            dependencies[name] = create()
+    return ImageService(settings=settings, **dependencies)
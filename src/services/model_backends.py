@@ -0,0 +1,105 @@
+import importlib.util
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+import torch
+from loguru import logger
+from transformers import PretrainedConfig
+from transformers import ViTForImageClassification
+from transformers.modeling_outputs import ImageClassifierOutput
+
+ModelBackend = Literal["eager", "int8", "compile", "torchscript", "onnx"]
+MODEL_BACKENDS: tuple[ModelBackend, ...] = ("eager", "int8", "compile", "torchscript", "onnx")
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Plain tensor in and out, as required for tracing and ONNX export."""
+
+    def __init__(self, model: ViTForImageClassification) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model(pixel_values=pixel_values).logits
+
+
+class TorchScriptModel:
+    def __init__(self, model: ViTForImageClassification, *, example_inputs: torch.Tensor) -> None:
+        self.config: PretrainedConfig = model.config
+        with torch.no_grad():
+            self.module = torch.jit.freeze(torch.jit.trace(_LogitsOnly(model).eval(), (example_inputs,), strict=False))
+
+    def __call__(self, *, pixel_values: torch.Tensor) -> ImageClassifierOutput:
+        return ImageClassifierOutput(logits=self.module(pixel_values))
+
+
+class OnnxModel:
+    """Model exported to ONNX and run by ONNX Runtime, requires the optional `onnxruntime` and `onnxscript`."""
+
+    def __init__(
+        self,
+        model: ViTForImageClassification,
+        *,
+        example_inputs: torch.Tensor,
+        path: Path,
+        num_threads: int | None = None,
+    ) -> None:
+        if importlib.util.find_spec("onnxruntime") is None:
+            msg = "The onnx model backend requires the onnxruntime package"
+            raise RuntimeError(msg)
+        import onnxruntime  # noqa: PLC0415
+
+        self.config: PretrainedConfig = model.config
+        if not path.exists():
+            logger.info(f"Exporting ML model to ONNX: {path=}")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            torch.onnx.export(
+                _LogitsOnly(model),
+                (example_inputs,),
+                str(path),
+                input_names=["pixel_values"],
+                output_names=["logits"],
+                dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            )
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, *, pixel_values: torch.Tensor) -> ImageClassifierOutput:
+        (logits,) = self.session.run(["logits"], {"pixel_values": np.ascontiguousarray(pixel_values.numpy())})
+        return ImageClassifierOutput(logits=torch.from_numpy(logits))
+
+
+Model = ViTForImageClassification | TorchScriptModel | OnnxModel
+
+
+def prepare_model(
+    model: ViTForImageClassification,
+    *,
+    backend: ModelBackend,
+    example_inputs: torch.Tensor,
+    onnx_path: Path,
+    num_threads: int | None = None,
+) -> Model:
+    """
+    Return the FP32 eager model converted for the inference backend.
+    Every backend is called as `model(pixel_values=...)` and returns an output with `logits`.
+    """
+    if backend == "eager":
+        return model
+    if backend == "int8":
+        # weights of the Linear layers, nearly all of ViT, are stored as int8 and activations quantized on the fly
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "compile":
+        # compiled on the first call, which is the warm-up when enabled
+        return torch.compile(model, dynamic=True)
+    if backend == "torchscript":
+        return TorchScriptModel(model, example_inputs=example_inputs)
+    if backend == "onnx":
+        return OnnxModel(model, example_inputs=example_inputs, path=onnx_path, num_threads=num_threads)
+
+    msg = f"Unknown ML model backend: {backend=}"
+    raise ValueError(msg)
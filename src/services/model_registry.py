@@ -0,0 +1,140 @@
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import torch
+from loguru import logger
+from transformers import AutoConfig
+from transformers import ViTForImageClassification
+from transformers import ViTImageProcessor
+
+from src.config import get_settings
+from src.services.model_backends import Model
+from src.services.model_backends import ModelBackend
+from src.services.model_backends import prepare_model
+from src.utils.preprocessing import ImagePreprocessor
+from src.utils.preprocessing import get_imaging_features
+
+
+class ModelRegistry:
+    """
+    Holds the ML model and processor shared by all requests of the process.
+    Loading is thread-safe, so concurrent first requests never load the weights twice.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        *,
+        backend: ModelBackend = "eager",
+        onnx_path: str | None = None,
+        num_threads: int | None = None,
+    ) -> None:
+        self.model_dir = model_dir
+        self.backend = backend
+        self.onnx_path = Path(onnx_path) if onnx_path else Path(model_dir) / "model.onnx"
+        self.num_threads = num_threads
+        self.startup_timings: dict[str, float] = {}
+        self._model: Model | None = None
+        self._processor: ViTImageProcessor | None = None
+        self._preprocessor: ImagePreprocessor | None = None
+        self._id2label: dict[int, str] | None = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def model(self) -> Model:
+        if not self.is_ready:
+            self.load()
+        return self._model
+
+    @property
+    def processor(self) -> ViTImageProcessor:
+        if not self.is_ready:
+            self.load()
+        return self._processor
+
+    @property
+    def preprocessor(self) -> ImagePreprocessor:
+        if not self.is_ready:
+            self.load()
+        return self._preprocessor
+
+    @property
+    def id2label(self) -> dict[int, str]:
+        """Labels of the model outputs, read from the model config alone while the model is not loaded."""
+        if self.is_ready:
+            return self._model.config.id2label
+        if self._id2label is None:
+            self._id2label = AutoConfig.from_pretrained(self.model_dir).id2label
+        return self._id2label
+
+    def load(self, *, warm_up: bool = False) -> None:
+        """Load the processor and the model, optionally running a warm-up forward pass."""
+        with self._lock:
+            if self.is_ready:
+                return
+
+            timings = {}
+            started_at = time.perf_counter()
+
+            logger.info(f"Loading ML processor: {self.model_dir=}")
+            processor = ViTImageProcessor.from_pretrained(self.model_dir)
+            timings["processor"] = time.perf_counter() - started_at
+
+            logger.info(f"Loading ML model: {self.model_dir=}")
+            model = ViTForImageClassification.from_pretrained(self.model_dir)
+            model.eval()
+            timings["model"] = time.perf_counter() - started_at - sum(timings.values())
+
+            if self.backend != "eager":
+                logger.info(f"Preparing ML model backend: {self.backend=}")
+                model = prepare_model(
+                    model,
+                    backend=self.backend,
+                    example_inputs=self._dummy_inputs(processor),
+                    onnx_path=self.onnx_path,
+                    num_threads=self.num_threads,
+                )
+                timings["backend"] = time.perf_counter() - started_at - sum(timings.values())
+
+            if warm_up:
+                self._warm_up(model=model, processor=processor)
+                timings["warm_up"] = time.perf_counter() - started_at - sum(timings.values())
+
+            timings["total"] = time.perf_counter() - started_at
+
+            self._processor = processor
+            self._preprocessor = ImagePreprocessor.from_processor(processor)
+            self._model = model
+            self.startup_timings = timings
+            self._ready.set()
+
+        breakdown = ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in timings.items())
+        logger.info(f"ML model ready: {breakdown}, imaging features: {get_imaging_features()}")
+
+    @classmethod
+    def _warm_up(cls, *, model: Model, processor: ViTImageProcessor) -> None:
+        """Run a forward pass on a dummy input, so the first request does not pay for lazy initialisation."""
+        with torch.no_grad():
+            model(pixel_values=cls._dummy_inputs(processor))
+
+    @staticmethod
+    def _dummy_inputs(processor: ViTImageProcessor) -> torch.Tensor:
+        return torch.zeros(1, 3, processor.size["height"], processor.size["width"])
+
+
+@lru_cache
+def get_model_registry() -> ModelRegistry:
+    settings = get_settings()
+    return ModelRegistry(
+        model_dir=settings.ml_model_dir,
+        backend=settings.ml_model_backend,
+        onnx_path=settings.ml_model_onnx_path,
+        num_threads=settings.inference_torch_threads,
+    )
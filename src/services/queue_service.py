@@ -1,8 +1,15 @@
+import asyncio
+import time
+from functools import cached_property
+
 from fastapi import Depends
 from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1.publisher.futures import Future
+from google.cloud.pubsub_v1.types import LimitExceededBehavior
 
 from src.config import Settings
 from src.config import get_settings
+from src.utils.tracing import get_stage_histogram
 
 
 class QueueService:
@@ -16,21 +23,58 @@ class QueueService:
     @property
     def publisher_client(self) -> pubsub_v1.PublisherClient:
         if self._publisher_client is None:
-            self._publisher_client = pubsub_v1.PublisherClient()
+            type(self)._publisher_client = pubsub_v1.PublisherClient(
+                batch_settings=pubsub_v1.types.BatchSettings(
+                    max_messages=self.settings.pubsub_batch_max_messages,
+                    max_bytes=self.settings.pubsub_batch_max_bytes,
+                    max_latency=self.settings.pubsub_batch_max_latency,
+                ),
+                publisher_options=pubsub_v1.types.PublisherOptions(
+                    flow_control=pubsub_v1.types.PublishFlowControl(
+                        message_limit=self.settings.pubsub_flow_control_max_messages,
+                        byte_limit=self.settings.pubsub_flow_control_max_bytes,
+                        limit_exceeded_behavior=LimitExceededBehavior(
+                            self.settings.pubsub_flow_control_limit_exceeded_behavior,
+                        ),
+                    ),
+                ),
+            )
         return self._publisher_client
 
+    @cached_property
+    def topic_path(self) -> str:
+        return self.publisher_client.topic_path(project=self.project, topic=self.topic)
+
+    @classmethod
+    def close(cls) -> None:
+        """Send the messages still waiting in batches and stop the publisher."""
+        if cls._publisher_client is not None:
+            cls._publisher_client.stop()
+            cls._publisher_client = None
+
+    def publish_future(self, *, message: str | bytes = "", **attrs) -> Future:
+        """
+        Add a single message to the current batch without waiting for it to be sent.
+        Return the future resolving to the message ID.
+        """
+        data = message.encode() if isinstance(message, str) else message
+        histogram = get_stage_histogram("pubsub_publish")
+        start = time.perf_counter()
+        future = self.publisher_client.publish(topic=self.topic_path, data=data, **attrs)
+        # time until the batch carrying the message is sent, including the batch latency
+        future.add_done_callback(lambda _: histogram.observe(time.perf_counter() - start))
+        return future
+
     def publish(self, *, message: str = "", **attrs) -> str:
         """
         Publish a single message.
         Return the message ID or raise an exception.
         """
-        pubsub_topic_path = self.publisher_client.topic_path(
-            project=self.project,
-            topic=self.topic,
-        )
-        future = self.publisher_client.publish(
-            topic=pubsub_topic_path,
-            data=message.encode(),
-            **attrs,
-        )
-        return future.result()
+        return self.publish_future(message=message, **attrs).result()
+
+    async def publish_async(self, *, message: str = "", **attrs) -> str:
+        """
+        Publish a single message without blocking the event loop.
+        Return the message ID or raise an exception.
+        """
+        return await asyncio.wrap_future(self.publish_future(message=message, **attrs))
@@ -1,14 +1,24 @@
+from datetime import timedelta
 from typing import IO
 
 from fastapi import Depends
+from google.api_core.exceptions import PreconditionFailed
 from google.cloud import storage
+from loguru import logger
 
 from src.config import Settings
 from src.config import get_settings
+from src.utils.cache import TTLCache
+from src.utils.tracing import timed
+
+# blobs known to exist, checked before content addressed uploads
+EXISTING_BLOBS_MAX_ENTRIES = 100_000
+EXISTING_BLOBS_TTL = 3600  # Seconds, blobs may be deleted by lifecycle rules
 
 
 class StorageService:
     _client: storage.Client | None = None
+    _existing_blobs: TTLCache[str, bool] | None = None
 
     def __init__(self, settings: Settings = Depends(get_settings)) -> None:
         self.settings = settings
@@ -17,12 +27,84 @@ class StorageService:
     @property
     def client(self) -> storage.Client:
         if self._client is None:
-            self._client = storage.Client(project=self.project)
+            type(self)._client = storage.Client(project=self.project)
         return self._client
 
-    def upload(self, *, bucket_name: str, blob_name: str, file: IO, content_type: str | None = None) -> str:
+    @property
+    def existing_blobs(self) -> TTLCache[str, bool]:
+        if self._existing_blobs is None:
+            type(self)._existing_blobs = TTLCache(
+                max_entries=EXISTING_BLOBS_MAX_ENTRIES,
+                max_bytes=EXISTING_BLOBS_MAX_ENTRIES * 128,
+                name="storage_existing_blobs",
+            )
+        return self._existing_blobs
+
+    @timed("storage_upload")
+    def upload(  # noqa: PLR0913
+        self,
+        *,
+        bucket_name: str,
+        blob_name: str,
+        file: IO,
+        content_type: str | None = None,
+        size: int | None = None,
+        content_addressed: bool = False,
+    ) -> str:
+        """
+        Upload the file and return its unsigned URL, see `get_url`.
+        A `content_addressed` blob is named after its content, so it is uploaded only if it does not exist yet:
+        blobs recently uploaded are skipped without any call and the upload itself is create-only.
+        """
         bucket = self.client.bucket(bucket_name)
         blob = bucket.blob(blob_name)
-        blob.upload_from_file(file, content_type=content_type)
-        blob.make_public()
+        if self.settings.cloud_storage_chunk_size:
+            blob.chunk_size = self.settings.cloud_storage_chunk_size
+
+        cache_key = f"{bucket_name}/{blob_name}"
+        if content_addressed and self.existing_blobs.get(cache_key):
+            return self.get_url(blob)
+
+        created = True
+        try:
+            if content_addressed:
+                blob.upload_from_file(file, content_type=content_type, size=size, if_generation_match=0)
+            else:
+                blob.upload_from_file(file, content_type=content_type, size=size)
+        except PreconditionFailed:
+            logger.info(f"Blob already exists, skipping upload: {blob_name=}")
+            created = False
+
+        # an existing blob may have been created by an upload which failed to make it public
+        if self.settings.cloud_storage_url_mode == "acl" and (created or not self.existing_blobs.get(cache_key)):
+            blob.make_public()
+        if content_addressed:
+            self.existing_blobs.set(cache_key, value=True, ttl=EXISTING_BLOBS_TTL, size=len(cache_key))
+        return self.get_url(blob)
+
+    def get_url(self, blob: storage.Blob) -> str:
+        """
+        Unsigned URL of the blob computed locally, without calling the Storage API. It never expires, so it can be
+        stored, and it can be read by anyone unless the bucket is private (`signed` mode), see `sign_url`.
+        """
         return blob.public_url
+
+    @timed("storage_sign_url")
+    def sign_url(self, *, bucket_name: str, blob_name: str) -> str:
+        """
+        V4 signed URL of the blob, valid for `cloud_storage_signed_url_expiration` seconds.
+        It is computed locally only with a service account key, other credentials (e.g. on Cloud Run) sign it with
+        a call to the IAM signBlob API.
+        """
+        blob = self.client.bucket(bucket_name).blob(blob_name)
+        return blob.generate_signed_url(
+            version="v4",
+            expiration=timedelta(seconds=self.settings.cloud_storage_signed_url_expiration),
+            method="GET",
+        )
+
+    @timed("storage_download")
+    def download(self, *, bucket_name: str, blob_name: str) -> bytes:
+        bucket = self.client.bucket(bucket_name)
+        blob = bucket.blob(blob_name)
+        return blob.download_as_bytes()
@@ -0,0 +1,65 @@
+import tarfile
+import zipfile
+from collections.abc import Iterator
+from typing import IO
+
+
+class ArchiveTooLargeError(Exception):
+    """Raised when the archive holds more than `max_files` files or `max_total_size` bytes."""
+
+
+def is_archive(file: IO[bytes]) -> bool:
+    """Return whether the file is a zip or a tar archive, optionally compressed, and rewind it."""
+    try:
+        if zipfile.is_zipfile(file):
+            return True
+        file.seek(0)
+        return tarfile.is_tarfile(file)
+    finally:
+        file.seek(0)
+
+
+def read_archive(
+    file: IO[bytes],
+    *,
+    max_file_size: int,
+    max_files: int,
+    max_total_size: int,
+) -> list[tuple[str, bytes]]:
+    """
+    Return the `(name, content)` of the regular files in the zip or tar archive.
+    At most `max_file_size + 1` bytes are read per file, so oversized files are detected without reading them whole,
+    and reading stops once the decompressed files exceed `max_total_size` bytes.
+    """
+    members = _iter_zip(file, max_file_size) if zipfile.is_zipfile(file) else _iter_tar(file, max_file_size)
+    files = []
+    total_size = 0
+    for name, content in members:
+        if len(files) == max_files:
+            msg = f"Archive has more than {max_files=}"
+            raise ArchiveTooLargeError(msg)
+        total_size += len(content)
+        if total_size > max_total_size:
+            msg = f"Archive has more than {max_total_size=} bytes"
+            raise ArchiveTooLargeError(msg)
+        files.append((name, content))
+    return files
+
+
+def _iter_zip(file: IO[bytes], max_file_size: int) -> Iterator[tuple[str, bytes]]:
+    file.seek(0)
+    with zipfile.ZipFile(file) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                with archive.open(info) as member:
+                    yield info.filename, member.read(max_file_size + 1)
+
+
+def _iter_tar(file: IO[bytes], max_file_size: int) -> Iterator[tuple[str, bytes]]:
+    file.seek(0)
+    # stream mode reads the members in order, without seeking back for the index
+    with tarfile.open(fileobj=file, mode="r|*") as archive:
+        for info in archive:
+            member = archive.extractfile(info) if info.isfile() else None
+            if member is not None:
+                yield info.name, member.read(max_file_size + 1)
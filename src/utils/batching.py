@@ -0,0 +1,170 @@
+import asyncio
+import contextlib
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Sequence
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Generic
+from typing import TypeVar
+
+from loguru import logger
+
+from src.utils.metrics import registry
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class BatcherFullError(Exception):
+    """Raised when the batcher already holds `max_pending` items."""
+
+
+@dataclass(slots=True)
+class _PendingItem(Generic[T, R]):
+    item: T
+    future: asyncio.Future[R]
+    enqueued_at: float = field(default=0.0)
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Collect items submitted concurrently and process them together.
+
+    A batch is dispatched as soon as it holds `max_batch_size` items or the oldest item has waited `max_wait` seconds.
+    `process_batch` gets the items in submission order and returns one result per item;
+    an exception instance in place of a result is raised to the caller of that item only.
+    At most `max_concurrency` batches are processed at once and at most `max_pending` items
+    (queued or being processed) are accepted, further submissions fail with `BatcherFullError`.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        process_batch: Callable[[list[T]], Awaitable[Sequence[R | Exception]]],
+        *,
+        max_batch_size: int,
+        max_wait: float,
+        max_concurrency: int = 1,
+        max_pending: int | None = None,
+        name: str = "batcher",
+    ) -> None:
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_pending = max_pending
+        self.name = name
+
+        self.batch_size_histogram = registry.histogram(
+            f"{name}_batch_size",
+            "Number of items dispatched together in a single batch.",
+            buckets=BATCH_SIZE_BUCKETS,
+        )
+        self.queue_wait_histogram = registry.histogram(
+            f"{name}_queue_wait_seconds",
+            "Time an item spent waiting in the queue before its batch was dispatched.",
+            buckets=QUEUE_WAIT_BUCKETS,
+        )
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[_PendingItem[T, R]] | None = None
+        self._task: asyncio.Task | None = None
+        self._dispatch_tasks: set[asyncio.Task] = set()
+        self._pending = 0
+        registry.gauge(
+            f"{name}_pending",
+            "Items queued or being processed.",
+            function=lambda: self._pending,
+        )
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def submit(self, item: T) -> R:
+        """Queue the item for the next batch and wait for its result."""
+        if self.max_pending is not None and self._pending >= self.max_pending:
+            msg = f"Batcher {self.name} is full: {self.max_pending=}"
+            raise BatcherFullError(msg)
+
+        queue = self._ensure_started()
+        loop = asyncio.get_running_loop()
+        pending = _PendingItem(item=item, future=loop.create_future(), enqueued_at=loop.time())
+        self._pending += 1
+        try:
+            queue.put_nowait(pending)
+            return await pending.future
+        finally:
+            self._pending -= 1
+
+    def _ensure_started(self) -> asyncio.Queue[_PendingItem[T, R]]:
+        """Start the collector task, bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run(self._queue), name=f"{self.name}-collector")
+        return self._queue
+
+    async def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        self._task = None
+        self._queue = None
+        self._loop = None
+
+    async def _run(self, queue: asyncio.Queue[_PendingItem[T, R]]) -> None:
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_concurrency)
+        while True:
+            # items keep queueing up while all slots are busy, so the next batch gets bigger under load
+            await slots.acquire()
+            batch = [await queue.get()]
+            deadline = batch[0].enqueued_at + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout=timeout))
+                except TimeoutError:
+                    break
+
+            task = loop.create_task(self._dispatch(batch, slots))
+            self._dispatch_tasks.add(task)
+            task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self, batch: list[_PendingItem[T, R]], slots: asyncio.Semaphore) -> None:
+        try:
+            await self._process(batch)
+        finally:
+            slots.release()
+
+    async def _process(self, batch: list[_PendingItem[T, R]]) -> None:
+        now = asyncio.get_running_loop().time()
+        self.batch_size_histogram.observe(len(batch))
+        for pending in batch:
+            self.queue_wait_histogram.observe(now - pending.enqueued_at)
+
+        try:
+            results = await self.process_batch([pending.item for pending in batch])
+        except Exception as e:  # noqa: BLE001
+            logger.exception(f"Batch processing failed in {self.name}: {len(batch)=}")
+            results = [e] * len(batch)
+
+        for pending, result in zip(batch, results, strict=True):
+            if pending.future.done():  # caller went away, e.g. client disconnected
+                continue
+            if isinstance(result, Exception):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
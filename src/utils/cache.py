@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Generic
+from typing import TypeVar
+
+from src.utils.metrics import registry
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+@dataclass(slots=True)
+class _Entry(Generic[V]):
+    value: V
+    expires_at: float
+    size: int
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Thread-safe LRU cache with a TTL per entry.
+    Bounded by the number of entries and by their total size, the least recently used entries are evicted first.
+    """
+
+    def __init__(self, *, max_entries: int, max_bytes: int, name: str) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = name
+
+        self.hits = registry.counter(f"{name}_hits_total", "Lookups answered from the cache.")
+        self.misses = registry.counter(f"{name}_misses_total", "Lookups not found in the cache or expired.")
+        self.evictions = registry.counter(f"{name}_evictions_total", "Entries evicted to stay within the limits.")
+
+        self._entries: OrderedDict[K, _Entry[V]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses.inc()
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses.inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits.inc()
+            return entry.value
+
+    def set(self, key: K, value: V, *, ttl: float, size: int = 1) -> None:
+        """Store the value for `ttl` seconds, values bigger than the whole cache are not stored."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if ttl <= 0 or size > self.max_bytes or self.max_entries <= 0:
+                return
+
+            self._entries[key] = _Entry(value=value, expires_at=time.monotonic() + ttl, size=size)
+            self._size += size
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions.inc()
+
+    def delete(self, key: K) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remove(self, key: K) -> None:
+        entry = self._entries.pop(key)
+        self._size -= entry.size
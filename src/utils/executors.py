@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from functools import partial
+from typing import Any
+from typing import TypeVar
+
+from src.config import get_settings
+from src.utils.metrics import registry
+
+R = TypeVar("R")
+
+
+class ExecutorFullError(Exception):
+    """Raised when the executor already holds `max_pending` tasks."""
+
+
+class BoundedExecutor:
+    """
+    Thread pool with awaitable tasks and a limit on tasks queued or running.
+    Submitting above the limit fails fast instead of growing the queue without bounds.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_workers: int,
+        max_pending: int,
+        name: str,
+        initializer: Callable[[], Any] | None = None,
+    ) -> None:
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(self.max_workers, max_pending)
+        self.name = name
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=name,
+            initializer=initializer,
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+        registry.gauge(f"{name}_executor_pending", "Tasks queued or running.", function=lambda: self._pending)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, func: Callable[..., R], *args, **kwargs) -> R:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                msg = f"Executor {self.name} is full: {self.max_pending=}"
+                raise ExecutorFullError(msg)
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(partial(func, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # the task keeps running even if the awaiting coroutine is cancelled, so release the slot only when it is done
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, _: Future | None = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self, *, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+@lru_cache
+def get_cpu_executor() -> BoundedExecutor:
+    """Threads for CPU bound image work besides inference, e.g. perceptual hashing, so it does not delay I/O calls."""
+    settings = get_settings()
+    return BoundedExecutor(max_workers=settings.cpu_workers, max_pending=settings.cpu_max_pending, name="cpu")
+
+
+@lru_cache
+def get_io_executor() -> BoundedExecutor:
+    """Threads for blocking Google Cloud client calls, so they do not block the event loop."""
+    settings = get_settings()
+    return BoundedExecutor(max_workers=settings.io_workers, max_pending=settings.io_max_pending, name="io")
@@ -1,5 +1,20 @@
+import io
 import mimetypes
+from collections.abc import Iterable
+from collections.abc import Iterator
+from itertools import islice
 from pathlib import Path
+from typing import TypeVar
+
+from PIL import Image
+
+T = TypeVar("T")
+
+IMAGE_SIGNATURES: dict[bytes, str] = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+}
+IMAGE_SIGNATURE_MAX_LENGTH = max(len(signature) for signature in IMAGE_SIGNATURES)
 
 
 def get_extension_from_filename(filename: str) -> str:
@@ -14,3 +29,30 @@ def get_format_from_content_type(content_type: str) -> str | None:
     if extension == "jpg":
         extension = "jpeg"
     return extension
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Split iterable into lists of `size` elements, the last one may be shorter."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def sniff_image_content_type(header: bytes) -> str | None:
+    """Return content type of the image based on its magic bytes, None if the format is not recognized."""
+    for signature, content_type in IMAGE_SIGNATURES.items():
+        if header.startswith(signature):
+            return content_type
+    return None
+
+
+def resize_image(content: bytes, *, size: tuple[int, int]) -> bytes:
+    """
+    Return the image converted to RGB and resized to `size` as lossless PNG.
+    Bilinear resampling matches the ViT processor, so it resizes the result to the same pixels.
+    """
+    with Image.open(io.BytesIO(content)) as image:
+        resized = image.convert("RGB").resize(size, resample=Image.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    resized.save(buffer, format="PNG")
+    return buffer.getvalue()
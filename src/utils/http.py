@@ -0,0 +1,109 @@
+import asyncio
+import importlib.util
+import random
+from functools import lru_cache
+
+import httpx
+from fastapi import status
+from loguru import logger
+
+from src.config import get_settings
+from src.utils.metrics import registry
+from src.utils.tracing import timed
+
+RETRY_STATUS_CODES = frozenset(
+    {
+        status.HTTP_429_TOO_MANY_REQUESTS,
+        status.HTTP_502_BAD_GATEWAY,
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        status.HTTP_504_GATEWAY_TIMEOUT,
+    },
+)
+
+
+class HttpClient:
+    """
+    Long-lived `httpx.AsyncClient` reusing connections across requests, with retries and exponential backoff.
+    HTTP/2 is used when the optional `h2` package is installed.
+    The client is created on first use in the running event loop and recreated if the loop changes.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        timeout: float,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        retries: int,
+        retry_backoff: float,
+        http2: bool = True,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.transport = transport
+        self.retried = registry.counter("http_client_retries_total", "HTTP requests retried after a failed attempt.")
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self.transport,
+            )
+            self._loop = loop
+        return self._client
+
+    @timed("image_fetch")
+    async def get_content(self, url: str) -> bytes:
+        """Download the content, retrying connection errors, timeouts and throttling responses."""
+        for attempt in range(self.retries):
+            try:
+                response = await self.client.get(url)
+            except httpx.TransportError as e:
+                logger.warning(f"Retrying download: {url=}, {e=}, {attempt=}")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.content
+                logger.warning(f"Retrying download: {url=}, {response.status_code=}, {attempt=}")
+
+            self.retried.inc()
+            await asyncio.sleep(self.retry_backoff * 2**attempt * random.uniform(0.5, 1.5))  # noqa: S311
+
+        response = await self.client.get(url)
+        response.raise_for_status()
+        return response.content
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+
+@lru_cache
+def get_http_client() -> HttpClient:
+    settings = get_settings()
+    return HttpClient(
+        timeout=settings.http_timeout,
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+        retries=settings.http_retries,
+        retry_backoff=settings.http_retry_backoff,
+        http2=settings.http2,
+    )
@@ -0,0 +1,217 @@
+import bisect
+import math
+import threading
+from collections.abc import Callable
+from typing import Any
+
+DEFAULT_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    formatted = (f'{key}="{_escape_label_value(value)}"' for key, value in sorted(labels.items()))
+    return "{" + ",".join(formatted) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter."""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labels: dict[str, str] | None = None) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"value": self._value}
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        return [(self.name, self.labels, self._value)]
+
+
+class Gauge:
+    """Value which goes up and down, either set directly or read from `function` when collected."""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: dict[str, str] | None = None,
+        function: Callable[[], float] | None = None,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.function = function
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    @property
+    def value(self) -> float:
+        return self.function() if self.function is not None else self._value
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"value": self.value}
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        return [(self.name, self.labels, self.value)]
+
+
+class Histogram:
+    """Thread-safe cumulative histogram, compatible with Prometheus bucket semantics."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        labels: dict[str, str] | None = None,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        cumulative = 0
+        buckets = {}
+        for upper_bound, count in zip((*self.buckets, float("inf")), counts, strict=True):
+            cumulative += count
+            buckets[upper_bound] = cumulative
+
+        return {"buckets": buckets, "count": cumulative, "sum": total}
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        snapshot = self.snapshot()
+        samples = [
+            (f"{self.name}_bucket", {**self.labels, "le": _format_value(upper_bound)}, count)
+            for upper_bound, count in snapshot["buckets"].items()
+        ]
+        samples.append((f"{self.name}_sum", self.labels, snapshot["sum"]))
+        samples.append((f"{self.name}_count", self.labels, snapshot["count"]))
+        return samples
+
+
+Metric = Counter | Gauge | Histogram
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str, labels: dict[str, str] | None = None) -> Counter:
+        """Return the counter registered under `name` and `labels`, creating it on first use."""
+        return self._get_or_create(Counter, name, labels, description=description)
+
+    def gauge(
+        self,
+        name: str,
+        description: str,
+        labels: dict[str, str] | None = None,
+        function: Callable[[], float] | None = None,
+    ) -> Gauge:
+        """Return the gauge registered under `name` and `labels`, creating it on first use."""
+        gauge = self._get_or_create(Gauge, name, labels, description=description)
+        if function is not None:  # the latest owner of the value wins, e.g. a recreated executor
+            gauge.function = function
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        labels: dict[str, str] | None = None,
+    ) -> Histogram:
+        """Return the histogram registered under `name` and `labels`, creating it on first use."""
+        return self._get_or_create(Histogram, name, labels, description=description, buckets=buckets)
+
+    def _get_or_create(self, metric_class: type[Metric], name: str, labels: dict[str, str] | None, **kwargs) -> Metric:
+        key = f"{name}{_format_labels(labels or {})}"
+        with self._lock:
+            if key not in self._metrics:
+                self._metrics[key] = metric_class(name=name, labels=labels, **kwargs)
+            return self._metrics[key]
+
+    def collect(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {key: metric.snapshot() for key, metric in metrics.items()}
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+        lines = []
+        previous_name = None
+        for metric in metrics:
+            if metric.name != previous_name:
+                lines.append(f"# HELP {metric.name} {metric.description}")
+                lines.append(f"# TYPE {metric.name} {metric.type}")
+                previous_name = metric.name
+            lines.extend(
+                f"{name}{_format_labels(labels)} {_format_value(value)}" for name, labels, value in metric.samples()
+            )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,51 @@
+import asyncio
+from collections.abc import Hashable
+from typing import Generic
+from typing import TypeVar
+
+from src.utils.metrics import registry
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class NotificationHub(Generic[K, V]):
+    """
+    In-process notifications by key, `wait` suspends until a value is published for the key or the timeout passes.
+    Publishing a key nobody waits for is a dictionary lookup, so it can stay on every write path.
+    Used from the event loop only.
+    """
+
+    def __init__(self, *, name: str) -> None:
+        self.name = name
+        self.published = registry.counter(f"{name}_published_total", "Values published to at least one waiter.")
+        registry.gauge(f"{name}_waiting", "Keys with waiters.", function=lambda: len(self._waiters))
+        self._waiters: dict[K, set[asyncio.Future[V]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    def publish(self, key: K, value: V) -> int:
+        """Wake up the waiters of the key with the value, return how many were waiting."""
+        waiters = self._waiters.pop(key, set())
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(value)
+        if waiters:
+            self.published.inc()
+        return len(waiters)
+
+    async def wait(self, key: K, *, timeout: float) -> V | None:
+        """Return the next value published for the key, None if none is published within `timeout` seconds."""
+        waiter: asyncio.Future[V] = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, set()).add(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[key]
@@ -0,0 +1,162 @@
+import io
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
+
+import numpy as np
+from PIL import Image
+
+from src.utils.metrics import registry
+
+
+def dhash(content: bytes, *, hash_size: int = 8) -> int:
+    """
+    Difference hash of the image, `hash_size ** 2` bits comparing the brightness of neighbouring pixels.
+    It survives re-encoding, resizing and small edits, so near-duplicates differ in a few bits only.
+    """
+    size = (hash_size + 1, hash_size)
+    with Image.open(io.BytesIO(content)) as image:
+        # JPEG images are decoded downscaled, but big enough for the box filter to average out compression artifacts
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        pixels = np.asarray(image.convert("L").resize(size, resample=Image.Resampling.BOX), dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return (first ^ second).bit_count()
+
+
+@dataclass(slots=True)
+class _Node:
+    value: int
+    key: str
+    children: dict[int, "_Node"] = field(default_factory=dict)
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over the Hamming distance, finds hashes within a distance without comparing all of them.
+    Values equal to one already in the tree replace its key.
+    """
+
+    def __init__(self) -> None:
+        self._root: _Node | None = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, key: str) -> None:
+        if self._root is None:
+            self._root = _Node(value=value, key=key)
+            self._size = 1
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node.value)
+            if distance == 0:
+                node.key = key
+                return
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = _Node(value=value, key=key)
+                self._size += 1
+                return
+            node = child
+
+    def find(
+        self,
+        value: int,
+        *,
+        max_distance: int,
+        is_live: Callable[[int, str], bool] | None = None,
+    ) -> tuple[int, str] | None:
+        """
+        Return the `(distance, key)` of the closest value within `max_distance`, None if there is none.
+        Nodes for which `is_live(value, key)` is false are skipped, their children are still searched.
+        """
+        best: tuple[int, str] | None = None
+        candidates = [self._root] if self._root is not None else []
+        while candidates:
+            node = candidates.pop()
+            distance = hamming_distance(value, node.value)
+            if (
+                distance <= max_distance
+                and (best is None or distance < best[0])
+                and (is_live is None or is_live(node.value, node.key))
+            ):
+                best = (distance, node.key)
+                if distance == 0:
+                    break
+            # by the triangle inequality matches are only in children between distance -/+ max_distance
+            candidates.extend(
+                child
+                for child_distance, child in node.children.items()
+                if distance - max_distance <= child_distance <= distance + max_distance
+            )
+        return best
+
+
+class NearDuplicateIndex:
+    """
+    Thread-safe in-memory index of perceptual hashes of classified images, mapped to their image hashes.
+    Bounded by the number of entries, the oldest half is dropped when it is full.
+    A key added again with another value leaves a stale node in the tree, skipped by `find`,
+    the tree is rebuilt once stale nodes outnumber the entries.
+    """
+
+    def __init__(self, *, max_entries: int, name: str) -> None:
+        self.max_entries = max_entries
+        self.name = name
+
+        self.hits = registry.counter(f"{name}_hits_total", "Lookups which found a near-duplicate.")
+        self.misses = registry.counter(f"{name}_misses_total", "Lookups which found no near-duplicate.")
+
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._tree = BKTree()
+        self._stale = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, value: int, key: str) -> None:
+        with self._lock:
+            previous = self._entries.get(key)
+            if self.max_entries <= 0 or previous == value:
+                return
+            if previous is not None:
+                self._stale += 1
+            self._entries[key] = value
+            # a BK-tree cannot remove nodes, so it is rebuilt without evicted entries and stale nodes
+            if len(self._entries) > self.max_entries:
+                for _ in range(len(self._entries) - self.max_entries // 2):
+                    self._entries.popitem(last=False)
+                self._rebuild()
+            elif self._stale > len(self._entries):
+                self._rebuild()
+            else:
+                self._tree.add(value, key)
+
+    def _rebuild(self) -> None:
+        self._tree = BKTree()
+        self._stale = 0
+        for entry_key, entry_value in self._entries.items():
+            self._tree.add(entry_value, entry_key)
+
+    def find(self, value: int, *, max_distance: int) -> str | None:
+        """Return the key of the closest value within `max_distance` bits, None if there is none."""
+        with self._lock:
+            match = self._tree.find(value, max_distance=max_distance, is_live=self._is_live)
+        if match is None:
+            self.misses.inc()
+            return None
+        self.hits.inc()
+        return match[1]
+
+    def _is_live(self, value: int, key: str) -> bool:
+        return self._entries.get(key) == value
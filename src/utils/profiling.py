@@ -0,0 +1,112 @@
+import collections
+import sys
+import threading
+from collections.abc import Iterable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from types import FrameType
+
+import torch
+from torch.autograd.profiler_util import FunctionEvent
+
+
+def format_collapsed(stacks: collections.Counter[str]) -> str:
+    """
+    Format stacks in the collapsed format, one `frame;frame;frame count` line per stack,
+    read by flamegraph.pl, speedscope and most other flame graph viewers.
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+class StackSampler:
+    """
+    Sample the Python stacks of all threads from a background thread, like `py-spy` or `pyinstrument`.
+    Profiled code runs unmodified, so sampling overhead is limited to the sampler thread holding the GIL.
+    """
+
+    def __init__(self, *, interval: float) -> None:
+        self.interval = interval
+        self.stacks: collections.Counter[str] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> collections.Counter[str]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.stacks
+
+    def _run(self) -> None:
+        sampler_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != sampler_id:
+                    self.stacks[self._collapse(thread_names.get(thread_id, str(thread_id)), frame)] += 1
+
+    @staticmethod
+    def _collapse(thread_name: str, frame: FrameType | None) -> str:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{frame.f_globals.get('__name__', code.co_filename)}:{code.co_qualname}")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ";".join(reversed(frames)).replace(" ", "_")
+
+
+def collapse_torch_events(events: Iterable[FunctionEvent], *, root: str) -> collections.Counter[str]:
+    """Collapse the operators recorded by `torch.profiler` into stacks weighted by their self CPU time in us."""
+    stacks: collections.Counter[str] = collections.Counter()
+    for event in events:
+        frames = []
+        parent = event
+        while parent is not None:
+            frames.append(parent.name)
+            parent = parent.cpu_parent
+        frames.append(root)
+        stacks[";".join(reversed(frames)).replace(" ", "_")] += round(event.self_cpu_time_total)
+    return stacks
+
+
+class ForwardProfiler:
+    """
+    Profile ML model forward passes with `torch.profiler` while a profiling session is active.
+    Outside of a session `profile()` only checks a flag, so it can stay on the hot path.
+    """
+
+    def __init__(self) -> None:
+        self.active = False
+        self.stacks: collections.Counter[str] = collections.Counter()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            self.stacks = collections.Counter()
+            self.active = True
+
+    def stop(self) -> collections.Counter[str]:
+        with self._lock:
+            self.active = False
+            return self.stacks
+
+    @contextmanager
+    def profile(self, name: str = "model_forward") -> Iterator[None]:
+        if not self.active:
+            yield
+            return
+
+        with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU]) as profiler:
+            yield
+        stacks = collapse_torch_events(profiler.events(), root=name)
+        with self._lock:
+            self.stacks.update(stacks)
+
+
+forward_profiler = ForwardProfiler()
@@ -0,0 +1,42 @@
+import asyncio
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Hashable
+from typing import Generic
+from typing import TypeVar
+
+from src.utils.metrics import registry
+
+R = TypeVar("R")
+
+
+class SingleFlight(Generic[R]):
+    """
+    Deduplicate concurrent calls with the same key.
+    The first caller starts the call, callers arriving while it is in flight wait for the same result.
+    The call runs in its own task, so it is not cancelled when the caller who started it goes away.
+    """
+
+    def __init__(self, *, name: str) -> None:
+        self.name = name
+        self.shared = registry.counter(f"{name}_shared_total", "Calls answered with the result of a call in flight.")
+        self._calls: dict[Hashable, asyncio.Task[R]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[R]]) -> R:
+        task = self._calls.get(key)
+        if task is not None and not task.done():
+            self.shared.inc()
+        else:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task[R]) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved, callers may have gone away before it finished
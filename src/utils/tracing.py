@@ -0,0 +1,92 @@
+import asyncio
+import functools
+import importlib.util
+import time
+from collections.abc import Callable
+from typing import Any
+from typing import TypeVar
+
+from src.utils.metrics import Histogram
+from src.utils.metrics import registry
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_histograms: dict[str, Histogram] = {}
+_tracer: Any = None
+
+
+def configure_tracing(*, enabled: bool) -> None:
+    """
+    Open an OpenTelemetry span for every timed stage, requires the optional `opentelemetry-api` package.
+    Exporters are configured by the OpenTelemetry SDK of the deployment, without it the spans are no-ops.
+    """
+    global _tracer  # noqa: PLW0603
+    if enabled and importlib.util.find_spec("opentelemetry") is not None:
+        from opentelemetry import trace  # noqa: PLC0415
+
+        _tracer = trace.get_tracer("src")
+    else:
+        _tracer = None
+
+
+def get_stage_histogram(stage: str) -> Histogram:
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        histogram = registry.histogram(
+            "stage_duration_seconds",
+            "Duration of the stages of processing an image.",
+            buckets=STAGE_BUCKETS,
+            labels={"stage": stage},
+        )
+        _histograms[stage] = histogram
+    return histogram
+
+
+class _StageTimer:
+    __slots__ = ("_span", "_start", "histogram", "stage")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.histogram = get_stage_histogram(stage)
+        self._span = None
+        self._start = 0.0
+
+    def __enter__(self) -> "_StageTimer":
+        if _tracer is not None:
+            self._span = _tracer.start_as_current_span(self.stage)
+            self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.histogram.observe(time.perf_counter() - self._start)
+        if self._span is not None:
+            self._span.__exit__(*exc_info)
+
+    def __call__(self, func: F) -> F:
+        stage = self.stage
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper_async(*args, **kwargs) -> Any:
+                with _StageTimer(stage):
+                    return await func(*args, **kwargs)
+
+            return wrapper_async
+
+        @functools.wraps(func)
+        def wrapper_sync(*args, **kwargs) -> Any:
+            with _StageTimer(stage):
+                return func(*args, **kwargs)
+
+        return wrapper_sync
+
+
+def timed(stage: str) -> _StageTimer:
+    """
+    Record the duration of `stage` in the `stage_duration_seconds` histogram.
+    Use as `with timed("stage"):` or as a decorator of sync and async functions.
+    """
+    return _StageTimer(stage)
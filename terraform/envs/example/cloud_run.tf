@@ -26,6 +26,14 @@ resource "google_cloud_run_v2_service" "api" {
         cpu_idle = true
       }
 
+      startup_probe {
+        http_get {
+          path = "/ready"
+        }
+        period_seconds    = 5
+        failure_threshold = 24
+      }
+
       env {
         name  = "GOOGLE_PROJECT_ID"
         value = var.gcp_project_id
@@ -77,6 +85,14 @@ resource "google_cloud_run_v2_service" "worker" {
         cpu_idle = true
       }
 
+      startup_probe {
+        http_get {
+          path = "/ready"
+        }
+        period_seconds    = 5
+        failure_threshold = 24
+      }
+
       env {
         name  = "GOOGLE_PROJECT_ID"
         value = var.gcp_project_id
@@ -0,0 +1,66 @@
+import json
+from collections.abc import AsyncIterator
+from unittest import mock
+
+from fastapi import HTTPException
+from fastapi import status
+from fastapi.exceptions import RequestValidationError
+from httpx import AsyncClient
+
+from src.app_api import app as app_api
+from src.enums.image import ImageAnnotationsGenerationStatus
+from src.schemas.image import ImageUpload
+from src.services.image_service import ImageService
+from tests.factories import ImageClassificationFactory
+
+
+async def test_batch_streams_results_as_ndjson(client_api: AsyncClient) -> None:
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS)
+    image = ImageUpload(image_hash="hash", content=b"", content_type="image/png", filename="cat.png")
+
+    async def classify_images(**kwargs) -> AsyncIterator:
+        yield "hash", image_classification
+
+    image_service = mock.Mock(
+        read_images=mock.AsyncMock(return_value=[image, RequestValidationError("File is empty."), image]),
+        classify_images=mock.Mock(side_effect=classify_images),
+    )
+    app_api.dependency_overrides[ImageService] = lambda: image_service
+
+    try:
+        response = await client_api.post("/what/batch", files=[("files", ("cat.png", b"...", "image/png"))])
+    finally:
+        app_api.dependency_overrides.clear()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["index"] for item in items] == [1, 0, 2]
+    assert items[0]["error"] == "File is empty."
+    assert items[1]["image_classification"]["image_hash"] == image_classification.image_hash
+
+
+async def test_batch_streams_errors_of_single_images(client_api: AsyncClient) -> None:
+    image = ImageUpload(image_hash="hash", content=b"", content_type="image/png")
+
+    async def classify_images(**kwargs) -> AsyncIterator:
+        yield "hash", HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Overloaded")
+
+    image_service = mock.Mock(
+        read_images=mock.AsyncMock(return_value=[image]),
+        classify_images=mock.Mock(side_effect=classify_images),
+    )
+    app_api.dependency_overrides[ImageService] = lambda: image_service
+
+    try:
+        response = await client_api.post("/what/batch", files=[("files", ("cat.png", b"...", "image/png"))])
+    finally:
+        app_api.dependency_overrides.clear()
+
+    assert json.loads(response.text) == {
+        "index": 0,
+        "filename": None,
+        "image_hash": "hash",
+        "image_classification": None,
+        "error": "Overloaded",
+    }
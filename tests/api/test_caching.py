@@ -0,0 +1,46 @@
+import pytest
+
+from src.api.caching import etag_matches
+from src.api.caching import get_cache_control
+from src.api.caching import get_etag
+from src.enums.image import ImageAnnotationsGenerationStatus
+from tests.conftest import settings
+from tests.factories import ImageClassificationFactory
+
+
+def test_etag_depends_on_hash_status_and_content():
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS)
+    etag = get_etag(image_classification)
+
+    assert etag.startswith(f'"{image_classification.image_hash}-success-')
+    assert get_etag(image_classification.model_copy()) == etag
+    assert get_etag(image_classification.model_copy(update={"annotations": []})) != etag
+    assert get_etag(image_classification.model_copy(update={"status": ImageAnnotationsGenerationStatus.ERROR})) != etag
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "expected_match"),
+    [
+        (None, False),
+        ('"other"', False),
+        ('"etag"', True),
+        ('W/"etag"', True),
+        ('"other", "etag"', True),
+        ("*", True),
+    ],
+)
+def test_etag_matches(if_none_match, expected_match):
+    assert etag_matches(if_none_match, '"etag"') is expected_match
+
+
+@pytest.mark.parametrize(
+    ("status", "expected_cache_control"),
+    [
+        (ImageAnnotationsGenerationStatus.SUCCESS, f"public, max-age={settings.status_cache_max_age}"),
+        (ImageAnnotationsGenerationStatus.ERROR, "no-cache"),
+        (ImageAnnotationsGenerationStatus.QUEUED, "no-cache"),
+    ],
+)
+def test_cache_control_keeps_success_until_max_age(status, expected_cache_control):
+    # reranking changes successful classifications, so they are never served as immutable
+    assert get_cache_control(status) == expected_cache_control
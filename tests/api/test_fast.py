@@ -0,0 +1,41 @@
+from unittest import mock
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from src.app_api import app as app_api
+from src.enums.image import ImageAnnotationsGenerationStatus
+from src.schemas.image import ImageUpload
+from src.services.image_service import ImageService
+from tests.factories import ImageClassificationFactory
+
+
+@pytest.mark.parametrize(
+    ("queued_status", "expected_status_code"),
+    [
+        (ImageAnnotationsGenerationStatus.PENDING, status.HTTP_202_ACCEPTED),
+        (ImageAnnotationsGenerationStatus.QUEUED, status.HTTP_202_ACCEPTED),
+        (ImageAnnotationsGenerationStatus.SUCCESS, status.HTTP_200_OK),
+    ],
+)
+async def test_fast_returns_classification_stored_by_other_request(
+    client_api: AsyncClient,
+    queued_status: ImageAnnotationsGenerationStatus,
+    expected_status_code: int,
+) -> None:
+    image_classification = ImageClassificationFactory(image_hash="hash", status=queued_status)
+    image_service = mock.Mock(
+        read_image=mock.AsyncMock(return_value=ImageUpload(image_hash="hash", content=b"", content_type="image/png")),
+        get_image_classification=mock.AsyncMock(return_value=None),
+        queue_generation_request=mock.AsyncMock(return_value=image_classification),
+    )
+    app_api.dependency_overrides[ImageService] = lambda: image_service
+
+    try:
+        response = await client_api.post("/what/fast", files={"img": ("cat.png", b"...", "image/png")})
+    finally:
+        app_api.dependency_overrides.clear()
+
+    assert response.status_code == expected_status_code
+    assert response.json() == image_classification.model_dump(mode="json")
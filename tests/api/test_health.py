@@ -1,6 +1,12 @@
+from unittest import mock
+
+import pytest
 from fastapi import status
 from httpx import AsyncClient
 
+from src.app_api import app as app_api
+from src.services.model_registry import get_model_registry
+
 
 async def test_healthcheck_api(client_api: AsyncClient) -> None:
     response = await client_api.get("/health")
@@ -14,3 +20,21 @@ async def test_healthcheck_worker(client_worker: AsyncClient) -> None:
 
     assert response.status_code == status.HTTP_204_NO_CONTENT
     assert response.text == ""
+
+
+@pytest.mark.parametrize(
+    ("is_ready", "expected_status_code"),
+    [
+        (True, status.HTTP_204_NO_CONTENT),
+        (False, status.HTTP_503_SERVICE_UNAVAILABLE),
+    ],
+)
+async def test_readiness(client_api: AsyncClient, is_ready: bool, expected_status_code: int) -> None:
+    app_api.dependency_overrides[get_model_registry] = lambda: mock.Mock(is_ready=is_ready)
+
+    try:
+        response = await client_api.get("/ready")
+    finally:
+        app_api.dependency_overrides.clear()
+
+    assert response.status_code == expected_status_code
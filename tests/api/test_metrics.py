@@ -0,0 +1,32 @@
+import pytest
+from fastapi import FastAPI
+from fastapi import status
+from httpx import AsyncClient
+
+from src.api import metrics
+from src.utils.tracing import timed
+
+
+@pytest.fixture()
+async def client_metrics() -> AsyncClient:
+    app = FastAPI()
+    app.include_router(metrics.router)
+    async with AsyncClient(app=app, base_url="https://test") as c:
+        yield c
+
+
+async def test_metrics(client_metrics: AsyncClient) -> None:
+    with timed("test_metrics"):
+        pass
+
+    response = await client_metrics.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'stage_duration_seconds_count{stage="test_metrics"} 1.0' in response.text
+
+
+async def test_metrics_disabled_by_default(client_api: AsyncClient) -> None:
+    response = await client_api.get("/metrics")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
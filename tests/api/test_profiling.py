@@ -0,0 +1,55 @@
+import pytest
+from fastapi import FastAPI
+from fastapi import status
+from httpx import AsyncClient
+
+from src.api import profiling
+from src.config import get_settings
+
+
+@pytest.fixture()
+def app_profiling() -> FastAPI:
+    app = FastAPI()
+    app.include_router(profiling.router)
+    app.dependency_overrides[get_settings] = lambda: get_settings().model_copy(update={"profiling_token": "secret"})
+    return app
+
+
+@pytest.fixture()
+async def client_profiling(app_profiling: FastAPI) -> AsyncClient:
+    async with AsyncClient(app=app_profiling, base_url="https://test") as c:
+        yield c
+
+
+async def test_profile_requires_token(client_profiling: AsyncClient) -> None:
+    response = await client_profiling.get("/admin/profile", params={"seconds": 0.01})
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+async def test_profile_refused_without_configured_token(app_profiling: FastAPI, client_profiling: AsyncClient) -> None:
+    settings = get_settings().model_copy(update={"profiling_token": None})
+    app_profiling.dependency_overrides[get_settings] = lambda: settings
+
+    response = await client_profiling.get("/admin/profile", params={"seconds": 0.01})
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+async def test_profile_returns_collapsed_stacks(client_profiling: AsyncClient) -> None:
+    response = await client_profiling.get(
+        "/admin/profile",
+        params={"seconds": 0.05, "interval": 0.001},
+        headers={"X-Profiling-Token": "secret"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines())
+    assert "MainThread;" in response.text
+
+
+async def test_profiling_disabled_by_default(client_api: AsyncClient) -> None:
+    response = await client_api.get("/admin/profile", params={"seconds": 0.01})
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
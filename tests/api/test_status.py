@@ -0,0 +1,118 @@
+import json
+from collections.abc import Generator
+from unittest import mock
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from src.api.caching import get_etag
+from src.api.caching import get_etag_index
+from src.app_api import app as app_api
+from src.config import get_settings
+from src.enums.image import ImageAnnotationsGenerationStatus
+from src.services.image_service import ImageService
+from src.utils.cache import TTLCache
+from tests.factories import ImageClassificationFactory
+
+
+@pytest.fixture()
+def image_service(etag_index) -> Generator:
+    pending = ImageClassificationFactory(image_hash="hash", status=ImageAnnotationsGenerationStatus.QUEUED)
+    image_service = mock.Mock(
+        get_image_classification=mock.AsyncMock(return_value=pending),
+        wait_for_image_classification=mock.AsyncMock(
+            return_value=pending.model_copy(update={"status": ImageAnnotationsGenerationStatus.SUCCESS}),
+        ),
+    )
+    app_api.dependency_overrides[ImageService] = lambda: image_service
+    app_api.dependency_overrides[get_etag_index] = lambda: etag_index
+    yield image_service
+    app_api.dependency_overrides.clear()
+
+
+@pytest.fixture()
+def etag_index() -> TTLCache[str, str]:
+    return TTLCache(max_entries=10, max_bytes=1024, name="test_etag_index")
+
+
+@pytest.mark.parametrize(
+    ("wait", "expected_status"),
+    [
+        ("", ImageAnnotationsGenerationStatus.QUEUED),
+        ("?wait=10", ImageAnnotationsGenerationStatus.SUCCESS),
+    ],
+)
+async def test_status_long_polls_with_wait(client_api: AsyncClient, image_service, wait, expected_status) -> None:
+    response = await client_api.get(f"/what/status/hash{wait}")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == expected_status
+    assert image_service.wait_for_image_classification.called is bool(wait)
+
+
+async def test_status_long_poll_returns_pending_when_wait_is_over(client_api: AsyncClient, image_service) -> None:
+    image_service.wait_for_image_classification.return_value = None
+
+    response = await client_api.get("/what/status/hash?wait=1")
+
+    assert response.json()["status"] == ImageAnnotationsGenerationStatus.QUEUED
+
+
+async def test_status_events_stream_until_finished(client_api: AsyncClient, image_service) -> None:
+    finished = image_service.wait_for_image_classification.return_value
+    image_service.wait_for_image_classification.side_effect = [None, finished]
+
+    response = await client_api.get("/what/status/hash/events")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = response.text.split("\n\n")
+    assert events[1] == ": keep-alive"
+    statuses = [json.loads(event.split("data: ")[1])["status"] for event in events if event.startswith("event: status")]
+    assert statuses == [ImageAnnotationsGenerationStatus.QUEUED, ImageAnnotationsGenerationStatus.SUCCESS]
+
+
+async def test_status_events_missing_image(client_api: AsyncClient, image_service) -> None:
+    image_service.get_image_classification.return_value = None
+
+    response = await client_api.get("/what/status/missing/events")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_status_answers_not_modified_from_etag_index(client_api: AsyncClient, image_service) -> None:
+    finished = image_service.wait_for_image_classification.return_value
+    image_service.get_image_classification.return_value = finished
+
+    response = await client_api.get("/what/status/hash")
+    etag = response.headers["etag"]
+    cached = await client_api.get("/what/status/hash", headers={"If-None-Match": etag})
+
+    assert etag == get_etag(finished)
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+    assert cached.headers["etag"] == etag
+    assert cached.headers["cache-control"] == response.headers["cache-control"]
+    image_service.get_image_classification.assert_called_once()
+
+
+async def test_status_indexes_etag_no_longer_than_clients_cache(client_api: AsyncClient, image_service) -> None:
+    settings = get_settings().model_copy(update={"status_cache_max_age": 0})
+    app_api.dependency_overrides[get_settings] = lambda: settings
+    finished = image_service.wait_for_image_classification.return_value
+    image_service.get_image_classification.return_value = finished
+
+    response = await client_api.get("/what/status/hash")
+    await client_api.get("/what/status/hash", headers={"If-None-Match": response.headers["etag"]})
+
+    assert image_service.get_image_classification.call_count == 2
+
+
+async def test_status_revalidates_pending_classification(client_api: AsyncClient, image_service) -> None:
+    response = await client_api.get("/what/status/hash")
+    revalidated = await client_api.get("/what/status/hash", headers={"If-None-Match": response.headers["etag"]})
+
+    assert response.headers["cache-control"] == "no-cache"
+    assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+    assert image_service.get_image_classification.call_count == 2
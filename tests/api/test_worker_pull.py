@@ -0,0 +1,78 @@
+from unittest import mock
+
+import pytest
+from fastapi import status
+
+from src.api.exceptions import GenerationInProgressError
+from src.app_worker_pull import PullWorker
+from tests.conftest import settings
+
+
+@pytest.fixture()
+def image_service() -> mock.Mock:
+    return mock.Mock(
+        get_image_classifications=mock.AsyncMock(return_value={}),
+        coalesce_writes=mock.Mock(return_value=mock.AsyncMock()),
+        process_generation_request=mock.AsyncMock(),
+    )
+
+
+@pytest.fixture()
+def worker(image_service) -> PullWorker:
+    worker = PullWorker(settings=settings)
+    worker.create_image_service = mock.Mock(return_value=image_service)
+    return worker
+
+
+def make_message(**attributes) -> mock.Mock:
+    return mock.Mock(attributes=attributes)
+
+
+async def test_process_batch_shares_multi_get(worker, image_service):
+    messages = [
+        make_message(image_hash="first", image_url="https://first"),
+        make_message(image_hash="second", image_url="https://second"),
+        make_message(image_hash="first", image_url="https://first"),
+    ]
+
+    results = await worker.process_batch(messages)
+
+    assert results == [True, True, True]
+    image_service.get_image_classifications.assert_called_once()
+    assert sorted(image_service.get_image_classifications.call_args.kwargs["image_hashes"]) == ["first", "second"]
+    image_service.coalesce_writes.assert_called_once()
+    assert image_service.process_generation_request.call_count == 3
+
+
+async def test_process_batch_fails_messages_separately(worker, image_service):
+    image_service.process_generation_request.side_effect = [None, RuntimeError("download failed")]
+    messages = [
+        make_message(image_hash="first", image_url="https://first"),
+        make_message(image_hash="second", image_url="https://second"),
+        make_message(image_url="https://invalid"),
+    ]
+
+    results = await worker.process_batch(messages)
+
+    assert results[0] is True
+    assert isinstance(results[1], RuntimeError)
+    assert isinstance(results[2], ValueError)
+
+
+@pytest.mark.parametrize(
+    ("exception", "acked"),
+    [
+        (None, True),
+        (RuntimeError("failed"), False),
+        (GenerationInProgressError(status_code=status.HTTP_409_CONFLICT), False),
+    ],
+)
+async def test_handle_message_acks_or_nacks(worker, image_service, exception, acked):
+    image_service.process_generation_request.side_effect = exception
+    message = make_message(image_hash="hash", image_url="https://hash")
+
+    await worker.handle_message(message)
+    await worker.batcher.close()
+
+    assert message.ack.called is acked
+    assert message.nack.called is not acked
@@ -0,0 +1,63 @@
+import io
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from PIL import Image
+from transformers import ViTConfig
+from transformers import ViTForImageClassification
+from transformers import ViTImageProcessor
+
+from src.services.image_service import ImageService
+from src.services.image_service import create_image_service
+from src.services.model_registry import ModelRegistry
+from src.utils.cache import TTLCache
+from src.utils.perceptual_hash import NearDuplicateIndex
+from tests.conftest import settings
+
+
+@pytest.fixture(scope="session")
+def model_registry() -> ModelRegistry:
+    """The real model when it is checked out, otherwise a small random ViT with the same input and output shapes."""
+    model_registry = ModelRegistry(model_dir=settings.ml_model_dir, backend=settings.ml_model_backend)
+    if not (Path(settings.ml_model_dir) / "config.json").exists():
+        config = ViTConfig(hidden_size=192, num_hidden_layers=2, num_attention_heads=3, intermediate_size=768)
+        config.id2label = {index: f"label-{index}" for index in range(1000)}
+        config.label2id = {label: index for index, label in config.id2label.items()}
+        processor_from_pretrained = mock.patch.object(
+            ViTImageProcessor,
+            "from_pretrained",
+            return_value=ViTImageProcessor(),
+        )
+        model_from_pretrained = mock.patch.object(
+            ViTForImageClassification,
+            "from_pretrained",
+            return_value=ViTForImageClassification(config),
+        )
+        with processor_from_pretrained, model_from_pretrained:
+            model_registry.load(warm_up=True)
+    else:
+        model_registry.load(warm_up=True)
+    return model_registry
+
+
+@pytest.fixture()
+def image_service(model_registry) -> ImageService:
+    return create_image_service(
+        settings,
+        database_service=mock.Mock(get_entity=mock.Mock(return_value=None)),
+        queue_service=mock.Mock(),
+        storage_service=mock.Mock(),
+        model_registry=model_registry,
+        classification_cache=TTLCache(max_entries=0, max_bytes=0, name="benchmark_image_classification_cache"),
+        http_client=mock.Mock(),
+        near_duplicate_index=NearDuplicateIndex(max_entries=0, name="benchmark_near_duplicate_index"),
+    )
+
+
+@pytest.fixture(scope="session")
+def image_content() -> bytes:
+    """A photo sized JPEG, so decoding and resizing cost what they do in production."""
+    buffer = io.BytesIO()
+    Image.effect_mandelbrot((1600, 1200), (-2.0, -1.5, 1.0, 1.5), 100).convert("RGB").save(buffer, format="JPEG")
+    return buffer.getvalue()
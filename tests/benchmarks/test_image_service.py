@@ -0,0 +1,47 @@
+import asyncio
+import io
+
+from fastapi import UploadFile
+
+from src.services.image_service import ImageService
+from tests.conftest import settings
+
+BATCH_SIZE = 8
+
+
+def test_generate_annotations(benchmark, image_service, image_content):
+    annotations = benchmark(image_service.generate_annotations, image_content)
+
+    assert len(annotations) == settings.num_annotations
+
+
+def test_generate_annotations_batch(benchmark, image_service, image_content):
+    results = benchmark(image_service.generate_annotations_batch, [image_content] * BATCH_SIZE)
+
+    assert len(results) == BATCH_SIZE
+
+
+def test_calculate_hash(benchmark, image_content):
+    loop = asyncio.new_event_loop()
+
+    def calculate_hash() -> str:
+        file = UploadFile(file=io.BytesIO(image_content))
+        return loop.run_until_complete(ImageService.calculate_hash(file=file))
+
+    try:
+        assert len(benchmark(calculate_hash)) == 64
+    finally:
+        loop.close()
+
+
+def test_read_image(benchmark, image_service, image_content):
+    loop = asyncio.new_event_loop()
+
+    def read_image() -> str:
+        file = UploadFile(file=io.BytesIO(image_content), headers={"content-type": "image/jpeg"})
+        return loop.run_until_complete(image_service.read_image(file=file)).image_hash
+
+    try:
+        assert len(benchmark(read_image)) == 64
+    finally:
+        loop.close()
@@ -0,0 +1,19 @@
+from src.enums.image import ImageAnnotationsGenerationStatus
+from src.schemas.image import ImageClassification
+from tests.factories import ImageClassificationFactory
+
+
+def test_image_classification_serialization(benchmark):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS)
+
+    data = benchmark(image_classification.model_dump_json)
+
+    assert image_classification.image_hash in data
+
+
+def test_image_classification_validation(benchmark):
+    data = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS).model_dump()
+
+    image_classification = benchmark(ImageClassification.model_validate, data)
+
+    assert image_classification.status == ImageAnnotationsGenerationStatus.SUCCESS
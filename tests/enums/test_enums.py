@@ -14,3 +14,36 @@ from src.enums.image import ImageAnnotationsGenerationStatus
 )
 def test_image_thumbnails_generation_status_is_done(status: ImageAnnotationsGenerationStatus, expected_done: bool):
     assert status.is_done() is expected_done
+
+
+@pytest.mark.parametrize(
+    ("status", "next_status", "expected_allowed"),
+    [
+        (ImageAnnotationsGenerationStatus.PENDING, ImageAnnotationsGenerationStatus.PENDING, False),
+        (ImageAnnotationsGenerationStatus.PENDING, ImageAnnotationsGenerationStatus.QUEUED, True),
+        (ImageAnnotationsGenerationStatus.PENDING, ImageAnnotationsGenerationStatus.SUCCESS, True),
+        (ImageAnnotationsGenerationStatus.QUEUED, ImageAnnotationsGenerationStatus.PENDING, False),
+        (ImageAnnotationsGenerationStatus.QUEUED, ImageAnnotationsGenerationStatus.ERROR, True),
+        (ImageAnnotationsGenerationStatus.SUCCESS, ImageAnnotationsGenerationStatus.QUEUED, False),
+        (ImageAnnotationsGenerationStatus.SUCCESS, ImageAnnotationsGenerationStatus.ERROR, False),
+        (ImageAnnotationsGenerationStatus.SUCCESS, ImageAnnotationsGenerationStatus.SUCCESS, True),
+        (ImageAnnotationsGenerationStatus.ERROR, ImageAnnotationsGenerationStatus.QUEUED, False),
+        (ImageAnnotationsGenerationStatus.ERROR, ImageAnnotationsGenerationStatus.SUCCESS, True),
+    ],
+)
+def test_image_annotations_generation_status_can_transition_to(
+    status: ImageAnnotationsGenerationStatus,
+    next_status: ImageAnnotationsGenerationStatus,
+    expected_allowed: bool,
+):
+    assert status.can_transition_to(next_status) is expected_allowed
+
+
+@pytest.mark.parametrize("status", list(ImageAnnotationsGenerationStatus))
+def test_image_annotations_generation_status_refusals_hold_for_later_statuses(status: ImageAnnotationsGenerationStatus):
+    # a transition refused from a status is refused from every status after it, so stale cached statuses are safe
+    for later_status in ImageAnnotationsGenerationStatus:
+        if status.can_transition_to(later_status):
+            for next_status in ImageAnnotationsGenerationStatus:
+                if not status.can_transition_to(next_status):
+                    assert not later_status.can_transition_to(next_status)
@@ -3,20 +3,32 @@ from unittest import mock
 
 import pytest
 
+from src.services.database_service import DatabaseService
+from src.services.queue_service import QueueService
+from src.services.storage_service import StorageService
+
 
 @pytest.fixture()
 def gcp_storage_client(autouse=True) -> Generator:
-    with mock.patch("google.cloud.storage.Client") as client:
+    with mock.patch("google.cloud.storage.Client") as client, mock.patch.object(
+        StorageService,
+        "_client",
+        None,
+    ), mock.patch.object(StorageService, "_existing_blobs", None):
         yield client
 
 
 @pytest.fixture()
 def gcp_pubsub_client() -> Generator:
-    with mock.patch("google.cloud.pubsub_v1.PublisherClient") as client:
+    with mock.patch("google.cloud.pubsub_v1.PublisherClient") as client, mock.patch.object(
+        QueueService,
+        "_publisher_client",
+        None,
+    ):
         yield client
 
 
 @pytest.fixture()
 def gcp_datastore_client() -> Generator:
-    with mock.patch("google.cloud.datastore.Client") as client:
+    with mock.patch("google.cloud.datastore.Client") as client, mock.patch.object(DatabaseService, "_client", None):
         yield client
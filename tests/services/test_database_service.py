@@ -1,5 +1,8 @@
 from unittest import mock
 
+import pytest
+from google.api_core.exceptions import Aborted
+
 from src.services.database_service import DatabaseService
 from tests.conftest import settings
 
@@ -34,3 +37,153 @@ async def test_database_upsert_entity(entity_mock, gcp_datastore_client) -> None
     entity_mock.return_value.update.assert_called_with(data)
 
     put_method.assert_called_with(entity_mock.return_value)
+
+
+async def test_database_get_many(gcp_datastore_client) -> None:
+    database_service = DatabaseService(settings=settings)
+    collection = "CollectionName"
+    entity = mock.Mock(key=mock.Mock())
+    entity.key.name = "entity-1"
+    gcp_datastore_client.return_value.get_multi.return_value = [entity]
+
+    entities = database_service.get_many(collection=collection, entity_ids=["entity-1", "entity-2", "entity-1"])
+
+    key_method = gcp_datastore_client.return_value.key
+    get_multi_method = gcp_datastore_client.return_value.get_multi
+
+    assert entities == {"entity-1": entity}
+    assert key_method.call_args_list == [mock.call(collection, "entity-1"), mock.call(collection, "entity-2")]
+    get_multi_method.assert_called_once_with([key_method.return_value, key_method.return_value])
+
+
+@mock.patch("src.services.database_service.MAX_ENTITIES_PER_PUT", 2)
+@mock.patch("google.cloud.datastore.Entity")
+async def test_database_upsert_many(entity_mock, gcp_datastore_client) -> None:
+    database_service = DatabaseService(settings=settings)
+    collection = "CollectionName"
+    data = {f"entity-{i}": {"key": i} for i in range(3)}
+
+    database_service.upsert_many(collection=collection, data=data)
+
+    put_multi_method = gcp_datastore_client.return_value.put_multi
+
+    assert entity_mock.return_value.update.call_args_list == [mock.call({"key": i}) for i in range(3)]
+    assert [len(call.args[0]) for call in put_multi_method.call_args_list] == [2, 1]
+
+
+@pytest.mark.parametrize(
+    ("stored_lease", "expected_claimed"),
+    [
+        (None, True),
+        ({"owner": "me", "expires_at": 2000}, True),
+        ({"owner": "other", "expires_at": 900}, True),
+        ({"owner": "other", "expires_at": 2000}, False),
+    ],
+)
+@mock.patch("src.services.database_service.time.time", mock.Mock(return_value=1000))
+@mock.patch("google.cloud.datastore.Entity")
+async def test_database_claim_lease(entity_mock, gcp_datastore_client, stored_lease, expected_claimed) -> None:
+    database_service = DatabaseService(settings=settings)
+    gcp_datastore_client.return_value.get.return_value = stored_lease
+
+    claimed = database_service.claim_lease(collection="Lease", entity_id="lease-id", owner="me", ttl=60)
+
+    put_method = gcp_datastore_client.return_value.put
+
+    assert claimed is expected_claimed
+    gcp_datastore_client.return_value.transaction.assert_called_once()
+    if expected_claimed:
+        entity_mock.return_value.update.assert_called_once_with({"owner": "me", "expires_at": 1060})
+        put_method.assert_called_once_with(entity_mock.return_value)
+    else:
+        put_method.assert_not_called()
+
+
+@pytest.mark.parametrize(("owner", "expected_deleted"), [("me", True), ("other", False)])
+async def test_database_release_lease(gcp_datastore_client, owner, expected_deleted) -> None:
+    database_service = DatabaseService(settings=settings)
+    gcp_datastore_client.return_value.get.return_value = {"owner": owner, "expires_at": 0}
+
+    database_service.release_lease(collection="Lease", entity_id="lease-id", owner="me")
+
+    assert gcp_datastore_client.return_value.delete.called is expected_deleted
+
+
+@pytest.mark.parametrize(
+    ("stored", "expected_written"),
+    [
+        (None, True),
+        ({"version": 1}, True),
+        ({"version": 3}, False),
+    ],
+)
+@mock.patch("google.cloud.datastore.Entity")
+async def test_database_upsert_entity_if(entity_mock, gcp_datastore_client, stored, expected_written) -> None:
+    database_service = DatabaseService(settings=settings)
+    gcp_datastore_client.return_value.get.return_value = stored
+    data = {"version": 2}
+
+    written = database_service.upsert_entity_if(
+        collection="CollectionName",
+        entity_id="entity-id",
+        data=data,
+        condition=lambda entity, new: entity is None or entity["version"] < new["version"],
+    )
+
+    put_method = gcp_datastore_client.return_value.put
+
+    assert written is expected_written
+    gcp_datastore_client.return_value.transaction.assert_called_once()
+    if expected_written:
+        entity_mock.return_value.update.assert_called_once_with(data)
+        put_method.assert_called_once_with(entity_mock.return_value)
+    else:
+        put_method.assert_not_called()
+
+
+@mock.patch("src.services.database_service.MAX_ENTITIES_PER_PUT", 2)
+@mock.patch("google.cloud.datastore.Entity")
+async def test_database_upsert_many_if(entity_mock, gcp_datastore_client) -> None:
+    database_service = DatabaseService(settings=settings)
+    stored = mock.MagicMock(key=mock.Mock())
+    stored.key.name = "entity-1"
+    stored.__getitem__.return_value = 5
+    gcp_datastore_client.return_value.get_multi.side_effect = [[stored], []]
+    data = {f"entity-{i}": {"version": i} for i in range(3)}
+
+    written = database_service.upsert_many_if(
+        collection="CollectionName",
+        data=data,
+        condition=lambda entity, new: entity is None or entity["version"] < new["version"],
+    )
+
+    put_multi_method = gcp_datastore_client.return_value.put_multi
+
+    assert written == ["entity-0", "entity-2"]
+    assert gcp_datastore_client.return_value.transaction.call_count == 2
+    assert entity_mock.return_value.update.call_args_list == [mock.call({"version": 0}), mock.call({"version": 2})]
+    assert [len(call.args[0]) for call in put_multi_method.call_args_list] == [1, 1]
+
+
+@pytest.mark.parametrize(("aborted_commits", "expected_claimed"), [(2, True), (4, None)])
+@mock.patch("src.services.database_service.time.sleep")
+async def test_database_transaction_retries_aborted_commits(
+    sleep_mock,
+    gcp_datastore_client,
+    aborted_commits,
+    expected_claimed,
+) -> None:
+    database_service = DatabaseService(settings=settings.model_copy(update={"datastore_transaction_retries": 3}))
+    transaction = gcp_datastore_client.return_value.transaction.return_value
+    transaction.__exit__.side_effect = [Aborted("contention")] * aborted_commits + [None]
+    gcp_datastore_client.return_value.get.return_value = None
+
+    if expected_claimed is None:
+        with pytest.raises(Aborted):
+            database_service.claim_lease(collection="Lease", entity_id="lease-id", owner="me", ttl=60)
+    else:
+        claimed = database_service.claim_lease(collection="Lease", entity_id="lease-id", owner="me", ttl=60)
+        assert claimed is expected_claimed
+
+    assert transaction.__exit__.call_count == min(aborted_commits + 1, 4)
+    assert sleep_mock.call_count == min(aborted_commits, 3)
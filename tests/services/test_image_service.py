@@ -1 +1,839 @@
-# TODO
+import asyncio
+import hashlib
+import io
+import zipfile
+from collections.abc import Generator
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pytest
+import torch
+from fastapi import BackgroundTasks
+from fastapi import UploadFile
+from fastapi import status
+from fastapi.exceptions import RequestValidationError
+from google.api_core.exceptions import ServiceUnavailable
+from PIL import Image
+
+from src.api.exceptions import GenerationInProgressError
+from src.api.exceptions import InferenceOverloadedError
+from src.enums.image import ImageAnnotationsGenerationStatus
+from src.schemas.image import ImageUpload
+from src.services.image_service import ImageService
+from src.services.image_service import create_image_service
+from src.services.image_service import get_image_single_flight
+from src.services.image_service import get_inference_batcher
+from src.utils.batching import BatcherFullError
+from src.utils.batching import MicroBatcher
+from src.utils.cache import TTLCache
+from src.utils.executors import BoundedExecutor
+from src.utils.executors import ExecutorFullError
+from src.utils.notifications import NotificationHub
+from src.utils.perceptual_hash import NearDuplicateIndex
+from src.utils.preprocessing import ImagePreprocessor
+from src.utils.singleflight import SingleFlight
+from tests.conftest import settings
+from tests.factories import ImageClassificationFactory
+
+NUM_LABELS = 10
+
+
+def make_image(color: str = "red") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), color=color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture()
+def ml_model() -> mock.Mock:
+    def forward(pixel_values: torch.Tensor) -> SimpleNamespace:
+        logits = torch.arange(NUM_LABELS, dtype=torch.float32).repeat(pixel_values.shape[0], 1)
+        return SimpleNamespace(logits=logits)
+
+    model = mock.Mock(side_effect=forward)
+    model.config.id2label = {i: f"label-{i}" for i in range(NUM_LABELS)}
+    model.config.num_labels = NUM_LABELS
+    return model
+
+
+@pytest.fixture()
+def ml_processor() -> mock.Mock:
+    return mock.Mock(side_effect=lambda images, return_tensors: {"pixel_values": torch.zeros(len(images), 3, 4, 4)})
+
+
+@pytest.fixture()
+def database_service() -> mock.Mock:
+    return mock.Mock(
+        get_entity=mock.Mock(return_value=None),
+        upsert_entity_if=mock.Mock(return_value=True),
+        upsert_many_if=mock.Mock(side_effect=lambda *, collection, data, condition: list(data)),
+    )
+
+
+@pytest.fixture(autouse=True)
+def inference_batcher(image_service) -> Generator:
+    # the batcher is shared by the process, the one of the test runs the forward passes of the test service
+    batcher = MicroBatcher(
+        image_service.process_inference_batch,
+        max_batch_size=settings.inference_batch_max_size,
+        max_wait=settings.inference_batch_max_wait_ms / 1000,
+        name="test_inference",
+    )
+    with mock.patch("src.services.image_service.get_inference_batcher", return_value=batcher), mock.patch.object(
+        ImageService,
+        "_logits_store",
+        None,
+    ):
+        yield batcher
+
+
+@pytest.fixture()
+def image_service(database_service, ml_model, ml_processor) -> ImageService:
+    return ImageService(
+        settings=settings,
+        database_service=database_service,
+        queue_service=mock.Mock(),
+        storage_service=mock.Mock(),
+        model_registry=mock.Mock(
+            model=ml_model,
+            processor=ml_processor,
+            id2label=ml_model.config.id2label,
+            preprocessor=ImagePreprocessor(size=(4, 4), image_mean=(0.5, 0.5, 0.5), image_std=(0.5, 0.5, 0.5)),
+        ),
+        classification_cache=TTLCache(max_entries=10, max_bytes=1024 * 1024, name="test_image_classification_cache"),
+        io_executor=BoundedExecutor(max_workers=2, max_pending=8, name="test-io"),
+        single_flight=SingleFlight(name="test_image_single_flight"),
+        http_client=mock.Mock(get_content=mock.AsyncMock(return_value=b"from url")),
+        near_duplicate_index=NearDuplicateIndex(max_entries=10, name="test_near_duplicate_index"),
+        processed_messages=TTLCache(max_entries=10, max_bytes=10, name="test_processed_messages"),
+        notifications=NotificationHub(name="test_image_classification_notifications"),
+    )
+
+
+def test_create_image_service_replaces_only_given_dependencies():
+    classification_cache = TTLCache(max_entries=0, max_bytes=0, name="test_create_image_service_cache")
+
+    image_service = create_image_service(settings, classification_cache=classification_cache)
+
+    assert image_service.classification_cache is classification_cache
+    assert image_service.single_flight is get_image_single_flight()
+    assert image_service.settings is settings
+
+
+def make_upload_file(content: bytes, content_type: str = "image/png") -> UploadFile:
+    return UploadFile(
+        file=io.BytesIO(content),
+        filename="image.png",
+        headers={"content-type": content_type},
+    )
+
+
+async def test_read_image_hashes_and_keeps_content(image_service):
+    content = make_image()
+
+    image = await image_service.read_image(file=make_upload_file(content))
+
+    assert image.content == content
+    assert image.content_type == "image/png"
+    assert image.image_hash == hashlib.sha256(content).hexdigest()
+
+
+async def test_read_image_stops_when_file_is_too_large(image_service):
+    image_service.settings = settings.model_copy(update={"max_file_size": 64, "upload_chunk_size": 16})
+    file = make_upload_file(make_image())
+
+    with pytest.raises(RequestValidationError) as e:
+        await image_service.read_image(file=file)
+
+    assert e.value.errors() == "File size is too large."
+    assert file.file.tell() == 80
+
+
+@pytest.mark.parametrize("content", [b"GIF89a...", b""])
+async def test_read_image_rejects_unknown_content(image_service, content):
+    with pytest.raises(RequestValidationError):
+        await image_service.read_image(file=make_upload_file(content))
+
+
+def test_generate_annotations_batch_runs_single_forward_pass(image_service, ml_model):
+    results = image_service.generate_annotations_batch([make_image("red"), make_image("blue")])
+
+    ml_model.assert_called_once()
+    assert len(results) == 2
+    for annotations in results:
+        assert [annotation.label for annotation in annotations] == [f"label-{i}" for i in range(9, 4, -1)]
+        assert [annotation.index for annotation in annotations] == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.parametrize("fast_preprocessing", [True, False])
+def test_generate_annotations_batch_preprocessing(image_service, ml_model, ml_processor, fast_preprocessing):
+    image_service.settings = settings.model_copy(update={"fast_preprocessing": fast_preprocessing})
+
+    image_service.generate_annotations_batch([make_image(), make_image()])
+
+    assert ml_processor.called is not fast_preprocessing
+    assert ml_model.call_args.kwargs["pixel_values"].shape == (2, 3, 4, 4)
+
+
+def test_generate_annotations_batch_isolates_broken_images(image_service):
+    results = image_service.generate_annotations_batch([b"not an image", make_image()])
+
+    assert isinstance(results[0], OSError)
+    assert len(results[1]) == settings.num_annotations
+
+
+def test_generate_annotations_raises_for_broken_image(image_service):
+    with pytest.raises(OSError):  # noqa: PT011
+        image_service.generate_annotations(b"not an image")
+
+
+async def test_generate_annotations_batched_rejects_when_overloaded(image_service, inference_batcher):
+    inference_batcher.submit = mock.AsyncMock(side_effect=BatcherFullError)
+
+    with pytest.raises(InferenceOverloadedError) as e:
+        await image_service.generate_annotations_batched(make_image())
+
+    assert e.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+def test_inference_batcher_runs_batches_on_process_wide_service():
+    process_wide_service = mock.Mock()
+    get_inference_batcher.cache_clear()
+    try:
+        with mock.patch("src.services.image_service.create_image_service", return_value=process_wide_service):
+            batcher = get_inference_batcher()
+    finally:
+        get_inference_batcher.cache_clear()
+
+    assert batcher.process_batch is process_wide_service.process_inference_batch
+
+
+async def test_get_image_classification_is_cached(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS)
+    database_service.get_entity.return_value = image_classification.model_dump()
+
+    first = await image_service.get_image_classification(image_hash=image_classification.image_hash)
+    second = await image_service.get_image_classification(image_hash=image_classification.image_hash)
+
+    assert first == second == image_classification
+    database_service.get_entity.assert_called_once()
+
+
+async def test_upsert_image_classification_writes_through_cache(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS)
+
+    await image_service.upsert_image_classification(image_classification=image_classification)
+    database_service.get_entity.reset_mock()
+
+    assert (
+        await image_service.get_image_classification(image_hash=image_classification.image_hash) == image_classification
+    )
+    database_service.get_entity.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    ("status", "expected_ttl"),
+    [
+        (ImageAnnotationsGenerationStatus.PENDING, settings.classification_cache_ttl_pending),
+        (ImageAnnotationsGenerationStatus.QUEUED, settings.classification_cache_ttl_pending),
+        (ImageAnnotationsGenerationStatus.SUCCESS, settings.classification_cache_ttl_done),
+        (ImageAnnotationsGenerationStatus.ERROR, settings.classification_cache_ttl_done),
+    ],
+)
+async def test_image_classification_cache_ttl_depends_on_status(image_service, status, expected_ttl):
+    image_classification = ImageClassificationFactory(status=status)
+
+    with mock.patch.object(image_service.classification_cache, "set") as cache_set:
+        await image_service.upsert_image_classification(image_classification=image_classification)
+
+    assert cache_set.call_args.kwargs["ttl"] == expected_ttl
+
+
+async def test_upsert_image_classification_does_not_read_back(image_service, database_service):
+    image_classification = ImageClassificationFactory()
+
+    await image_service.upsert_image_classification(image_classification=image_classification)
+
+    database_service.upsert_entity_if.assert_called_once()
+    database_service.get_entity.assert_not_called()
+
+
+async def test_get_image_classifications_uses_cache_and_multi_get(image_service, database_service):
+    cached, stored = ImageClassificationFactory.build_batch(2, status=ImageAnnotationsGenerationStatus.SUCCESS)
+    await image_service.upsert_image_classification(image_classification=cached)
+    database_service.get_many.return_value = {stored.image_hash: stored.model_dump()}
+
+    image_classifications = await image_service.get_image_classifications(
+        image_hashes=[cached.image_hash, stored.image_hash, "missing"],
+    )
+
+    assert image_classifications == {cached.image_hash: cached, stored.image_hash: stored}
+    database_service.get_many.assert_called_once_with(
+        collection=image_service.collection,
+        entity_ids=[stored.image_hash, "missing"],
+    )
+
+
+async def test_coalesce_writes_merges_concurrent_updates_of_same_image(image_service, database_service):
+    first, second = ImageClassificationFactory.build_batch(2, status=ImageAnnotationsGenerationStatus.PENDING)
+    finished = first.model_copy(update={"status": ImageAnnotationsGenerationStatus.SUCCESS})
+
+    async with image_service.coalesce_writes():
+        results = await asyncio.gather(
+            *(
+                image_service.upsert_image_classification(image_classification=image_classification)
+                for image_classification in (first, second, finished)
+            ),
+        )
+
+    assert results == [True, True, True]
+    database_service.upsert_entity_if.assert_not_called()
+    database_service.upsert_many_if.assert_called_once_with(
+        collection=image_service.collection,
+        data={first.image_hash: finished.model_dump(), second.image_hash: second.model_dump()},
+        condition=image_service._can_replace,
+    )
+    assert await image_service.get_image_classification(image_hash=first.image_hash) == finished
+
+
+async def test_coalesce_writes_returns_refused_writes(image_service, database_service):
+    stored, refused = ImageClassificationFactory.build_batch(2, status=ImageAnnotationsGenerationStatus.PENDING)
+    database_service.upsert_many_if.side_effect = lambda *, collection, data, condition: [stored.image_hash]
+
+    async with image_service.coalesce_writes():
+        results = await asyncio.gather(
+            image_service.upsert_image_classification(image_classification=stored),
+            image_service.upsert_image_classification(image_classification=refused),
+        )
+
+    assert results == [True, False]
+    assert image_service.classification_cache.get(refused.image_hash) is None
+
+
+async def test_coalesce_writes_caches_nothing_when_write_fails(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS)
+    database_service.upsert_many_if.side_effect = ServiceUnavailable("unavailable")
+
+    with pytest.raises(ServiceUnavailable):
+        async with image_service.coalesce_writes():
+            await image_service.upsert_image_classification(image_classification=image_classification)
+
+    assert image_service.classification_cache.get(image_classification.image_hash) is None
+
+
+async def test_generate_image_classification_shares_inference(image_service, ml_model, database_service):
+    contents = make_image()
+
+    results = await asyncio.gather(
+        *(image_service.generate_image_classification(image_hash="hash", contents=contents) for _ in range(3)),
+    )
+
+    ml_model.assert_called_once()
+    database_service.upsert_entity_if.assert_called_once()
+    assert all(result.status == ImageAnnotationsGenerationStatus.SUCCESS for result in results)
+
+
+async def test_generate_image_classification_waits_for_other_instance(image_service, ml_model, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS)
+    database_service.claim_lease.return_value = False
+    database_service.get_entity.side_effect = [None, image_classification.model_dump()]
+
+    image_service.settings = settings.model_copy(
+        update={"single_flight_across_instances": True, "single_flight_poll_interval": 0},
+    )
+
+    result = await image_service.generate_image_classification(
+        image_hash=image_classification.image_hash,
+        contents=make_image(),
+    )
+
+    assert result == image_classification
+    ml_model.assert_not_called()
+    database_service.upsert_entity_if.assert_not_called()
+
+
+async def test_queue_generation_request_schedules_single_upload(image_service, database_service):
+    background_tasks = BackgroundTasks()
+
+    calls = [
+        image_service.queue_generation_request(
+            image=ImageUpload(image_hash="hash", content=make_image(), content_type="image/png"),
+            background_tasks=background_tasks,
+        )
+        for _ in range(3)
+    ]
+    results = await asyncio.gather(*calls)
+
+    assert len(background_tasks.tasks) == 1
+    database_service.upsert_entity_if.assert_called_once()
+    assert all(result.status == ImageAnnotationsGenerationStatus.PENDING for result in results)
+
+
+async def test_track_generation_request_caches_queued_status(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.PENDING)
+    await image_service.upsert_image_classification(image_classification=image_classification)
+    database_service.upsert_entity_if.reset_mock()
+    future = Future()
+
+    task = image_service.track_generation_request(future=future, image_classification=image_classification)
+    await asyncio.sleep(0)
+    future.set_result("message-id")
+    await task
+
+    result = await image_service.get_image_classification(image_hash=image_classification.image_hash)
+    assert result.status == ImageAnnotationsGenerationStatus.QUEUED
+    database_service.upsert_entity_if.assert_not_called()
+    database_service.get_entity.assert_not_called()
+
+
+async def test_track_generation_request_stores_error(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.PENDING)
+    future = Future()
+
+    task = image_service.track_generation_request(future=future, image_classification=image_classification)
+    await asyncio.sleep(0)
+    database_service.upsert_entity_if.assert_not_called()
+    future.set_exception(ServiceUnavailable("unavailable"))
+    await task
+
+    assert image_classification.status == ImageAnnotationsGenerationStatus.ERROR
+    database_service.upsert_entity_if.assert_called_once()
+
+
+async def test_queued_image_classification_is_stored_twice(image_service, database_service):
+    background_tasks = BackgroundTasks()
+    future = Future()
+    future.set_result("message-id")
+    image_service.queue_service.publish_future.return_value = future
+
+    await image_service.queue_generation_request(
+        image=ImageUpload(image_hash="hash", content=make_image(), content_type="image/png"),
+        background_tasks=background_tasks,
+    )
+    await background_tasks()
+    await ImageService.wait_for_generation_requests()
+    database_service.get_entity.return_value = database_service.upsert_entity_if.call_args.kwargs["data"]
+    image_service.classification_cache.clear()
+    await image_service.process_generation_request(image_hash="hash", content=make_image())
+
+    statuses = [call.kwargs["data"]["status"] for call in database_service.upsert_entity_if.call_args_list]
+    assert statuses == [ImageAnnotationsGenerationStatus.PENDING, ImageAnnotationsGenerationStatus.SUCCESS]
+
+
+async def test_track_generation_request_never_regresses_success(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.PENDING)
+    stored = image_classification.model_copy(update={"status": ImageAnnotationsGenerationStatus.SUCCESS}).model_dump()
+    database_service.upsert_entity_if.side_effect = lambda *, collection, entity_id, data, condition: condition(
+        stored,
+        data,
+    )
+    database_service.get_entity.return_value = stored
+    future = Future()
+    future.set_result("message-id")
+
+    await image_service.track_generation_request(future=future, image_classification=image_classification)
+
+    result = await image_service.get_image_classification(image_hash=image_classification.image_hash)
+    assert result.status == ImageAnnotationsGenerationStatus.SUCCESS
+
+
+async def test_upsert_image_classification_skips_transition_refused_by_cache(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS)
+    await image_service.upsert_image_classification(image_classification=image_classification)
+    database_service.upsert_entity_if.reset_mock()
+
+    image_classification.status = ImageAnnotationsGenerationStatus.QUEUED
+    stored = await image_service.upsert_image_classification(image_classification=image_classification)
+
+    assert stored is False
+    database_service.upsert_entity_if.assert_not_called()
+
+
+async def test_queue_generation_request_returns_classification_stored_first(image_service, database_service):
+    stored = ImageClassificationFactory(image_hash="hash", status=ImageAnnotationsGenerationStatus.QUEUED)
+    database_service.upsert_entity_if.return_value = False
+    database_service.get_entity.return_value = stored.model_dump()
+    background_tasks = BackgroundTasks()
+
+    result = await image_service.queue_generation_request(
+        image=ImageUpload(image_hash="hash", content=make_image(), content_type="image/png"),
+        background_tasks=background_tasks,
+    )
+
+    assert result == stored
+    assert not background_tasks.tasks
+
+
+async def test_process_generation_request_stores_error_for_missing_image(image_service, database_service):
+    await image_service.process_generation_request(image_hash="missing", image_url="https://missing")
+
+    stored = database_service.upsert_entity_if.call_args.kwargs["data"]
+    assert stored["status"] == ImageAnnotationsGenerationStatus.ERROR
+
+
+async def test_process_generation_request_raises_when_overloaded(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.QUEUED)
+    database_service.get_entity.return_value = image_classification.model_dump()
+    overloaded = mock.AsyncMock(side_effect=InferenceOverloadedError(status_code=status.HTTP_503_SERVICE_UNAVAILABLE))
+
+    download = mock.AsyncMock(return_value=b"")
+
+    with mock.patch.object(ImageService, "get_image_content_from_url", download), mock.patch.object(
+        image_service,
+        "generate_annotations_batched",
+        overloaded,
+    ), pytest.raises(InferenceOverloadedError):
+        await image_service.process_generation_request(
+            image_hash=image_classification.image_hash,
+            image_url="https://image",
+        )
+
+    database_service.upsert_entity_if.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    ("image_source", "blob_name", "expected_content"),
+    [
+        ("url", "hash.png", b"from url"),
+        ("storage", "hash.png", b"from storage"),
+        ("storage", None, b"from url"),
+    ],
+)
+async def test_get_image_content_source(image_service, image_source, blob_name, expected_content):
+    image_service.settings = settings.model_copy(update={"worker_image_source": image_source})
+    image_service.storage_service.download.return_value = b"from storage"
+
+    content = await image_service.get_image_content(image_url="https://image", blob_name=blob_name)
+
+    assert content == expected_content
+
+
+@pytest.mark.parametrize(("inline_image_max_bytes", "inline"), [(256 * 1024, True), (0, False), (100, False)])
+async def test_send_generation_request_to_worker_inlines_small_images(image_service, inline_image_max_bytes, inline):
+    image_service.settings = settings.model_copy(update={"pubsub_inline_image_max_bytes": inline_image_max_bytes})
+    image = ImageUpload(image_hash="hash", content=make_image(), content_type="image/png", filename="image.png")
+    image_classification = ImageClassificationFactory(
+        image_hash="hash",
+        status=ImageAnnotationsGenerationStatus.PENDING,
+    )
+
+    with mock.patch.object(image_service, "track_generation_request"):
+        await image_service.send_generation_request_to_worker(image=image, image_classification=image_classification)
+
+    publish_kwargs = image_service.queue_service.publish_future.call_args.kwargs
+    assert image_service.storage_service.upload.called is not inline
+    assert publish_kwargs.get("inline") == ("true" if inline else None)
+    if inline:
+        assert Image.open(io.BytesIO(publish_kwargs["message"])).size == (224, 224)
+
+
+async def test_send_generation_request_to_worker_signs_only_published_url(image_service):
+    image_service.settings = settings.model_copy(
+        update={"pubsub_inline_image_max_bytes": 0, "cloud_storage_url_mode": "signed"},
+    )
+    image_service.storage_service.upload.return_value = "https://storage/hash.png"
+    image_service.storage_service.sign_url.return_value = "https://storage/hash.png?signature"
+    image = ImageUpload(image_hash="hash", content=make_image(), content_type="image/png", filename="image.png")
+    image_classification = ImageClassificationFactory(
+        image_hash="hash",
+        status=ImageAnnotationsGenerationStatus.PENDING,
+    )
+
+    with mock.patch.object(image_service, "track_generation_request"):
+        await image_service.send_generation_request_to_worker(image=image, image_classification=image_classification)
+
+    publish_kwargs = image_service.queue_service.publish_future.call_args.kwargs
+    assert publish_kwargs["image_url"] == "https://storage/hash.png?signature"
+    assert image_classification.image_url == "https://storage/hash.png"
+    image_service.storage_service.sign_url.assert_called_once_with(
+        bucket_name=settings.cloud_storage_bucket,
+        blob_name="hash.png",
+    )
+
+
+async def test_process_generation_request_uses_inline_content(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.QUEUED)
+    database_service.get_entity.return_value = image_classification.model_dump()
+
+    await image_service.process_generation_request(image_hash=image_classification.image_hash, content=make_image())
+
+    image_service.http_client.get_content.assert_not_called()
+    stored = database_service.upsert_entity_if.call_args.kwargs["data"]
+    assert stored["status"] == ImageAnnotationsGenerationStatus.SUCCESS
+
+
+async def test_process_generation_request_acks_processed_message_without_work(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.QUEUED)
+    database_service.get_entity.return_value = image_classification.model_dump()
+
+    await image_service.process_generation_request(
+        image_hash=image_classification.image_hash,
+        content=make_image(),
+        message_id="message-id",
+    )
+    image_service.classification_cache.clear()
+    await image_service.process_generation_request(
+        image_hash=image_classification.image_hash,
+        content=make_image(),
+        message_id="message-id",
+    )
+
+    database_service.get_entity.assert_called_once()
+    database_service.upsert_entity_if.assert_called_once()
+
+
+async def test_process_generation_request_redelivery_after_failed_write(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.QUEUED)
+    database_service.get_entity.return_value = image_classification.model_dump()
+    database_service.upsert_many_if.side_effect = [ServiceUnavailable("unavailable"), [image_classification.image_hash]]
+
+    async def process() -> None:
+        async with image_service.coalesce_writes():
+            await image_service.process_generation_request(
+                image_hash=image_classification.image_hash,
+                content=make_image(),
+                message_id="message-id",
+            )
+
+    with pytest.raises(ServiceUnavailable):
+        await process()
+
+    assert image_service.processed_messages.get("message-id") is None
+    cached = image_service.classification_cache.get(image_classification.image_hash)
+    assert cached.status == ImageAnnotationsGenerationStatus.QUEUED
+    database_service.release_lease.assert_called_once()
+
+    await process()
+
+    assert database_service.upsert_many_if.call_count == 2
+    stored = database_service.upsert_many_if.call_args.kwargs["data"][image_classification.image_hash]
+    assert stored["status"] == ImageAnnotationsGenerationStatus.SUCCESS
+    assert image_service.processed_messages.get("message-id") is True
+
+
+async def test_process_generation_request_shares_concurrent_deliveries(image_service, database_service, ml_model):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.QUEUED)
+    database_service.get_entity.return_value = image_classification.model_dump()
+
+    await asyncio.gather(
+        *(
+            image_service.process_generation_request(
+                image_hash=image_classification.image_hash,
+                content=make_image(),
+                message_id=message_id,
+            )
+            for message_id in ("first", "second")
+        ),
+    )
+
+    ml_model.assert_called_once()
+    database_service.claim_lease.assert_called_once()
+    database_service.release_lease.assert_called_once()
+
+
+async def test_process_generation_request_raises_while_other_worker_holds_lease(image_service, database_service):
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.QUEUED)
+    database_service.get_entity.return_value = image_classification.model_dump()
+    database_service.claim_lease.return_value = False
+
+    with pytest.raises(GenerationInProgressError):
+        await image_service.process_generation_request(
+            image_hash=image_classification.image_hash,
+            image_url="https://image",
+            message_id="message-id",
+        )
+
+    image_service.http_client.get_content.assert_not_called()
+    database_service.release_lease.assert_not_called()
+    assert image_service.processed_messages.get("message-id") is None
+
+
+async def test_wait_for_image_classification_notified_by_local_write(image_service, database_service):
+    image_service.settings = settings.model_copy(update={"status_poll_interval": 10})
+    image_classification = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS)
+
+    waiters = [
+        asyncio.ensure_future(
+            image_service.wait_for_image_classification(image_hash=image_classification.image_hash, timeout=1),
+        )
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0.01)
+    await image_service.upsert_image_classification(image_classification=image_classification)
+
+    assert await asyncio.gather(*waiters) == [image_classification, image_classification]
+    database_service.get_entity.assert_not_called()
+
+
+async def test_wait_for_image_classification_polls_datastore(image_service, database_service):
+    image_service.settings = settings.model_copy(update={"status_poll_interval": 0.01})
+    pending, finished = (
+        ImageClassificationFactory(image_hash="hash", status=status)
+        for status in (ImageAnnotationsGenerationStatus.QUEUED, ImageAnnotationsGenerationStatus.SUCCESS)
+    )
+    database_service.get_entity.side_effect = [pending.model_dump(), finished.model_dump()]
+
+    result = await image_service.wait_for_image_classification(image_hash="hash", timeout=1)
+
+    assert result == finished
+
+
+async def test_wait_for_image_classification_outlives_poll_of_earlier_request(image_service, database_service):
+    image_service.settings = settings.model_copy(update={"status_wait_max": 0.05, "status_poll_interval": 0.01})
+    pending, finished = (
+        ImageClassificationFactory(image_hash="hash", status=status)
+        for status in (ImageAnnotationsGenerationStatus.QUEUED, ImageAnnotationsGenerationStatus.SUCCESS)
+    )
+    database_service.get_entity.return_value = pending.model_dump()
+
+    first = asyncio.ensure_future(image_service.wait_for_image_classification(image_hash="hash", timeout=0.05))
+    await asyncio.sleep(0.04)
+    second = asyncio.ensure_future(image_service.wait_for_image_classification(image_hash="hash", timeout=1))
+    await asyncio.sleep(0.05)
+    database_service.get_entity.return_value = finished.model_dump()
+
+    assert await first is None
+    assert await second == finished
+
+
+async def test_wait_for_image_classification_times_out(image_service, database_service):
+    image_service.settings = settings.model_copy(update={"status_poll_interval": 10})
+
+    assert await image_service.wait_for_image_classification(image_hash="hash", timeout=0.01) is None
+
+
+def make_photo(size: tuple[int, int], image_format: str = "PNG") -> bytes:
+    pixels = np.random.default_rng(0).integers(0, 256, (12, 12, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels).resize(size, resample=Image.Resampling.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+async def test_generate_image_classification_reuses_near_duplicate(image_service, ml_model):
+    image_service.settings = settings.model_copy(update={"near_duplicate_enabled": True})
+
+    original = await image_service.generate_image_classification(
+        image_hash="original",
+        contents=make_photo((640, 480)),
+    )
+    duplicate = await image_service.generate_image_classification(
+        image_hash="duplicate",
+        contents=make_photo((160, 120), image_format="JPEG"),
+    )
+
+    assert ml_model.call_count == 1
+    assert duplicate.status == ImageAnnotationsGenerationStatus.SUCCESS
+    assert duplicate.annotations == original.annotations
+    assert duplicate.perceptual_hash is not None
+
+
+async def test_calculate_perceptual_hash_runs_off_io_executor(image_service):
+    image_service.settings = settings.model_copy(update={"near_duplicate_enabled": True})
+    image_service.io_executor = mock.Mock(run=mock.AsyncMock(side_effect=ExecutorFullError("io")))
+
+    assert await image_service.calculate_perceptual_hash(make_photo((64, 48))) is not None
+    image_service.io_executor.run.assert_not_awaited()
+
+
+async def test_calculate_perceptual_hash_skips_when_cpu_executor_is_full(image_service):
+    image_service.settings = settings.model_copy(update={"near_duplicate_enabled": True})
+    cpu_executor = mock.Mock(run=mock.AsyncMock(side_effect=ExecutorFullError("cpu")))
+
+    with mock.patch("src.services.image_service.get_cpu_executor", return_value=cpu_executor):
+        assert await image_service.calculate_perceptual_hash(make_photo((64, 48))) is None
+
+
+async def test_rerank_image_classifications_from_stored_logits(image_service, database_service, tmp_path):
+    image_service.settings = settings.model_copy(update={"logits_store_dir": str(tmp_path)})
+    image_classification = await image_service.generate_image_classification(
+        image_hash="stored",
+        contents=make_image(),
+    )
+    database_service.get_many.return_value = {"stored": image_classification.model_dump()}
+
+    updated = await image_service.rerank_image_classifications(num_annotations=2)
+
+    assert updated == 1
+    stored = database_service.upsert_many_if.call_args.kwargs["data"]["stored"]
+    assert [annotation["label"] for annotation in stored["annotations"]] == ["label-9", "label-8"]
+
+
+async def test_read_images_expands_archives(image_service):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("red.png", make_image("red"))
+        zip_file.writestr("notes.txt", b"not an image")
+    archive_file = UploadFile(file=archive, filename="images.zip", headers={"content-type": "application/zip"})
+
+    images = await image_service.read_images(files=[make_upload_file(make_image("blue")), archive_file])
+
+    assert [image.filename for image in images if isinstance(image, ImageUpload)] == ["image.png", "red.png"]
+    assert isinstance(images[2], RequestValidationError)
+
+
+async def test_read_images_limits_batch_size(image_service):
+    image_service.settings = settings.model_copy(update={"batch_max_images": 1})
+
+    with pytest.raises(RequestValidationError):
+        await image_service.read_images(files=[make_upload_file(make_image()), make_upload_file(make_image())])
+
+
+async def test_read_images_limits_request_size(image_service):
+    image = make_image()
+    image_service.settings = settings.model_copy(update={"batch_max_bytes": len(image) * 2 - 1})
+
+    with pytest.raises(RequestValidationError):
+        await image_service.read_images(files=[make_upload_file(image), make_upload_file(image)])
+
+
+async def test_classify_images_generates_missing_together(image_service, database_service, ml_model):
+    stored = ImageClassificationFactory(status=ImageAnnotationsGenerationStatus.SUCCESS)
+    database_service.get_many.return_value = {stored.image_hash: stored.model_dump()}
+    images = [
+        ImageUpload(image_hash=stored.image_hash, content=make_image(), content_type="image/png"),
+        image_service.create_image_upload(content=make_image("red")),
+        image_service.create_image_upload(content=make_image("blue")),
+    ]
+
+    results = [result async for result in image_service.classify_images(images=images, background_tasks=mock.Mock())]
+
+    assert results[0] == (stored.image_hash, stored)
+    assert {image_hash for image_hash, _ in results[1:]} == {images[1].image_hash, images[2].image_hash}
+    assert all(result.status == ImageAnnotationsGenerationStatus.SUCCESS for _, result in results[1:])
+    database_service.get_many.assert_called_once()
+    ml_model.assert_called_once()
+
+
+async def test_classify_images_yields_undecodable_image_as_error(image_service, database_service):
+    database_service.get_many.return_value = {}
+    corrupt = image_service.create_image_upload(content=b"\x89PNG\r\n\x1a\n" + b"garbage" * 10, filename="corrupt.png")
+    valid = image_service.create_image_upload(content=make_image())
+
+    results = dict(
+        [
+            result
+            async for result in image_service.classify_images(images=[corrupt, valid], background_tasks=mock.Mock())
+        ],
+    )
+
+    assert results[corrupt.image_hash].status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert results[valid.image_hash].status == ImageAnnotationsGenerationStatus.SUCCESS
+
+
+async def test_classify_images_queues_missing_with_single_put(image_service, database_service):
+    database_service.get_many.return_value = {}
+    background_tasks = BackgroundTasks()
+    images = [image_service.create_image_upload(content=make_image(color)) for color in ("red", "blue")]
+
+    results = [
+        result
+        async for result in image_service.classify_images(images=images, background_tasks=background_tasks, queue=True)
+    ]
+
+    assert all(result.status == ImageAnnotationsGenerationStatus.PENDING for _, result in results)
+    database_service.upsert_many_if.assert_called_once()
+    database_service.upsert_entity_if.assert_not_called()
+    assert len(background_tasks.tasks) == 2
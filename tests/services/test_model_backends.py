@@ -0,0 +1,52 @@
+import pytest
+import torch
+from transformers import ViTConfig
+from transformers import ViTForImageClassification
+
+from src.services.model_backends import prepare_model
+
+IMAGE_SIZE = 32
+
+
+@pytest.fixture()
+def model() -> ViTForImageClassification:
+    torch.manual_seed(0)
+    config = ViTConfig(
+        hidden_size=32,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=37,
+        image_size=IMAGE_SIZE,
+        patch_size=16,
+        num_labels=5,
+    )
+    return ViTForImageClassification(config).eval()
+
+
+@pytest.fixture()
+def pixel_values() -> torch.Tensor:
+    torch.manual_seed(1)
+    return torch.randn(3, 3, IMAGE_SIZE, IMAGE_SIZE)
+
+
+@pytest.mark.parametrize(("backend", "atol"), [("eager", 0), ("int8", 0.05), ("torchscript", 1e-5)])
+def test_prepare_model_keeps_logits(model, pixel_values, tmp_path, backend, atol):
+    prepared = prepare_model(
+        model,
+        backend=backend,
+        example_inputs=torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE),
+        onnx_path=tmp_path / "model.onnx",
+    )
+
+    with torch.no_grad():
+        expected = model(pixel_values=pixel_values).logits
+        logits = prepared(pixel_values=pixel_values).logits
+
+    assert prepared.config.id2label == model.config.id2label
+    assert logits.shape == expected.shape
+    assert torch.allclose(logits, expected, atol=atol)
+
+
+def test_prepare_model_rejects_unknown_backend(model, tmp_path):
+    with pytest.raises(ValueError, match="Unknown ML model backend"):
+        prepare_model(model, backend="tensorrt", example_inputs=torch.zeros(1), onnx_path=tmp_path / "model.onnx")
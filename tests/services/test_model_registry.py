@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+from transformers import ViTImageProcessor
+
+from src.services.model_registry import ModelRegistry
+
+
+@pytest.fixture()
+def from_pretrained():
+    with mock.patch("src.services.model_registry.ViTImageProcessor.from_pretrained") as processor, mock.patch(
+        "src.services.model_registry.ViTForImageClassification.from_pretrained",
+    ) as model:
+        processor.return_value = ViTImageProcessor(size={"height": 4, "width": 4})
+        yield processor, model
+
+
+def test_model_registry_loads_once(from_pretrained):
+    processor_from_pretrained, model_from_pretrained = from_pretrained
+    model_registry = ModelRegistry(model_dir="model-dir")
+
+    assert model_registry.is_ready is False
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        models = list(executor.map(lambda _: model_registry.model, range(8)))
+
+    assert model_registry.is_ready is True
+    assert all(model is model_from_pretrained.return_value for model in models)
+    assert model_registry.processor is processor_from_pretrained.return_value
+    model_from_pretrained.assert_called_once_with("model-dir")
+    processor_from_pretrained.assert_called_once_with("model-dir")
+
+
+def test_model_registry_reads_labels_without_loading_model(from_pretrained):
+    _, model_from_pretrained = from_pretrained
+    model_registry = ModelRegistry(model_dir="model-dir")
+
+    with mock.patch("src.services.model_registry.AutoConfig.from_pretrained") as config_from_pretrained:
+        config_from_pretrained.return_value.id2label = {0: "label-0"}
+
+        assert model_registry.id2label == {0: "label-0"}
+        assert model_registry.id2label == {0: "label-0"}
+
+    config_from_pretrained.assert_called_once_with("model-dir")
+    model_from_pretrained.assert_not_called()
+    assert model_registry.is_ready is False
+
+
+def test_model_registry_warm_up(from_pretrained):
+    _, model_from_pretrained = from_pretrained
+    model_registry = ModelRegistry(model_dir="model-dir")
+
+    model_registry.load(warm_up=True)
+
+    pixel_values = model_from_pretrained.return_value.call_args.kwargs["pixel_values"]
+    assert tuple(pixel_values.shape) == (1, 3, 4, 4)
+    assert set(model_registry.startup_timings) == {"processor", "model", "warm_up", "total"}
+
+
+def test_model_registry_prepares_backend(from_pretrained):
+    _, model_from_pretrained = from_pretrained
+    model_registry = ModelRegistry(model_dir="model-dir", backend="int8")
+
+    with mock.patch("src.services.model_registry.prepare_model") as prepare_model:
+        model_registry.load()
+
+    assert model_registry.model is prepare_model.return_value
+    assert prepare_model.call_args.args == (model_from_pretrained.return_value,)
+    assert prepare_model.call_args.kwargs["backend"] == "int8"
+    assert "backend" in model_registry.startup_timings
@@ -1,3 +1,5 @@
+from concurrent.futures import Future
+
 from src.services.queue_service import QueueService
 from tests.conftest import settings
 
@@ -17,3 +19,48 @@ async def test_storage_service_upload_image(gcp_pubsub_client) -> None:
         data=message.encode(),
         **attrs,
     )
+
+
+async def test_queue_service_publish_async(gcp_pubsub_client) -> None:
+    queue_service = QueueService(settings=settings)
+    future = Future()
+    future.set_result("message-id")
+    gcp_pubsub_client.return_value.publish.return_value = future
+
+    message_id = await queue_service.publish_async(message="test message", attr_1="test attr 1")
+
+    assert message_id == "message-id"
+    gcp_pubsub_client.return_value.publish.assert_called_once_with(
+        topic=gcp_pubsub_client.return_value.topic_path.return_value,
+        data=b"test message",
+        attr_1="test attr 1",
+    )
+
+
+async def test_queue_service_publish_future_does_not_wait(gcp_pubsub_client) -> None:
+    queue_service = QueueService(settings=settings)
+    publish_method = gcp_pubsub_client.return_value.publish
+
+    futures = [
+        queue_service.publish_future(message=image_hash, image_hash=image_hash) for image_hash in ("first", "second")
+    ]
+
+    assert futures == [publish_method.return_value, publish_method.return_value]
+    publish_method.return_value.result.assert_not_called()
+    assert publish_method.call_args_list[1].kwargs == {
+        "topic": gcp_pubsub_client.return_value.topic_path.return_value,
+        "data": b"second",
+        "image_hash": "second",
+    }
+
+
+def test_queue_service_uses_batch_settings(gcp_pubsub_client) -> None:
+    queue_service = QueueService(settings=settings)
+
+    queue_service.publish_future(message="test message")
+    QueueService.close()
+
+    batch_settings = gcp_pubsub_client.call_args.kwargs["batch_settings"]
+    assert batch_settings.max_messages == settings.pubsub_batch_max_messages
+    assert batch_settings.max_latency == settings.pubsub_batch_max_latency
+    gcp_pubsub_client.return_value.stop.assert_called_once()
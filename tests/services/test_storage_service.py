@@ -1,3 +1,8 @@
+import io
+from unittest import mock
+
+from google.api_core.exceptions import PreconditionFailed
+
 from src.services.storage_service import StorageService
 from tests.conftest import settings
 
@@ -23,5 +28,73 @@ async def test_storage_service_upload_image(gcp_storage_client) -> None:
 
     bucket.assert_called_once_with(bucket_name)
     blob.assert_called_once_with(blob_name)
-    upload_from_file_method.assert_called_once_with(file, content_type=content_type)
+    upload_from_file_method.assert_called_once_with(file, content_type=content_type, size=None)
     make_public_method.assert_called_once()
+
+
+async def test_storage_service_download_image(gcp_storage_client) -> None:
+    storage_service = StorageService(settings=settings)
+    blob = gcp_storage_client.return_value.bucket.return_value.blob
+    blob.return_value.download_as_bytes.return_value = b"image"
+
+    content = storage_service.download(bucket_name="test-bucket", blob_name="test.jpeg")
+
+    assert content == b"image"
+    blob.assert_called_once_with("test.jpeg")
+
+
+async def test_storage_service_uploads_content_addressed_blob_once(gcp_storage_client) -> None:
+    storage_service = StorageService(settings=settings)
+    blob = gcp_storage_client.return_value.bucket.return_value.blob.return_value
+
+    for _ in range(2):
+        storage_service.upload(
+            bucket_name="test-bucket",
+            blob_name="hash.png",
+            file=io.BytesIO(),
+            content_addressed=True,
+        )
+
+    blob.upload_from_file.assert_called_once_with(mock.ANY, content_type=None, size=None, if_generation_match=0)
+    blob.make_public.assert_called_once()
+
+
+async def test_storage_service_skips_existing_content_addressed_blob(gcp_storage_client) -> None:
+    storage_service = StorageService(settings=settings.model_copy(update={"cloud_storage_url_mode": "public_bucket"}))
+    blob = gcp_storage_client.return_value.bucket.return_value.blob.return_value
+    blob.upload_from_file.side_effect = PreconditionFailed("exists")
+    blob.public_url = "https://storage.googleapis.com/test-bucket/hash.png"
+
+    url = storage_service.upload(
+        bucket_name="test-bucket",
+        blob_name="hash.png",
+        file=io.BytesIO(),
+        content_addressed=True,
+    )
+
+    assert url == blob.public_url
+    blob.make_public.assert_not_called()
+
+
+async def test_storage_service_uploads_to_private_bucket_without_signing(gcp_storage_client) -> None:
+    storage_service = StorageService(settings=settings.model_copy(update={"cloud_storage_url_mode": "signed"}))
+    blob = gcp_storage_client.return_value.bucket.return_value.blob.return_value
+    blob.public_url = "https://storage.googleapis.com/test-bucket/hash.png"
+
+    url = storage_service.upload(bucket_name="test-bucket", blob_name="hash.png", file=io.BytesIO())
+
+    assert url == blob.public_url
+    blob.generate_signed_url.assert_not_called()
+    blob.make_public.assert_not_called()
+
+
+async def test_storage_service_signs_url(gcp_storage_client) -> None:
+    storage_service = StorageService(settings=settings)
+    blob = gcp_storage_client.return_value.bucket.return_value.blob
+    blob.return_value.generate_signed_url.return_value = "https://signed"
+
+    url = storage_service.sign_url(bucket_name="test-bucket", blob_name="hash.png")
+
+    assert url == "https://signed"
+    blob.assert_called_once_with("hash.png")
+    assert blob.return_value.generate_signed_url.call_args.kwargs["version"] == "v4"
@@ -0,0 +1,55 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from src.utils.archives import ArchiveTooLargeError
+from src.utils.archives import is_archive
+from src.utils.archives import read_archive
+
+FILES = {"first.png": b"first", "nested/second.jpg": b"second image"}
+
+
+def make_zip() -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.mkdir("nested")
+        for name, content in FILES.items():
+            archive.writestr(name, content)
+    return buffer
+
+
+def make_tar() -> io.BytesIO:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in FILES.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer
+
+
+@pytest.mark.parametrize("make_archive", [make_zip, make_tar])
+def test_read_archive(make_archive):
+    file = make_archive()
+    assert is_archive(file)
+
+    files = read_archive(file, max_file_size=6, max_files=10, max_total_size=100)
+
+    assert files == [("first.png", b"first"), ("nested/second.jpg", b"second ")]
+
+
+def test_read_archive_limits_files():
+    with pytest.raises(ArchiveTooLargeError):
+        read_archive(make_zip(), max_file_size=100, max_files=1, max_total_size=100)
+
+
+@pytest.mark.parametrize("make_archive", [make_zip, make_tar])
+def test_read_archive_limits_total_size(make_archive):
+    with pytest.raises(ArchiveTooLargeError):
+        read_archive(make_archive(), max_file_size=100, max_files=10, max_total_size=10)
+
+
+def test_is_archive_rejects_other_files():
+    assert not is_archive(io.BytesIO(b"\x89PNG\r\n\x1a\n" + bytes(1024)))
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from src.utils.batching import BatcherFullError
+from src.utils.batching import MicroBatcher
+
+
+class RecordingProcessor:
+    def __init__(self) -> None:
+        self.batches: list[list[int]] = []
+
+    async def __call__(self, batch: list[int]) -> list[int | Exception]:
+        self.batches.append(batch)
+        return [ValueError(item) if item < 0 else item * 10 for item in batch]
+
+
+async def test_micro_batcher_groups_concurrent_items() -> None:
+    processor = RecordingProcessor()
+    batcher = MicroBatcher(processor, max_batch_size=8, max_wait=0.05, name="test_groups")
+
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert results == [0, 10, 20, 30, 40]
+    assert processor.batches == [[0, 1, 2, 3, 4]]
+    await batcher.close()
+
+
+async def test_micro_batcher_respects_max_batch_size() -> None:
+    processor = RecordingProcessor()
+    batcher = MicroBatcher(processor, max_batch_size=2, max_wait=0.05, name="test_max_size")
+
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert results == [0, 10, 20, 30, 40]
+    assert processor.batches == [[0, 1], [2, 3], [4]]
+    assert batcher.batch_size_histogram.count == 3
+    assert batcher.queue_wait_histogram.count == 5
+    await batcher.close()
+
+
+async def test_micro_batcher_raises_only_for_failed_item() -> None:
+    processor = RecordingProcessor()
+    batcher = MicroBatcher(processor, max_batch_size=8, max_wait=0.01, name="test_failed_item")
+
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(-1), return_exceptions=True)
+
+    assert results[0] == 10
+    assert isinstance(results[1], ValueError)
+    await batcher.close()
+
+
+async def test_micro_batcher_propagates_batch_failure() -> None:
+    async def failing_processor(batch: list[int]) -> list[int]:
+        raise RuntimeError
+
+    batcher = MicroBatcher(failing_processor, max_batch_size=8, max_wait=0.01, name="test_batch_failure")
+
+    with pytest.raises(RuntimeError):
+        await batcher.submit(1)
+    await batcher.close()
+
+
+async def test_micro_batcher_rejects_when_full() -> None:
+    release = asyncio.Event()
+
+    async def blocking_processor(batch: list[int]) -> list[int]:
+        await release.wait()
+        return batch
+
+    batcher = MicroBatcher(blocking_processor, max_batch_size=1, max_wait=0, max_pending=1, name="test_full")
+
+    first = asyncio.ensure_future(batcher.submit(1))
+    await asyncio.sleep(0)
+
+    with pytest.raises(BatcherFullError):
+        await batcher.submit(2)
+
+    release.set()
+    assert await first == 1
+    assert batcher.pending == 0
+    await batcher.close()
+
+
+async def test_micro_batcher_processes_batches_concurrently() -> None:
+    running = 0
+    max_running = 0
+
+    async def slow_processor(batch: list[int]) -> list[int]:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return batch
+
+    batcher = MicroBatcher(slow_processor, max_batch_size=1, max_wait=0, max_concurrency=2, name="test_concurrency")
+
+    assert await asyncio.gather(*(batcher.submit(i) for i in range(4))) == [0, 1, 2, 3]
+    assert max_running == 2
+    await batcher.close()
@@ -0,0 +1,60 @@
+from unittest import mock
+
+from src.utils.cache import TTLCache
+
+
+def test_ttl_cache_get_and_set():
+    cache = TTLCache(max_entries=10, max_bytes=100, name="test_get_and_set")
+
+    assert cache.get("foo") is None
+    cache.set("foo", "bar", ttl=10)
+
+    assert cache.get("foo") == "bar"
+    assert cache.hits.value == 1
+    assert cache.misses.value == 1
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(max_entries=10, max_bytes=100, name="test_expires")
+
+    with mock.patch("src.utils.cache.time.monotonic", return_value=100):
+        cache.set("foo", "bar", ttl=10)
+    with mock.patch("src.utils.cache.time.monotonic", return_value=110):
+        assert cache.get("foo") is None
+
+    assert len(cache) == 0
+
+
+def test_ttl_cache_does_not_store_without_ttl():
+    cache = TTLCache(max_entries=10, max_bytes=100, name="test_no_ttl")
+    cache.set("foo", "bar", ttl=10)
+
+    cache.set("foo", "baz", ttl=0)
+
+    assert cache.get("foo") is None
+
+
+def test_ttl_cache_evicts_least_recently_used_entry():
+    cache = TTLCache(max_entries=2, max_bytes=100, name="test_evicts_lru")
+    cache.set("a", 1, ttl=10)
+    cache.set("b", 2, ttl=10)
+    cache.get("a")
+
+    cache.set("c", 3, ttl=10)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.evictions.value == 1
+
+
+def test_ttl_cache_respects_memory_limit():
+    cache = TTLCache(max_entries=10, max_bytes=10, name="test_memory_limit")
+    cache.set("a", 1, ttl=10, size=6)
+    cache.set("b", 2, ttl=10, size=6)
+    cache.set("c", 3, ttl=10, size=11)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.get("c") is None
+    assert cache.size == 6
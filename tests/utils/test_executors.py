@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.utils.executors import BoundedExecutor
+from src.utils.executors import ExecutorFullError
+
+
+async def test_bounded_executor_runs_in_worker_thread() -> None:
+    executor = BoundedExecutor(max_workers=1, max_pending=1, name="test-thread")
+
+    thread_name = await executor.run(lambda: threading.current_thread().name)
+
+    assert thread_name.startswith("test-thread")
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+async def test_bounded_executor_rejects_when_full() -> None:
+    executor = BoundedExecutor(max_workers=1, max_pending=1, name="test-full")
+    release = threading.Event()
+
+    running = asyncio.ensure_future(executor.run(release.wait))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ExecutorFullError):
+        await executor.run(lambda: None)
+
+    release.set()
+    assert await running is True
+    assert executor.pending == 0
+    executor.shutdown()
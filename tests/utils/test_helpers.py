@@ -1,7 +1,13 @@
+import io
+
 import pytest
+from PIL import Image
 
+from src.utils.helpers import chunked
 from src.utils.helpers import get_extension_from_filename
 from src.utils.helpers import get_format_from_content_type
+from src.utils.helpers import resize_image
+from src.utils.helpers import sniff_image_content_type
 
 
 @pytest.mark.parametrize(
@@ -28,3 +34,39 @@ def test_get_extension_from_filename(filename: str, expected_extension: str):
 )
 def test_get_format_from_content_type(filename: str, expected_format: str):
     assert get_format_from_content_type(filename) == expected_format
+
+
+@pytest.mark.parametrize(
+    ("iterable", "size", "expected_chunks"),
+    [
+        (range(5), 2, [[0, 1], [2, 3], [4]]),
+        (range(4), 2, [[0, 1], [2, 3]]),
+        ([], 2, []),
+    ],
+)
+def test_chunked(iterable, size: int, expected_chunks: list):
+    assert list(chunked(iterable, size)) == expected_chunks
+
+
+@pytest.mark.parametrize(
+    ("header", "expected_content_type"),
+    [
+        (b"\xff\xd8\xff\xe0\x00\x10JFIF", "image/jpeg"),
+        (b"\x89PNG\r\n\x1a\n\x00\x00", "image/png"),
+        (b"GIF89a", None),
+        (b"", None),
+    ],
+)
+def test_sniff_image_content_type(header: bytes, expected_content_type: str | None):
+    assert sniff_image_content_type(header) == expected_content_type
+
+
+def test_resize_image():
+    buffer = io.BytesIO()
+    Image.new("L", (640, 480)).save(buffer, format="JPEG")
+
+    resized = Image.open(io.BytesIO(resize_image(buffer.getvalue(), size=(224, 224))))
+
+    assert resized.format == "PNG"
+    assert resized.mode == "RGB"
+    assert resized.size == (224, 224)
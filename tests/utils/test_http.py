@@ -0,0 +1,69 @@
+import httpx
+import pytest
+from fastapi import status
+
+from src.utils.http import HttpClient
+
+
+def make_http_client(responses: list[httpx.Response | Exception]) -> tuple[HttpClient, list[httpx.Request]]:
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    http_client = HttpClient(
+        timeout=1,
+        max_connections=1,
+        max_keepalive_connections=1,
+        keepalive_expiry=1,
+        retries=2,
+        retry_backoff=0,
+        transport=httpx.MockTransport(handler),
+    )
+    return http_client, requests
+
+
+async def test_get_content_reuses_client():
+    http_client, _ = make_http_client([httpx.Response(200, content=b"first"), httpx.Response(200, content=b"second")])
+
+    assert await http_client.get_content("https://image/1") == b"first"
+    client = http_client.client
+    assert await http_client.get_content("https://image/2") == b"second"
+
+    assert http_client.client is client
+    await http_client.aclose()
+
+
+async def test_get_content_retries_transient_errors():
+    http_client, requests = make_http_client(
+        [
+            httpx.ConnectError("connection refused"),
+            httpx.Response(status.HTTP_503_SERVICE_UNAVAILABLE),
+            httpx.Response(200, content=b"image"),
+        ],
+    )
+
+    assert await http_client.get_content("https://image") == b"image"
+    assert len(requests) == 3
+
+
+async def test_get_content_does_not_retry_client_errors():
+    http_client, requests = make_http_client([httpx.Response(status.HTTP_404_NOT_FOUND)])
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await http_client.get_content("https://image")
+
+    assert len(requests) == 1
+
+
+async def test_get_content_gives_up_after_retries():
+    http_client, requests = make_http_client([httpx.Response(status.HTTP_503_SERVICE_UNAVAILABLE)] * 3)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await http_client.get_content("https://image")
+
+    assert len(requests) == 3
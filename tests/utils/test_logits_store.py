@@ -0,0 +1,38 @@
+import numpy as np
+import torch
+
+from src.utils.logits_store import LogitsStore
+from src.utils.logits_store import top_k
+
+
+def test_top_k_matches_torch():
+    logits = np.random.default_rng(0).normal(size=(4, 10)).astype(np.float32)
+
+    indices, values = top_k(logits, k=3)
+
+    expected = torch.topk(torch.softmax(torch.from_numpy(logits), dim=1), 3, dim=1)
+    np.testing.assert_array_equal(indices, expected.indices.numpy())
+    np.testing.assert_allclose(values, expected.values.numpy(), rtol=1e-5)
+
+
+def test_store_keeps_latest_logits_per_image_hash(tmp_path):
+    store = LogitsStore(tmp_path, num_labels=3)
+
+    store.add_many(["first", "second"], np.array([[1, 2, 3], [4, 5, 6]]))
+    store.add_many(["first"], np.array([[7, 8, 9]]))
+
+    image_hashes, logits = store.get_many(["first", "missing", "second"])
+    assert image_hashes == ["first", "second"]
+    np.testing.assert_array_equal(logits, np.array([[7, 8, 9], [4, 5, 6]], dtype=np.float16))
+    assert len(store) == 2
+
+
+def test_store_reads_records_appended_by_another_store(tmp_path):
+    reader = LogitsStore(tmp_path, num_labels=2)
+    reader.add_many(["first"], np.array([[1, 2]]))
+    assert len(reader) == 1
+
+    LogitsStore(tmp_path, num_labels=2).add_many(["second", "third"], np.array([[3, 4], [5, 6]]))
+
+    chunks = list(reader.iter_chunks(2))
+    assert [image_hashes for image_hashes, _ in chunks] == [["first", "second"], ["third"]]
@@ -0,0 +1,67 @@
+from src.utils.metrics import Histogram
+from src.utils.metrics import MetricsRegistry
+
+
+def test_histogram_snapshot_is_cumulative():
+    histogram = Histogram(name="test", description="test", buckets=(1, 5))
+
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {1: 2, 5: 3, float("inf"): 4}
+    assert snapshot["count"] == 4
+    assert snapshot["sum"] == 14.5
+
+
+def test_registry_returns_same_histogram():
+    registry = MetricsRegistry()
+
+    histogram = registry.histogram("test", "test")
+
+    assert registry.histogram("test", "test") is histogram
+    assert set(registry.collect()) == {"test"}
+
+
+def test_registry_keeps_series_per_labels():
+    registry = MetricsRegistry()
+
+    first = registry.counter("test_total", "test", labels={"stage": "first"})
+    second = registry.counter("test_total", "test", labels={"stage": "second"})
+
+    assert first is not second
+    assert set(registry.collect()) == {'test_total{stage="first"}', 'test_total{stage="second"}'}
+
+
+def test_gauge_reads_latest_function():
+    registry = MetricsRegistry()
+
+    registry.gauge("test", "test", function=lambda: 1)
+    gauge = registry.gauge("test", "test", function=lambda: 2)
+
+    assert gauge.value == 2
+
+
+def test_render_prometheus_escapes_label_values():
+    registry = MetricsRegistry()
+    registry.counter("test_total", "Test counter.", labels={"path": 'a\\b"c\nd'}).inc()
+
+    assert registry.render_prometheus().splitlines()[-1] == 'test_total{path="a\\\\b\\"c\\nd"} 1.0'
+
+
+def test_render_prometheus():
+    registry = MetricsRegistry()
+    registry.counter("test_total", "Test counter.").inc(3)
+    registry.histogram("test_seconds", "Test histogram.", buckets=(1,), labels={"stage": "a"}).observe(0.5)
+
+    assert registry.render_prometheus().splitlines() == [
+        "# HELP test_seconds Test histogram.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{le="1.0",stage="a"} 1.0',
+        'test_seconds_bucket{le="+Inf",stage="a"} 1.0',
+        'test_seconds_sum{stage="a"} 0.5',
+        'test_seconds_count{stage="a"} 1.0',
+        "# HELP test_total Test counter.",
+        "# TYPE test_total counter",
+        "test_total 3.0",
+    ]
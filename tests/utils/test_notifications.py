@@ -0,0 +1,33 @@
+import asyncio
+
+from src.utils.notifications import NotificationHub
+
+
+async def test_notification_hub_wakes_up_waiters_of_key() -> None:
+    hub = NotificationHub(name="test_wakes_up_waiters")
+
+    waiters = [asyncio.ensure_future(hub.wait(key, timeout=1)) for key in ("key", "key", "other")]
+    await asyncio.sleep(0)
+
+    assert hub.publish("key", "value") == 2
+    assert await asyncio.gather(*waiters[:2]) == ["value", "value"]
+    assert not waiters[2].done()
+    assert hub.published.value == 1
+
+    waiters[2].cancel()
+    await asyncio.gather(waiters[2], return_exceptions=True)
+    assert len(hub) == 0
+
+
+async def test_notification_hub_wait_times_out() -> None:
+    hub = NotificationHub(name="test_wait_times_out")
+
+    assert await hub.wait("key", timeout=0.01) is None
+    assert len(hub) == 0
+
+
+async def test_notification_hub_publish_without_waiters() -> None:
+    hub = NotificationHub(name="test_publish_without_waiters")
+
+    assert hub.publish("key", "value") == 0
+    assert hub.published.value == 0
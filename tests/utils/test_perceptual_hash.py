@@ -0,0 +1,76 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from src.utils.perceptual_hash import BKTree
+from src.utils.perceptual_hash import NearDuplicateIndex
+from src.utils.perceptual_hash import dhash
+from src.utils.perceptual_hash import hamming_distance
+
+
+def encode(image: Image.Image, image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def make_photo(seed: int) -> Image.Image:
+    """Smooth random image, photo-like unlike solid colors and gradients."""
+    pixels = np.random.default_rng(seed).integers(0, 256, (12, 12, 3), dtype=np.uint8)
+    return Image.fromarray(pixels).resize((640, 480), resample=Image.Resampling.BICUBIC)
+
+
+def test_dhash_matches_resized_and_reencoded_image():
+    image = make_photo(seed=0)
+    different = make_photo(seed=1)
+
+    original = dhash(encode(image, "PNG"))
+    resized = dhash(encode(image.resize((160, 120)), "JPEG"))
+
+    assert hamming_distance(original, resized) <= 4
+    assert hamming_distance(original, dhash(encode(different, "PNG"))) > 10
+
+
+def test_bk_tree_finds_closest_within_distance():
+    tree = BKTree()
+    for value, key in ((0b0000, "zero"), (0b0111, "three"), (0b1111, "four")):
+        tree.add(value, key)
+
+    assert tree.find(0b0001, max_distance=1) == (1, "zero")
+    assert tree.find(0b1110, max_distance=1) == (1, "four")
+    assert tree.find(0b0011, max_distance=0) is None
+
+
+def test_near_duplicate_index_drops_oldest_half_when_full():
+    index = NearDuplicateIndex(max_entries=4, name="test_near_duplicate_index")
+
+    for value in range(5):
+        index.add(value << 8, f"key-{value}")
+
+    assert len(index) == 2
+    assert index.find(0, max_distance=0) is None
+    assert index.find(4 << 8, max_distance=0) == "key-4"
+
+
+def test_near_duplicate_index_skips_stale_value_of_re_added_key():
+    index = NearDuplicateIndex(max_entries=10, name="test_near_duplicate_index")
+
+    index.add(0b0000, "changed")
+    index.add(0b0011, "other")
+    index.add(0xFF00, "changed")
+
+    assert len(index) == 2
+    assert index.find(0b0000, max_distance=2) == "other"
+    assert index.find(0xFF00, max_distance=0) == "changed"
+
+
+def test_near_duplicate_index_rebuilds_when_stale_nodes_outnumber_entries():
+    index = NearDuplicateIndex(max_entries=10, name="test_near_duplicate_index")
+
+    for value in range(3):
+        index.add(value << 8, "key")
+
+    assert index.find(0, max_distance=0) is None
+    assert index.find(1 << 8, max_distance=0) is None
+    assert index.find(2 << 8, max_distance=0) == "key"
@@ -0,0 +1,52 @@
+import io
+from unittest import mock
+
+import pytest
+import torch
+from PIL import Image
+from transformers import ViTImageProcessor
+
+from src.utils.preprocessing import ImagePreprocessor
+from src.utils.preprocessing import get_imaging_features
+
+
+@pytest.fixture()
+def processor() -> ViTImageProcessor:
+    return ViTImageProcessor()
+
+
+def make_image(size: tuple[int, int], image_format: str) -> bytes:
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def test_preprocessor_matches_vit_image_processor(processor):
+    preprocessor = ImagePreprocessor.from_processor(processor)
+    contents = [make_image((300, 200), "PNG"), make_image((50, 80), "PNG")]
+
+    pixel_values = preprocessor([preprocessor.load_image(content) for content in contents])
+    expected = processor(
+        images=[Image.open(io.BytesIO(content)).convert("RGB") for content in contents],
+        return_tensors="pt",
+    )["pixel_values"]
+
+    assert pixel_values.dtype == torch.float32
+    assert torch.allclose(pixel_values, expected, atol=1e-6)
+
+
+def test_preprocessor_downscales_jpeg_while_decoding(processor):
+    preprocessor = ImagePreprocessor.from_processor(processor)
+    content = make_image((2000, 1600), "JPEG")
+
+    with mock.patch.object(Image.Image, "resize", autospec=True, side_effect=Image.Image.resize) as resize:
+        image = preprocessor.load_image(content)
+
+    assert image.size == (224, 224)
+    # decoded at 1/4 scale, 1/8 would be smaller than 224 pixels in height
+    assert resize.call_args.args[0].size == (500, 400)
+
+
+def test_get_imaging_features():
+    assert set(get_imaging_features()) == {"pillow_simd", "libjpeg_turbo"}
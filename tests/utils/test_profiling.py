@@ -0,0 +1,44 @@
+import threading
+
+import torch
+
+from src.utils.profiling import ForwardProfiler
+from src.utils.profiling import StackSampler
+from src.utils.profiling import format_collapsed
+
+
+def test_stack_sampler_collapses_thread_stacks():
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait, name="waiting")
+    thread.start()
+    sampler = StackSampler(interval=0.001)
+
+    sampler.start()
+    try:
+        stop.wait(0.05)
+    finally:
+        stacks = sampler.stop()
+        stop.set()
+        thread.join()
+
+    assert any(stack.startswith("waiting;threading:Thread._bootstrap") for stack in stacks)
+    assert not any(stack.startswith("stack-sampler") for stack in stacks)
+
+
+def test_forward_profiler_records_only_while_active():
+    forward_profiler = ForwardProfiler()
+    model = torch.nn.Linear(4, 4)
+
+    with forward_profiler.profile():
+        model(torch.ones(1, 4))
+    forward_profiler.start()
+    with forward_profiler.profile():
+        model(torch.ones(1, 4))
+    stacks = forward_profiler.stop()
+
+    assert stacks
+    assert all(stack.startswith("model_forward;") for stack in stacks)
+
+
+def test_format_collapsed():
+    assert format_collapsed({"main;b": 2, "main;a": 1}) == "main;a 1\nmain;b 2\n"
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from src.utils.singleflight import SingleFlight
+
+
+async def test_single_flight_shares_result_of_call_in_flight() -> None:
+    single_flight = SingleFlight(name="test_shares_result")
+    calls = 0
+
+    async def call() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(single_flight.do("key", call) for _ in range(5)))
+
+    assert results == [1] * 5
+    assert single_flight.shared.value == 4
+    assert len(single_flight) == 0
+
+
+async def test_single_flight_calls_again_after_call_finished() -> None:
+    single_flight = SingleFlight(name="test_calls_again")
+    calls = 0
+
+    async def call() -> int:
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await single_flight.do("key", call) == 1
+    assert await single_flight.do("key", call) == 2
+
+
+async def test_single_flight_shares_exception() -> None:
+    single_flight = SingleFlight(name="test_shares_exception")
+
+    async def call() -> None:
+        await asyncio.sleep(0.01)
+        raise ValueError
+
+    results = await asyncio.gather(*(single_flight.do("key", call) for _ in range(2)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_single_flight_call_survives_cancelled_caller() -> None:
+    single_flight = SingleFlight(name="test_cancelled_caller")
+    release = asyncio.Event()
+
+    async def call() -> str:
+        await release.wait()
+        return "done"
+
+    first = asyncio.ensure_future(single_flight.do("key", call))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(single_flight.do("key", call))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await first
@@ -0,0 +1,29 @@
+import pytest
+
+from src.utils.tracing import get_stage_histogram
+from src.utils.tracing import timed
+
+
+def test_timed_context_manager():
+    histogram = get_stage_histogram("test_context_manager")
+    count = histogram.count
+
+    with timed("test_context_manager"):
+        pass
+
+    assert histogram.count == count + 1
+
+
+async def test_timed_decorator_records_failures():
+    histogram = get_stage_histogram("test_decorator")
+    count = histogram.count
+
+    @timed("test_decorator")
+    async def fail() -> None:
+        msg = "stage failed"
+        raise ValueError(msg)
+
+    with pytest.raises(ValueError, match="stage failed"):
+        await fail()
+
+    assert histogram.count == count + 1